@@ -13,39 +13,58 @@ fill_statistic_to_word.py
 
 import os
 from docxtpl import DocxTemplate
-from statistic import get_excel_sheets, scan_excel_sheets  # 直接复用你的函数
+from statistic import load_tables, scan_excel_sheets  # 直接复用你的函数
 import io
 import sys
 import re
 import configparser
 from jinja2 import Environment, DebugUndefined
+# 修正项目模块搜索路径，确保可导入 modules 下的工具模块
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+# 项目模块 util
+try:
+    from modules import util as _ut
+except Exception as e:
+    _ut = None
+    print(f"⚠️  未找到 util 模块：{e}")
+# 检查结果判定规则模块（与 statistic 共用同一模块实例）
+try:
+    from modules import result_rules as _rules
+except ImportError:
+    import result_rules as _rules
+# 计时与资源统计模块（统计阶段的计时区间直接使用）
+from modules import timing as _timing
 # 全局参数
 TEMPLATE_PATH = ""
 INPUT_DIR = ""
 OUTPUT_DIR = ""
+# 并行统计的 worker 数与执行器类型（thread / process）
+STAT_WORKERS = 1
+STAT_EXECUTOR = "thread"
 
-def run_statistic_to_word():
-    basename = os.path.basename(TEMPLATE_PATH)
-    #print(f"basename = {basename}")
-    # 去掉文件名中的“模板”，构成输出文件名。
-    new_name = re.sub(r"模板\(.*?\)", "", basename).replace(".docx", "")
-    #print(f"new_name = {new_name}")
-    new_name = new_name.strip("-_ ") + ".docx"
-    #print(f"new_name = {new_name}")
-    # 构成输出文件全路径。
-    output_path = os.path.join(OUTPUT_DIR, new_name)
-    """执行统计并将结果写入 Word 模板"""
+def compute_statistic_summary(input_path: str) -> str:
+    """执行统计，返回 {{汇总结果}} 文本（只读取输入 Excel，可与图片渲染并行执行）"""
     print("📊 开始分析 Excel 巡检表...")
-    sheet_names = get_excel_sheets(INPUT_DIR)
+    # 一次性解析 Excel 的全部 sheet，供各 sheet 的统计共用
+    with _timing.span("load_tables"):
+        tables = load_tables(input_path)
+    sheet_names = list(tables)
+    print(f"📘 文件中共检测到 {len(sheet_names)} 个表：{sheet_names}")
 
-    # ✅ 获取返回值：汇总字符串 + 结构化结果列表
-    summary_text = scan_excel_sheets(INPUT_DIR, sheet_names)
+    # ✅ 获取返回值：汇总字符串
+    with _timing.span("analyze_sheets", sheets=len(sheet_names)):
+        summary_text = scan_excel_sheets(input_path, sheet_names, tables, STAT_WORKERS, STAT_EXECUTOR)
 
     # 清理日志格式
     summary_text = summary_text.replace("\r", "").strip()
     print(f"\n✅ 汇总结果提取完成（{len(summary_text)} 字）")
+    return summary_text
 
 
+def write_statistic_summary(output_path: str, summary_text: str):
+    """将汇总结果写入 Word 报告的 {{汇总结果}} 段落"""
     # ✅ 写入 Word 模板
     print(f"\n✅ 读取word报告：{output_path}")
     jinja_env = Environment(undefined=DebugUndefined)
@@ -56,16 +75,43 @@ def run_statistic_to_word():
     print(f"\n✅ 已生成报告：{output_path}")
 
 
-def run(config: configparser.ConfigParser):
-    """ 模块主执行函数。 """
-    # 提取配置文件参数项
-    global TEMPLATE_PATH, INPUT_DIR, OUTPUT_DIR
-    TEMPLATE_PATH = config.get("Path", "template_path")
-    INPUT_DIR = config.get("Path", "input_path")
-    OUTPUT_DIR = config.get("Path", "output_dir")
-    run_statistic_to_word()
+def run_statistic_to_word(input_path: str, output_path: str):
+    """执行统计并将结果写入 Word 模板"""
+    write_statistic_summary(output_path, compute_statistic_summary(input_path))
+
+
+def configure(config: configparser.ConfigParser):
+    """读取统计相关配置（并行 worker 数、执行器类型、判定规则文件）"""
+    global STAT_WORKERS, STAT_EXECUTOR
+    STAT_WORKERS = config.getint("Statistic", "workers", fallback=1)
+    STAT_EXECUTOR = config.get("Statistic", "executor", fallback="thread").strip().lower()
+    # 检查结果判定规则文件（修改后自动热加载）
+    _rules.configure(config.get("Path", "rules_path", fallback=""))
+
+
+def compute(config: configparser.ConfigParser, ws: "_ut.Workspace" = None) -> str:
+    """
+    只执行统计、不写报告，返回 {{汇总结果}} 文本。
+    统计只依赖输入 Excel，generate_report 在图片渲染的同时于后台线程调用本函数，写报告时再取结果。
+    """
+    if ws is None:
+        ws = _ut.create_workspace_func(config)
+    configure(config)
+    return compute_statistic_summary(ws.input_path)
+
+
+def run(config: configparser.ConfigParser, ws: "_ut.Workspace" = None, summary_text: str = None):
+    """
+    模块主执行函数。ws 为本次任务的工作区，未提供时使用配置文件中的默认路径。
+    summary_text 为预先计算好的汇总结果（见 compute），未提供时在此执行统计。
+    """
+    if ws is None:
+        ws = _ut.create_workspace_func(config)
+    if summary_text is None:
+        summary_text = compute(config, ws)
+    write_statistic_summary(ws.output_path, summary_text)
 if __name__ == "__main__":
     TEMPLATE_PATH = "../template/实验性项目巡检报告模板(1.0).docx"
     INPUT_DIR = "../data/巡检报告数据集(1.0).xlsx"
     OUTPUT_DIR = "../out/"
-    run_statistic_to_word()
+    run_statistic_to_word(INPUT_DIR, _ut.gen_report_output_path_func(TEMPLATE_PATH, OUTPUT_DIR))
@@ -16,13 +16,19 @@
 - modules/util.py               → 日志与辅助函数（Logger）
 - modules/excel_to_images.py    → Excel 转 JPG 模块
 - modules/report_embedder.py    → Word 模板插入模块
+- modules/pipeline.py           → 流水线引擎（阶段依赖调度、指纹与缓存）
 """
 
 import os                                  # 提供文件和路径操作函数
 import sys                                 # 提供系统级访问，如路径与退出
+import json                                # 批量生成清单读写
+import time                                # 批量生成计时
+import uuid                                # 生成报告编号
+import argparse                            # 命令行参数（--batch）
 import configparser                        # 配置解释器。
-import subprocess
 import uvicorn
+from concurrent.futures import ThreadPoolExecutor   # 批量生成工作线程池
+from typing import Callable, List           # 类型标注：阶段回调
 # ========== 修正项目模块搜索路径 ==========
 # 本文件位于 detection/modules/ 或 detection 根目录下
 # PROJECT_ROOT 指向项目的根目录，以便导入 modules 下的自定义模块
@@ -60,7 +66,7 @@ except Exception as e:
 try:
     from modules import add_statistic_result as _add_statistic_result
 except Exception as e:
-    _report_embedder = None
+    _add_statistic_result = None
     print(f"⚠️  未找到 add_statistic_result 模块：{e}")
 
 
@@ -68,9 +74,19 @@ except Exception as e:
 try:
     from modules import update_dic_uno as _update_dic_uno
 except Exception as e:
-    _report_embedder = None
+    _update_dic_uno = None
     print(f"⚠️  未找到 update_dic_uno 模块：{e}")
 
+# 流水线引擎：按阶段依赖调度，输入未变化的阶段从缓存恢复
+try:
+    from modules import pipeline as _pipeline
+except Exception as e:
+    _pipeline = None
+    print(f"⚠️  未找到 pipeline 模块：{e}")
+
+# 计时与资源统计模块：各阶段与子步骤的耗时、CPU、峰值内存与写出字节数（只依赖标准库，直接导入）
+from modules import timing as _timing
+
 # 服务模块：提供UI 与 数据库的服务中间件
 try:
     from modules import server_detection as _server
@@ -81,33 +97,182 @@ except Exception as e:
 log = _ut.Logger()
 
 
-def generate_report(config:configparser.ConfigParser()):
-    # ---------- 3. Excel 数据表转换为 JPG 图像 ----------
-    # 说明：
-    # excel_to_images 模块应提供 run(input_path, pdfs_dir, images_dir) 接口
-    # 功能：将 Excel 文件的每个工作表转换成对应的高分辨率图像文件
-    log.info("开始执行 Excel → JPG 转换任务 ...", "ExcelToImages")
-    _excel_to_images.run(config)
-    log.info("Excel → JPG 转换任务完成", "ExcelToImages")
-
-    # ---------- 4. Word 模板嵌入图片生成报告 ----------
-    # 说明：
-    # report_embedder 模块应提供 run(template_path, images_dir, output_dir) 接口
-    # 功能：将生成的图片嵌入 Word 模板中的表格占位符位置，输出最终巡检报告
-    log.info("开始执行 Word 模板嵌入任务 ...", "ReportEmbedder")
-    _report_embedder.run(config)
-    log.info("Word 模板嵌入任务完成", "ReportEmbedder")
-    # ---------- 5. 添加统计汇总
-    # 任务 ----------
-    log.info("开始执行 添加统计汇总开始 ...", "AddStatisticResult")
-    _add_statistic_result.run(config)
-    log.info("添加统计汇总完成", "AddStatisticResult")
-    # ---------- 6. 生成报告更新目录任务 ----------
-    log.info("开始执行 更新目录任务 ...", "cmd call UpdateDicUno")
-    generate_report_dic_cmd(config)
-    log.info("更新目录任务完成", "cmd call UpdateDicUno")
-    # ---------- 6. 结束 ----------
+def build_report_stages(config: configparser.ConfigParser, ws: "_ut.Workspace",
+                        info: dict = None) -> List["_pipeline.Stage"]:
+    """
+    报告生成流程的阶段定义（依赖、输入文件、影响结果的配置项与输出）：
+        add_statistic_result ─┐
+                              ├─→ report_embedder ─→ update_dic_uno
+        excel_to_images ──────┘
+    统计与表格渲染互不依赖，可并发执行；封面信息只影响 report_embedder 及其后的阶段。
+    """
+    Stage = _pipeline.Stage
+    rules_path = config.get("Path", "rules_path", fallback="")
+    image_format = config.get("PageConf", "image_format", fallback="jpg").strip().lower()
+    return [
+        # ---------- 巡检统计：只读取输入 Excel，结果为 {{汇总结果}} 文本 ----------
+        Stage(
+            name="add_statistic_result",
+            func=lambda results: _add_statistic_result.compute(config, ws),
+            inputs=(ws.input_path, rules_path),
+        ),
+        # ---------- Excel 数据表转换为 JPG 图像 ----------
+        Stage(
+            name="excel_to_images",
+            func=lambda results: _excel_to_images.run(config, ws),
+            inputs=(ws.input_path,),
+            params={key: config.get("PageConf", key, fallback="")
+                    for key in ("page_size", "orientation", "dpi", "image_format", "fallback_dpi")},
+            outputs=(ws.images_dir,),
+        ),
+        # ---------- Word 模板一次渲染：表格图片、{{汇总结果}} 与封面字段 ----------
+        Stage(
+            name="report_embedder",
+            func=lambda results: _report_embedder.run(
+                config, ws, summary_text=results["add_statistic_result"], info=info),
+            deps=("add_statistic_result", "excel_to_images"),
+            # 原生表格模式直接读取输入 Excel 生成表格
+            inputs=(config.get("Path", "template_path"), ws.input_path if image_format == "table" else ""),
+            params={
+                "image_format": image_format,
+                "table_font_size": config.get("PageConf", "table_font_size", fallback=""),
+                "info": info,
+            },
+            outputs=(ws.output_path,),
+        ),
+        # ---------- 生成报告更新目录任务 ----------
+        # 在本进程内刷新目录：借用常驻 soffice 实例，或复用缓存的 UNO 连接（断线自动重连）；
+        # 本进程无法导入 uno 时回退到以系统 python3 子进程运行 update_dic_uno.py
+        Stage(
+            name="update_dic_uno",
+            func=lambda results: _update_dic_uno.run(config, ws),
+            deps=("report_embedder",),
+            outputs=(ws.output_path,),
+        ),
+    ]
+
+
+def generate_report(config:configparser.ConfigParser(), on_stage: Callable[[str, str], None] = None,
+                    ws: "_ut.Workspace" = None, info: dict = None, trace: "_timing.Trace" = None) -> str:
+    """
+    执行巡检报告生成流程。
+    参数：
+        config: 配置对象
+        on_stage: 可选的阶段回调，每个阶段开始与结束时以 (阶段名, 事件) 调用，事件见 pipeline.STAGE_*
+                  （并发阶段各自成对回调，供任务队列分别记录状态与耗时）
+        ws: 本次任务的工作区（临时目录、图片目录、输出文件），未提供时使用配置文件中的默认路径
+        info: 报告基础信息（封面字段），与图片、汇总结果在同一次模板渲染中填充；未提供时封面占位符保持原样
+        trace: 计时记录（服务进程据此在任务状态中返回计时汇总），未提供时按 [Timing] 配置新建
+    返回：
+        生成的报告文件路径
+    说明：
+        各阶段由流水线引擎按依赖关系调度（见 build_report_stages），互不依赖的阶段并发执行；
+        启用 [Pipeline] 缓存时，输入文件、相关配置与上游结果均未变化的阶段直接从缓存恢复输出。
+    """
+    # 各阶段共用同一工作区，并发任务之间互不覆盖中间文件
+    if ws is None:
+        ws = _ut.create_workspace_func(config)
+
+    pipeline = _pipeline.Pipeline(
+        build_report_stages(config, ws, info),
+        cache=_pipeline.get_cache(config),
+        workers=config.getint("Pipeline", "workers", fallback=2),
+        on_stage=on_stage,
+    )
+    if trace is None:
+        trace = _timing.new_trace(config, ws.report_id or "cli")
+    if trace is None:
+        # 未启用计时
+        pipeline.run()
+    else:
+        try:
+            with trace.activate(), _timing.span("generate_report"):
+                pipeline.run()
+        finally:
+            # 本次运行的计时汇总（失败时同样输出，便于定位耗时）
+            log.info("各阶段计时汇总：\n" + _timing.format_summary(trace.summary()), "Timing")
+    skipped = [name for name, item in pipeline.report.items() if item["status"] == _pipeline.STATUS_CACHED]
+    if skipped:
+        log.info(f"以下阶段输入未变化，已从缓存恢复：{skipped}", "Pipeline")
+    # ---------- 结束 ----------
     log.info("=== 巡检报告生成器任务完成 ===")
+    return ws.output_path
+
+# ============================================================
+# 批量生成：每个机房/项目一份报告
+# ============================================================
+def generate_report_entry(config: configparser.ConfigParser, entry: dict) -> dict:
+    """
+    生成批量清单中的一份报告（独立工作区），返回该报告的结果记录；失败时不抛出异常，记录失败原因。
+    entry 为报告基础信息（与 /api/report/basic-info 的请求体相同），可附加 input_path 指定本报告的输入 Excel。
+    """
+    report_id = "REP-" + uuid.uuid4().hex[:8].upper()
+    ws = _ut.create_workspace_func(config, report_id, entry.get("input_path", ""))
+    trace = _timing.new_trace(config, report_id)
+    result = {
+        "report_id": report_id,
+        "project_name": entry.get("project_name", ""),
+        "room_name": entry.get("room_name", ""),
+        "input_path": ws.input_path,
+        "state": "succeeded",
+        "output_path": "",
+        "error": "",
+    }
+    started = time.perf_counter()
+    try:
+        if not os.path.exists(ws.input_path):
+            raise FileNotFoundError(f"输入文件不存在：{ws.input_path}")
+        result["output_path"] = generate_report(config, ws=ws, info=entry, trace=trace)
+        log.info(f"✅ 报告生成成功: {report_id} → {result['output_path']}", "Batch")
+    except Exception as e:
+        result["state"] = "failed"
+        result["error"] = str(e)
+        log.error(f"❌ 报告生成失败: {report_id}（{result['room_name']}）：{e}", "Batch")
+    finally:
+        result["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        if trace is not None:
+            result["profile"] = trace.summary()
+        # 清理本报告的中间文件，只保留输出报告
+        _ut.remove_workspace_func(ws)
+    return result
+
+
+def generate_batch(config: configparser.ConfigParser, entries: List[dict], workers: int = 1) -> List[dict]:
+    """
+    批量生成报告：在同一进程内按 workers 个工作线程调度，
+    共用已读取的配置、内存中的模板、常驻 soffice 实例池与判定规则；返回与 entries 顺序一致的结果记录。
+    """
+    log.info(f"开始批量生成 {len(entries)} 份报告，工作线程数：{workers}", "Batch")
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="batch-report") as executor:
+        results = list(executor.map(lambda entry: generate_report_entry(config, entry), entries))
+    succeeded = sum(1 for r in results if r["state"] == "succeeded")
+    log.info(f"批量生成完成：成功 {succeeded} 份，失败 {len(results) - succeeded} 份", "Batch")
+    return results
+
+
+def run_batch_manifest(config: configparser.ConfigParser, manifest_path: str, result_path: str = "") -> str:
+    """
+    执行批量清单文件（JSON）：顶层为报告基础信息列表，或 {"reports": [...]}；
+    结果清单写入 result_path（默认为 <清单文件名>.result.json），返回结果清单路径。
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    entries = manifest["reports"] if isinstance(manifest, dict) else manifest
+    workers = config.getint("ServerConf", "workers", fallback=1)
+    started = time.perf_counter()
+    results = generate_batch(config, entries, workers)
+    if not result_path:
+        result_path = os.path.splitext(manifest_path)[0] + ".result.json"
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "manifest": manifest_path,
+            "total": len(results),
+            "succeeded": sum(1 for r in results if r["state"] == "succeeded"),
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+            "reports": results,
+        }, f, ensure_ascii=False, indent=2, default=str)
+    log.info(f"批量生成结果清单：{result_path}", "Batch")
+    return result_path
 
 # ============================================================
 # 主程序入口函数
@@ -120,9 +285,13 @@ def main():
     1. 初始化路径与日志
     2. 加载配置文件 config.ini
     3. 执行服务。
-    4. 执行生成巡检报告
+    4. 执行生成巡检报告（--batch 清单文件：批量生成多份报告）
     """
     print(f">> main()")
+    parser = argparse.ArgumentParser(description="巡检报告生成器")
+    parser.add_argument("--batch", metavar="MANIFEST", help="批量生成：报告基础信息清单文件（JSON）")
+    parser.add_argument("--result", metavar="PATH", default="", help="批量生成结果清单路径（默认 <清单>.result.json）")
+    args = parser.parse_args()
     log.info("=== 巡检报告生成器启动 ===")
 
     # ---------- 初始化 ----------
@@ -146,7 +315,10 @@ def main():
     # ---------- 执行操作 ----------
     # 获取服务器配置。
     server_run = CONFIG.get("ServerConf", "server")
-    if server_run == "run":
+    if args.batch:
+        # 批量生成巡检报告。
+        run_batch_manifest(CONFIG, args.batch, args.result)
+    elif server_run == "run":
         # 执行服务。
         _server.run(CONFIG)
     else:
@@ -157,11 +329,5 @@ def main():
 # 程序启动入口
 # ============================================================
 
-def generate_report_dic_cmd(config:configparser.ConfigParser()):
-    template_path = config.get("Path", "template_path")
-    output_dir = config.get("Path", "output_dir")
-    script_path = os.path.join(os.path.dirname(__file__), "update_dic_uno.py")
-    subprocess.run(["python3", script_path, template_path, output_dir], check=True)
-
 if __name__ == "__main__":
     main()
@@ -6,7 +6,8 @@ Excel → JPG 图像生成模块（统一 LibreOffice 渲染 + 日志版）
 ------------------------------------------------------------
 功能：
     将 Excel 文件通过 LibreOffice 无头模式渲染为高保真 PDF，
-    再使用 pdf2image 将 PDF 转为 JPG。
+    再使用 pdf2image 将 PDF 转为 JPG；
+    矢量模式（image_format = svg）下改用 pdftocairo 按页导出 SVG，并附低分辨率 PNG 后备图。
 依赖：
     libreoffice、poppler-utils、pandas、pdf2image、Pillow
 """
@@ -15,12 +16,17 @@ Excel → JPG 图像生成模块（统一 LibreOffice 渲染 + 日志版）
 # 导入模块
 # ============================================================
 import os                                  # 提供文件和路径操作函数
+import re                                  # 改写 SVG 根元素的尺寸属性
 import sys                                 # 提供系统级访问，如路径与退出
 import configparser                        # 配置解释器。
 import subprocess                          # 用于执行外部命令（调用 LibreOffice）
 from pdf2image import convert_from_path    # 将 PDF 转换为 JPG 的核心函数
-from PIL import Image, ImageChops          # 处理图像（裁剪空白边）所需模块
-from typing import Dict, List              # 类型标注，用于提高代码可读性
+from pdf2image import pdfinfo_from_path    # 读取 PDF 页数，用于切分并行页范围
+from concurrent.futures import ProcessPoolExecutor  # 多进程并行栅格化
+import multiprocessing                     # 进程池启动方式（forkserver）
+from PIL import Image                      # 处理图像（裁剪空白边）所需模块
+import numpy as np                         # 在像素数组上扫描内容边界框
+from typing import Callable, Dict, Iterable, List, Tuple  # 类型标注，用于提高代码可读性
 from openpyxl import load_workbook          # 替代 pandas 用于读取 sheet
 import tempfile
 import shutil
@@ -43,33 +49,73 @@ except Exception as e:
     _ut = None
     print(f"⚠️  未找到 util 模块：{e}")
 
+# LibreOffice 常驻进程池模块（可选）
+try:
+    from modules import soffice_pool as _soffice_pool
+except Exception as e:
+    _soffice_pool = None
+    print(f"⚠️  未找到 soffice_pool 模块：{e}")
+
+# sheet 图片渲染缓存模块（可选）
+try:
+    from modules import render_cache as _render_cache
+except Exception as e:
+    _render_cache = None
+    print(f"⚠️  未找到 render_cache 模块：{e}")
+
+# 计时与资源统计模块（计时装饰器在模块导入时即被调用，不能作为可选模块）
+from modules import timing as _timing
+
+# 进度事件模块（只依赖标准库，直接导入；子进程中没有监听函数，事件由父进程补发）
+from modules import progress as _progress
+
 # 实例化日志类
 log = _ut.Logger()
 
-# 全局参数
-EXCEL_PATH = ""
-PDFS_DIR = ""
-IMAGES_DIR = ""
-OUTPUT_DIR = ""
+# 全局参数（页面设置对所有报告任务相同；路径类参数由任务工作区 Workspace 提供）
 PAGE_SIZE = 0
 ORIENTATION = ""
 DPI = 0
+RENDER_WORKERS = 1
+RENDER_WINDOW = 1
+RENDER_TO_DISK = False
+INCREMENTAL = False
+IMAGE_FORMAT = "jpg"
+FALLBACK_DPI = 150
+# 矢量模式 PNG 后备图的调色板颜色数：表格图片以线条、文字与少量底色为主，
+# 调色板 PNG 约为 RGB PNG 的 1/3，避免后备图抵消 SVG 的体积优势
+FALLBACK_COLORS = 64
+
+def content_bbox(img: Image.Image):
+    """
+    计算图像中与左上角背景色不同的内容区域边界框 (left, top, right, bottom)，无内容时返回 None。
+    在灰度图的 NumPy 视图上按行/列投影扫描，不再生成整页背景图与差异图。
+    """
+    gray = np.asarray(img.convert("L"))       # 灰度视图（原图 1/3 大小）
+    mask = gray != gray[0, 0]                 # 与背景色不同的像素
+    rows = np.flatnonzero(mask.any(axis=1))   # 含内容的行
+    cols = np.flatnonzero(mask.any(axis=0))   # 含内容的列
+    if rows.size == 0:
+        return None
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+def crop_whitespace_image(img: Image.Image) -> Image.Image:
+    """在内存中裁剪图像四周的空白边，返回裁剪后的图像（无内容时返回原图）。"""
+    bbox = content_bbox(img)                  # 获取有效内容的边界框
+    return img.crop(bbox) if bbox else img    # 裁剪图像到内容区域
 
 def crop_whitespace(image_path: str):
-    """裁剪 JPG 图像四周的空白边。"""
+    """裁剪 JPG 图像文件四周的空白边（覆盖保存）。"""
     img = Image.open(image_path)              # 打开指定的图像文件
-    bg = Image.new(img.mode, img.size, img.getpixel((0, 0)))  # 生成一张背景色相同的空图
-    diff = ImageChops.difference(img, bg)     # 计算原图与背景的差异区域
-    bbox = diff.getbbox()                     # 获取有效内容的边界框
+    bbox = content_bbox(img)                  # 获取有效内容的边界框
     if bbox:                                  # 如果存在非空白区域
-        cropped = img.crop(bbox)              # 裁剪图像到内容区域
-        cropped.save(image_path)              # 覆盖保存原文件
+        img.crop(bbox).save(image_path)       # 裁剪并覆盖保存原文件
         log.info(f"已裁剪白边：{image_path}")  # 输出日志提示裁剪完成
 
-def load_sheet_names() -> List[str]:
+def load_sheet_names(excel_path: str) -> List[str]:
     """ 使用 openpyxl 加载 Excel 文件，提取所有工作表名称。"""
     # 以只读模式打开 Excel 文件，提高加载效率
-    wb = load_workbook(EXCEL_PATH, read_only=True)
+    wb = load_workbook(excel_path, read_only=True)
     # 获取当前 Excel 中的所有工作表名称
     names = wb.sheetnames 
     # 关闭文件，释放资源
@@ -77,23 +123,58 @@ def load_sheet_names() -> List[str]:
     # 返回 sheet 名称列表
     return names
 
-def adjust_excel() -> str:
+def trim_workbook(wb, keep: Iterable[str]) -> None:
+    """
+    增量渲染：工作簿中只保留 keep 中的 sheet，其余 sheet 不参与 PDF 导出。
+    保留的 sheet 含跨表公式时改为隐藏其余 sheet（LibreOffice 不导出隐藏的 sheet），避免公式引用失效。
+    """
+    keep = set(keep)
+    kept = [sheet for sheet in wb.worksheets if sheet.title in keep]
+    if not kept:
+        return
+    # 检查保留的 sheet 是否引用其他 sheet
+    cross_ref = any(
+        cell.data_type == "f" and "!" in str(cell.value)
+        for sheet in kept for row in sheet.iter_rows() for cell in row
+    )
+    for sheet in list(wb.worksheets):
+        if sheet.title in keep:
+            continue
+        if cross_ref:
+            sheet.sheet_state = "hidden"
+        else:
+            wb.remove(sheet)
+    wb.active = wb.worksheets.index(kept[0])
+    log.info(f"✂️ 增量渲染：只导出 {len(kept)} 个 sheet（其余 sheet 已{'隐藏' if cross_ref else '移除'}）")
+
+@_timing.timed("adjust_excel")
+def adjust_excel(ws: "_ut.Workspace", fingerprints: Dict[str, str] = None,
+                 select_sheets: Callable[[Dict[str, str]], List[str]] = None) -> str:
     """ Excel 页面设置预处理模块,将 Excel 每个 sheet 设置为“单页模式”，供 LibreOffice 转 PDF 时使用。
+    若提供 fingerprints 字典，则顺带计算每个 sheet 的内容指纹（sheet 名 → 指纹），供渲染缓存使用；
+    不可缓存的 sheet（见 render_cache.sheet_fingerprint）不在字典中。
+    若提供 select_sheets，则以指纹字典调用它，副本中只保留其返回的 sheet（增量渲染）。
+    出错时：增量渲染直接抛出（副本未裁剪，页与 sheet 无法对应）；否则记录错误，清空指纹字典（不缓存本次渲染结果）后返回副本路径。
     """
-    log.info(f"🔧 开始调整 Excel 打印配置为单页模式：{EXCEL_PATH}")
+    log.info(f"🔧 开始调整 Excel 打印配置为单页模式：{ws.input_path}")
+    adjusted_path = ""
     try:
-        # PDFS_DIR目录默认是"tmp/pdfs", 调整后的临时文件保存在"tmp/"目录下。
-        tmp_dir = os.path.dirname(os.path.abspath(PDFS_DIR))
+        # 调整后的临时文件保存在本任务工作区的临时目录下（默认是"tmp/"）。
+        tmp_dir = ws.temp_dir
 
         os.makedirs(tmp_dir, exist_ok=True)
 
-        # 删除临时目录下的文件。
-        _ut.remove_path_recursio_files_func(tmp_dir)        
+        # 只删除本工作区的中间文件：临时目录下的文件，以及 PDF、图片目录下的全部文件。
+        # 不递归删除整个临时目录，避免误删并发任务位于 tmp/<report_id>/ 下的工作区。
+        _ut.remove_path_files_func(tmp_dir)
+        for d in (ws.pdfs_dir, ws.images_dir):
+            if os.path.isdir(d):
+                _ut.remove_path_recursio_files_func(d)
 
         # 1️ 创建临时目录并复制原始 Excel 文件
-        adjusted_path = _ut.gen_target_file_name_func(EXCEL_PATH, tmp_dir, "临时")
+        adjusted_path = _ut.gen_target_file_name_func(ws.input_path, tmp_dir, "临时")
         # 将原本复制一个副本。
-        shutil.copy2(EXCEL_PATH, adjusted_path)
+        shutil.copy2(ws.input_path, adjusted_path)
         log.info(f"📁 创建临时副本：{adjusted_path}")
  
         # 2️ 使用 openpyxl 加载副本
@@ -105,6 +186,15 @@ def adjust_excel() -> str:
         # 3️ 遍历每个 sheet，应用打印设置
         for idx, sheet in enumerate(wb.worksheets, start=1):
             log.info(f"🔍 正在处理第 {idx} 个 sheet：{sheet.title}")
+            # 计算内容指纹（复用已加载的工作簿，不再重复解析）
+            # 含公式、图表等渲染结果依赖其他 sheet 的 sheet 没有指纹，每次都重新渲染且不写入缓存
+            if fingerprints is not None:
+                fingerprint = _render_cache.sheet_fingerprint(
+                    sheet, PAGE_SIZE, ORIENTATION, FALLBACK_DPI if IMAGE_FORMAT == "svg" else DPI, IMAGE_FORMAT)
+                if fingerprint is None:
+                    log.info(f"sheet {sheet.title} 含公式或图表等，不使用渲染缓存")
+                else:
+                    fingerprints[sheet.title] = fingerprint
             # 设置打印缩放参数，确保整个sheet压缩为单页显示
             ps = sheet.page_setup
             ps.fitToWidth = 1                 # 一页宽度内显示全部列
@@ -120,24 +210,52 @@ def adjust_excel() -> str:
             sheet.print_options.horizontalCentered = True
             sheet.print_options.verticalCentered = True
 
-        # 4️ 保存副本
+        # 4️ 增量渲染：只保留需要重新渲染的 sheet
+        if select_sheets is not None:
+            trim_workbook(wb, select_sheets(fingerprints))
+
+        # 5️ 保存副本
         wb.save(adjusted_path)
         wb.close()
         log.info(f"💾 保存完成，已修改 {modified_count} 个 sheet")
 
-        # 5️ 返回副本路径
+        # 6️ 返回副本路径
         log.info(f"✅ Excel 页面调整完成，输出路径：{adjusted_path}")
         #print(f">> adjusted_path = {adjusted_path}")
         return adjusted_path
 
     except Exception as e:
         log.error(f"❌ 出现错误：{str(e)}")
+        if select_sheets is not None:
+            raise
+        if fingerprints is not None:
+            fingerprints.clear()
         return adjusted_path
 
-def excel_to_libreoffice_pdf() -> str:
-    """调用 LibreOffice 将 Excel 转换为 PDF。"""
-    # 调整输入的 Excel 文件为单页 sheet Excel文件。
-    adjusted_excel_path = adjust_excel()
+def excel_to_pool_pdf(adjusted_excel_path: str, pdfs_dir: str, pool) -> str:
+    """借用常驻 soffice 实例，通过 UNO 将 Excel 转换为 PDF。"""
+    log.info("使用常驻 soffice 实例（UNO）渲染 Excel → PDF ...")
+    os.makedirs(pdfs_dir, exist_ok=True)
+    pdf_path = os.path.join(pdfs_dir, Path(adjusted_excel_path).stem + ".pdf")
+    try:
+        with pool.acquire() as inst:
+            log.info(f"使用 soffice 实例 #{inst.index}（端口 {inst.port}）")
+            inst.convert(adjusted_excel_path, pdf_path, "calc_pdf_Export")
+    except Exception as e:
+        log.error(f"Excel → PDF 渲染异常：{e}")
+        raise
+    log.info(f"✅ 已生成 PDF：{pdf_path}")
+    return pdf_path
+
+@_timing.timed("soffice_convert")
+def excel_to_libreoffice_pdf(ws: "_ut.Workspace", pool=None, adjusted_excel_path: str = "") -> str:
+    """调用 LibreOffice 将 Excel 转换为 PDF（提供进程池时复用常驻实例）。"""
+    # 调整输入的 Excel 文件为单页 sheet Excel文件（调用方已调整时直接使用）。
+    if not adjusted_excel_path:
+        adjusted_excel_path = adjust_excel(ws)
+    # 有常驻实例池时通过 UNO 转换，避免冷启动 soffice
+    if pool is not None:
+        return excel_to_pool_pdf(adjusted_excel_path, ws.pdfs_dir, pool)
     # 将 Excel 渲染为PDF。
     log.info("使用 soffice --headless 渲染 Excel → PDF ...")
     try:
@@ -146,9 +264,14 @@ def excel_to_libreoffice_pdf() -> str:
             "soffice",
             "--headless",                           # 无界面模式
             "--convert-to", "pdf",                  # 输出格式 PDF
-            "--outdir", PDFS_DIR,       # 输出目录
+            "--outdir", ws.pdfs_dir,    # 输出目录
             adjusted_excel_path         # 输入文件路径
         ]
+        # 任务工作区使用独立的 LibreOffice 用户配置目录，
+        # 避免多个 soffice 进程争用同一配置目录的锁导致转换失败。
+        if ws.report_id:
+            profile_url = Path(os.path.abspath(os.path.join(ws.temp_dir, "lo_profile"))).as_uri()
+            cmd.insert(1, f"-env:UserInstallation={profile_url}")
         # 显示执行命令信息。
         log.info(f"执行命令：{' '.join(cmd)}")
         # 执行命令行调用
@@ -158,7 +281,7 @@ def excel_to_libreoffice_pdf() -> str:
             log.error(f"LibreOffice 转换失败：{result.stderr.strip()}")
             raise RuntimeError(f"LibreOffice 转换失败：{result.stderr.strip()}")
         # 为 pdf_path 赋值。
-        pdf_path = os.path.join(PDFS_DIR, Path(adjusted_excel_path).stem + ".pdf")
+        pdf_path = os.path.join(ws.pdfs_dir, Path(adjusted_excel_path).stem + ".pdf")
     except Exception as e:
         log.error(f"Excel → PDF 渲染异常：{e}")
         raise
@@ -166,34 +289,198 @@ def excel_to_libreoffice_pdf() -> str:
     # 返回生成的 PDF 路径
     return pdf_path 
 
-def pdf_to_jpgs(pdf_path: str, sheet_names: List[str]) -> Dict[str, str]:
-    """将 PDF 多页转换为 JPG 并与 sheet 对齐命名。"""
+def page_sheet_name(page_no: int, sheet_names: List[str]) -> str:
+    """返回第 page_no 页（从 1 开始）对应的 sheet 名；页数多于 sheet 时用 PageX 命名。"""
+    return sheet_names[page_no - 1] if page_no <= len(sheet_names) else f"Page{page_no}"
+
+@_timing.timed("crop_save")
+def save_cropped_page(img: Image.Image, name: str, images_dir: str) -> str:
+    """在内存中裁剪单页图像的白边，并一次性保存为 JPG 文件，返回文件路径。"""
+    # 生成 JPG 输出路径
+    jpg_path = os.path.join(images_dir, f"{name}.jpg")
+    # 在内存中裁剪白边，并一次性保存为 JPG 文件
+    crop_whitespace_image(img).save(jpg_path, "JPEG")
+    # 输出日志
+    log.info(f"生成 JPG（已裁剪白边）：{jpg_path}")
+    _progress.emit("sheet_rendered", sheet=name, cached=False)
+    return jpg_path
+
+@_timing.timed("render_page_range")
+def render_page_range(pdf_path: str, first_page: int, last_page: int, sheet_names: List[str],
+                      images_dir: str, dpi: int, window: int = 1, scratch_dir: str = "") -> Dict[str, str]:
+    """
+    将 PDF 的第 first_page ~ last_page 页转为 JPG 并裁剪白边（可在子进程中执行）。
+    栅格化结果以无损 PPM 交给 PIL，在内存中裁剪后只编码、写盘一次 JPEG。
+    按 window 页为一批流式处理：每批栅格化、保存后立即释放，峰值内存与 sheet 数无关。
+    scratch_dir 非空时由 pdftoppm 直接写出页面文件（paths_only），逐页打开处理后删除，
+    整批页面像素不在 Python 中同时驻留。
+    """
+    window = max(1, window)
+    # 初始化映射字典：sheet_name → JPG 文件路径
+    mapping: Dict[str, str] = {}
+    for w_first in range(first_page, last_page + 1, window):
+        w_last = min(w_first + window - 1, last_page)
+        if scratch_dir:
+            # pdftoppm 写出本批页面文件，只返回路径
+            os.makedirs(scratch_dir, exist_ok=True)
+            with _timing.span("convert_from_path", first_page=w_first, last_page=w_last):
+                page_files = convert_from_path(pdf_path, dpi, fmt="ppm", first_page=w_first, last_page=w_last,
+                                               output_folder=scratch_dir, output_file=f"page{w_first:04d}",
+                                               paths_only=True)
+            for page_no, page_file in enumerate(page_files, start=w_first):
+                name = page_sheet_name(page_no, sheet_names)
+                with Image.open(page_file) as img:
+                    mapping[name] = save_cropped_page(img, name, images_dir)
+                os.remove(page_file)
+        else:
+            # 调用 pdf2image 将本批页转为图像对象（ppm：避免 pdftoppm 先做一次有损 JPEG 编码）
+            with _timing.span("convert_from_path", first_page=w_first, last_page=w_last):
+                images = convert_from_path(pdf_path, dpi, fmt="ppm", first_page=w_first, last_page=w_last)
+            for page_no, img in enumerate(images, start=w_first):
+                name = page_sheet_name(page_no, sheet_names)
+                mapping[name] = save_cropped_page(img, name, images_dir)
+                img.close()
+            # 释放本批图像
+            del images
+    return mapping
+
+def set_svg_attr(tag: str, name: str, value: str) -> str:
+    """设置（或添加）SVG 起始标签中的属性。"""
+    pattern = re.compile(rf'\s{name}="[^"]*"')
+    if pattern.search(tag):
+        return pattern.sub(f' {name}="{value}"', tag, count=1)
+    return tag[:-1] + f' {name}="{value}">'
+
+def crop_svg(svg_text: str, bbox: Tuple[int, int, int, int], dpi: int) -> str:
+    """
+    将 pdftocairo 导出的整页 SVG 裁剪到内容区域。
+    bbox 为同一页按 dpi 栅格化后的内容边界框（像素），换算为 pt 后改写根元素的 viewBox 与宽高。
+    """
+    left, top, right, bottom = (v * 72.0 / dpi for v in bbox)
+    width, height = right - left, bottom - top
+
+    def fix(match):
+        tag = match.group(0)
+        tag = set_svg_attr(tag, "width", f"{width:.2f}pt")
+        tag = set_svg_attr(tag, "height", f"{height:.2f}pt")
+        return set_svg_attr(tag, "viewBox", f"{left:.2f} {top:.2f} {width:.2f} {height:.2f}")
+
+    return re.sub(r"<svg\b[^>]*>", fix, svg_text, count=1)
+
+@_timing.timed("render_vector_page_range")
+def render_vector_page_range(pdf_path: str, first_page: int, last_page: int, sheet_names: List[str],
+                             images_dir: str, fallback_dpi: int) -> Dict[str, str]:
+    """
+    矢量模式：将 PDF 的第 first_page ~ last_page 页逐页导出为 SVG（可在子进程中执行）。
+    每页先按 fallback_dpi 栅格化，用于计算内容边界框并保存裁剪后的 PNG 后备图（<sheet>.png，FALLBACK_COLORS 色调色板）；
+    再调用 pdftocairo 导出该页 SVG，裁剪到同一内容区域后保存为 <sheet>.svg。
+    """
+    # 初始化映射字典：sheet_name → SVG 文件路径
+    mapping: Dict[str, str] = {}
+    for page_no in range(first_page, last_page + 1):
+        name = page_sheet_name(page_no, sheet_names)
+        # 低分辨率栅格化：计算内容边界框并保存 PNG 后备图
+        img = convert_from_path(pdf_path, fallback_dpi, fmt="ppm", first_page=page_no, last_page=page_no)[0]
+        bbox = content_bbox(img) or (0, 0, img.width, img.height)
+        img.crop(bbox).quantize(FALLBACK_COLORS).save(os.path.join(images_dir, f"{name}.png"), "PNG", optimize=True)
+        img.close()
+        # pdftocairo 导出单页 SVG（输出文件名按原样使用）
+        svg_path = os.path.join(images_dir, f"{name}.svg")
+        cmd = ["pdftocairo", "-svg", "-f", str(page_no), "-l", str(page_no), pdf_path, svg_path]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"pdftocairo 导出 SVG 失败：{result.stderr.strip()}")
+        # 裁剪到内容区域
+        with open(svg_path, "r", encoding="utf-8") as f:
+            svg_text = f.read()
+        with open(svg_path, "w", encoding="utf-8") as f:
+            f.write(crop_svg(svg_text, bbox, fallback_dpi))
+        log.info(f"生成 SVG（已裁剪白边，附 PNG 后备图）：{svg_path}")
+        mapping[name] = svg_path
+        _progress.emit("sheet_rendered", sheet=name, cached=False)
+    return mapping
+
+def split_page_ranges(num_pages: int, workers: int) -> List[Tuple[int, int]]:
+    """将 1 ~ num_pages 页均分为至多 workers 个连续页范围 [(first, last), ...]。"""
+    workers = max(1, min(workers, num_pages))
+    size, extra = divmod(num_pages, workers)
+    ranges, first = [], 1
+    for i in range(workers):
+        last = first + size - 1 + (1 if i < extra else 0)
+        ranges.append((first, last))
+        first = last + 1
+    return ranges
+
+def split_page_list(pages: List[int], workers: int) -> List[Tuple[int, int]]:
+    """将待渲染页码列表按连续页段分组，并按页数比例把各页段继续切分，供 workers 个进程并行处理。"""
+    # 分组为连续页段 [(first, last), ...]
+    runs: List[Tuple[int, int]] = []
+    for page_no in sorted(set(pages)):
+        if runs and page_no == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], page_no)
+        else:
+            runs.append((page_no, page_no))
+    total = sum(last - first + 1 for first, last in runs)
+    ranges: List[Tuple[int, int]] = []
+    for first, last in runs:
+        length = last - first + 1
+        parts = max(1, round(workers * length / total))
+        ranges.extend((first + a - 1, first + b - 1) for a, b in split_page_ranges(length, parts))
+    return ranges
+
+@_timing.timed("pdf_to_images")
+def pdf_to_jpgs(pdf_path: str, sheet_names: List[str], images_dir: str, workers: int = 1,
+                window: int = 1, scratch_dir: str = "", pages: List[int] = None,
+                image_format: str = "jpg") -> Dict[str, str]:
+    """
+    将 PDF 多页转换为 JPG 并与 sheet 对齐命名。workers > 1 时按页范围分配到进程池并行栅格化与裁剪；
+    每个进程内按 window 页流式处理，scratch_dir 非空时页面像素经由磁盘文件传递（见 render_page_range）。
+    pages 非空时只渲染这些页（页码从 1 开始，多出 sheet 数的页总是渲染），其余页由调用方从缓存取得。
+    image_format 为 svg 时改为逐页导出 SVG 与 PNG 后备图（见 render_vector_page_range）。
+    """
     # 确保 JPG 输出目录存在
-    os.makedirs(IMAGES_DIR, exist_ok=True) 
+    os.makedirs(images_dir, exist_ok=True) 
     # 输出开始转换日志
     log.info("开始 PDF → JPG 拆分 ...") 
-    # 调用 pdf2image 将 PDF 每页转为图像对象
-    images = convert_from_path(pdf_path, DPI, fmt="jpeg") 
     # 获取 PDF 页数与 Excel 工作表数量
-    num_pages, num_sheets = len(images), len(sheet_names) 
+    num_pages, num_sheets = pdfinfo_from_path(pdf_path)["Pages"], len(sheet_names)
     # 输出对比信息
     log.info(f"PDF 页数：{num_pages}，Excel 工作表数：{num_sheets}") 
-    # 初始化映射字典：sheet_name → JPG 文件路径
+    # 确定待渲染页，并按并行进程数切分页范围
+    if pages is None:
+        ranges = split_page_ranges(num_pages, workers) if num_pages else []
+    else:
+        selected = [p for p in pages if p <= num_pages] + list(range(num_sheets + 1, num_pages + 1))
+        ranges = split_page_list(selected, workers) if selected else []
+        log.info(f"只渲染未命中缓存的页：{sorted(set(selected))}")
+    # 按输出格式选择页范围处理函数及其参数
+    if image_format == "svg":
+        render_func, render_args = render_vector_page_range, (sheet_names, images_dir, FALLBACK_DPI)
+    else:
+        render_func, render_args = render_page_range, (sheet_names, images_dir, DPI, window, scratch_dir)
+    # 初始化映射字典：sheet_name → 图片文件路径
     mapping: Dict[str, str] = {}
-    # 遍历每一页 PDF 图像
-    for i, img in enumerate(images):          
-        # 若页数多于 sheet，用 PageX 命名
-        name = sheet_names[i] if i < num_sheets else f"Page{i+1}" 
-        # 生成 JPG 输出路径
-        jpg_path = os.path.join(IMAGES_DIR, f"{name}.jpg")         
-        # 保存当前页为 JPG 文件
-        img.save(jpg_path, "JPEG")          
-        # 调用函数裁剪白边
-        crop_whitespace(jpg_path)            
-        # 记录映射关系
-        mapping[name] = jpg_path             
-        # 输出日志
-        log.info(f"生成 JPG：{jpg_path}")  
+    if len(ranges) <= 1:
+        # 单进程：在当前进程内顺序处理
+        for first, last in ranges:
+            mapping.update(render_func(pdf_path, first, last, *render_args))
+    else:
+        log.info(f"使用 {len(ranges)} 个进程并行栅格化：{ranges}")
+        # 服务进程中存在多个线程（事件循环、任务队列工作线程），fork 可能复制被其他线程持有的锁而死锁，
+        # 改用 forkserver 启动子进程；页范围处理函数均为模块级函数，可在子进程中按模块路径导入
+        with ProcessPoolExecutor(max_workers=len(ranges),
+                                 mp_context=multiprocessing.get_context("forkserver")) as executor:
+            futures = [
+                executor.submit(render_func, pdf_path, first, last, *render_args)
+                for first, last in ranges
+            ]
+            # 按页范围顺序合并，保持 sheet 顺序
+            for future in futures:
+                result = future.result()
+                mapping.update(result)
+                # 子进程中的进度事件无人接收，取回结果后在父进程发出
+                for name in result:
+                    _progress.emit("sheet_rendered", sheet=name, cached=False)
 
     # 若 PDF 页数少于 sheet 数，说明部分表未匹配
     if num_pages < num_sheets:
@@ -202,57 +489,179 @@ def pdf_to_jpgs(pdf_path: str, sheet_names: List[str]) -> Dict[str, str]:
     # 返回 sheet → JPG 的映射关系
     return mapping                            
 
-def excel_to_jpgs() -> Dict[str, str]:
-    """主函数：Excel → PDF → JPG """
-    if not os.path.exists(EXCEL_PATH):               # 若输入 Excel 文件不存在
-        log.error(f"Excel 文件不存在：{EXCEL_PATH}")  # 输出错误
-        raise FileNotFoundError(EXCEL_PATH)          # 抛出异常终止程序
+def render_scratch_dir(ws: "_ut.Workspace") -> str:
+    """页面文件落盘模式：pdftoppm 输出写入本工作区的临时页面目录；未启用时返回空字符串。"""
+    return os.path.join(ws.temp_dir, "pages") if RENDER_TO_DISK else ""
+
+def log_manifest_diff(previous: Dict[str, str], current: Dict[str, str]) -> None:
+    """比对上次运行的指纹清单，输出新增、变化、删除的 sheet。"""
+    if not previous:
+        log.info("未找到上次运行的指纹清单，按首次运行处理。")
+        return
+    added = [name for name in current if name not in previous]
+    changed = [name for name in current if name in previous and previous[name] != current[name]]
+    removed = [name for name in previous if name not in current]
+    log.info(f"与上次运行相比：新增 {added}，变化 {changed}，删除 {removed}")
+
+def sheet_image_paths(name: str, images_dir: str) -> List[str]:
+    """sheet 对应的输出图片文件：JPG 模式为 [<sheet>.jpg]；矢量模式为 [<sheet>.svg, <sheet>.png]。"""
+    if IMAGE_FORMAT == "svg":
+        return [os.path.join(images_dir, f"{name}.svg"), os.path.join(images_dir, f"{name}.png")]
+    return [os.path.join(images_dir, f"{name}.jpg")]
+
+def restore_cached_sheets(cache, fingerprints: Dict[str, str], sheet_names: List[str],
+                          images_dir: str) -> Dict[str, str]:
+    """将命中渲染缓存的 sheet 图片复制到 images_dir，返回 sheet_name → 图片路径（只含命中的 sheet）。"""
+    os.makedirs(images_dir, exist_ok=True)
+    mapping: Dict[str, str] = {}
+    for name in sheet_names:
+        paths = sheet_image_paths(name, images_dir)
+        if name in fingerprints and cache.get(fingerprints[name], *paths):
+            mapping[name] = paths[0]
+            log.info(f"🎯 渲染缓存命中：{name}")
+            _progress.emit("sheet_rendered", sheet=name, cached=True)
+        else:
+            log.info(f"渲染缓存未命中：{name}")
+    log.info(f"渲染缓存：命中 {len(mapping)} / {len(sheet_names)}，累计命中率 {cache.hit_rate():.1%}")
+    return mapping
+
+def excel_to_jpgs(ws: "_ut.Workspace", pool=None, cache=None) -> Dict[str, str]:
+    """主函数：Excel → PDF → JPG（提供渲染缓存时，未变化的 sheet 直接取缓存图片）"""
+    if not os.path.exists(ws.input_path):               # 若输入 Excel 文件不存在
+        log.error(f"Excel 文件不存在：{ws.input_path}")  # 输出错误
+        raise FileNotFoundError(ws.input_path)          # 抛出异常终止程序
 
     # 获取所有工作表名
-    sheet_names = load_sheet_names() 
-    # excel → PDF
-    pdf_path = excel_to_libreoffice_pdf()
-    # PDF → JPG 拆页转换
-    mapping = pdf_to_jpgs(pdf_path, sheet_names) 
+    sheet_names = load_sheet_names(ws.input_path) 
+    # 未启用渲染缓存：全量渲染
+    if cache is None:
+        # excel → PDF
+        pdf_path = excel_to_libreoffice_pdf(ws, pool)
+        # PDF → JPG 拆页转换
+        mapping = pdf_to_jpgs(pdf_path, sheet_names, ws.images_dir, RENDER_WORKERS, RENDER_WINDOW,
+                              render_scratch_dir(ws), image_format=IMAGE_FORMAT)
+        log.info("🎯 所有 JPG 文件已生成。")
+        return mapping
+
+    # 启用渲染缓存：调整 Excel 页面设置的同时计算每个 sheet 的内容指纹，命中的 sheet 直接取缓存图片
+    fingerprints: Dict[str, str] = {}
+    mapping: Dict[str, str] = {}
+    manifest_name = Path(ws.input_path).name
+
+    def restore(fps: Dict[str, str]) -> List[str]:
+        """从缓存恢复未变化的 sheet 图片，返回需要重新渲染的 sheet 名。"""
+        log_manifest_diff(cache.load_manifest(manifest_name), fps)
+        mapping.update(restore_cached_sheets(cache, fps, sheet_names, ws.images_dir))
+        return [name for name in sheet_names if name not in mapping]
+
+    rendered: Dict[str, str] = {}
+    incremental = INCREMENTAL
+    if incremental:
+        # 增量模式：临时工作簿只保留需要重新渲染的 sheet，soffice 只转换这些 sheet。
+        # 需要重新渲染的 sheet 由缓存是否命中决定（缓存图片可能已被淘汰），指纹清单只用于日志比对
+        try:
+            adjusted_excel_path = adjust_excel(ws, fingerprints, restore)
+        except Exception as e:
+            log.warn(f"增量渲染预处理失败（{e}），回退到全量渲染")
+            incremental = False
+        else:
+            dirty = [name for name in sheet_names if name not in mapping]
+            if dirty:
+                pdf_path = excel_to_libreoffice_pdf(ws, pool, adjusted_excel_path)
+                # PDF 只含 dirty sheet，按顺序逐页对应；页数不一致时无法确定对应关系
+                num_pages = pdfinfo_from_path(pdf_path)["Pages"]
+                if num_pages == len(dirty):
+                    rendered = pdf_to_jpgs(pdf_path, dirty, ws.images_dir, RENDER_WORKERS, RENDER_WINDOW,
+                                           render_scratch_dir(ws), image_format=IMAGE_FORMAT)
+                else:
+                    log.warn(f"增量渲染 PDF 页数 {num_pages} 与待渲染 sheet 数 {len(dirty)} 不一致，回退到全量渲染")
+                    incremental = False
+    if not incremental:
+        # 全量预处理：PDF 含全部 sheet，只栅格化 dirty sheet 对应的页
+        mapping.clear()
+        fingerprints.clear()
+        adjusted_excel_path = adjust_excel(ws, fingerprints)
+        dirty = restore(fingerprints)
+        if dirty:
+            # excel → PDF
+            pdf_path = excel_to_libreoffice_pdf(ws, pool, adjusted_excel_path)
+            # PDF → JPG 拆页转换
+            pages = [page_no for page_no, name in enumerate(sheet_names, start=1) if name in dirty]
+            rendered = pdf_to_jpgs(pdf_path, sheet_names, ws.images_dir, RENDER_WORKERS, RENDER_WINDOW,
+                                   render_scratch_dir(ws), pages, IMAGE_FORMAT)
+
+    if dirty:
+        # 新渲染的 sheet 图片存入缓存
+        for name in rendered:
+            if name in fingerprints:
+                cache.put(fingerprints[name], *sheet_image_paths(name, ws.images_dir))
+        mapping.update(rendered)
+    else:
+        log.info("🎯 全部 sheet 命中渲染缓存，跳过 LibreOffice 与 PDF 栅格化。")
+    # 记录本次运行的指纹清单，供下次比对
+    cache.save_manifest(manifest_name, fingerprints)
+
+    # 按 sheet 顺序合并缓存图片与新渲染图片
+    ordered = {name: mapping[name] for name in sheet_names if name in mapping}
+    ordered.update(mapping)
+    mapping = ordered
     # 输出完成信息
-    log.info("🎯 所有 JPG 文件已生成。")
+    log.info("🎯 所有图片文件已生成。")
     # 返回转换结果字典
     return mapping
 
-def run(config: configparser.ConfigParser):
-    """外部调用接口。"""    
+def run(config: configparser.ConfigParser, ws: "_ut.Workspace" = None):
+    """外部调用接口。ws 为本次任务的工作区，未提供时使用配置文件中的默认路径。"""    
     # 提取配置文件参数项
-    global EXCEL_PATH, PDFS_DIR, IMAGES_DIR, OUTPUT_DIR, PAGE_SIZE, ORIENTATION, DPI
-    EXCEL_PATH = config.get("Path", "input_path")
-    PDFS_DIR = config.get("Path", "pdfs_dir")
-    IMAGES_DIR = config.get("Path", "images_dir")
-    OUTPUT_DIR = config.get("Path", "output_dir")
+    global PAGE_SIZE, ORIENTATION, DPI, RENDER_WORKERS, RENDER_WINDOW, RENDER_TO_DISK, INCREMENTAL
+    global IMAGE_FORMAT, FALLBACK_DPI
     PAGE_SIZE = config.getint("PageConf", "page_size")
     ORIENTATION = config.get("PageConf", "orientation")
     DPI = config.getint("PageConf", "dpi")
+    RENDER_WORKERS = config.getint("PageConf", "render_workers", fallback=1)
+    RENDER_WINDOW = config.getint("PageConf", "render_window", fallback=1)
+    RENDER_TO_DISK = config.getboolean("PageConf", "render_to_disk", fallback=False)
+    INCREMENTAL = config.getboolean("RenderCache", "incremental", fallback=False)
+    IMAGE_FORMAT = config.get("PageConf", "image_format", fallback="jpg").strip().lower()
+    FALLBACK_DPI = config.getint("PageConf", "fallback_dpi", fallback=150)
+    if ws is None:
+        ws = _ut.create_workspace_func(config)
+    # 原生表格模式：报告中的表格由 report_embedder 直接从 Excel 生成，无需渲染图片
+    if IMAGE_FORMAT == "table":
+        log.info("原生表格模式：跳过 Excel → PDF → 图片转换。")
+        return
+    # 常驻 soffice 实例池（未启用时为 None，回退到命令行转换）
+    pool = _soffice_pool.get_pool(config) if _soffice_pool is not None else None
+    # sheet 图片渲染缓存（未启用时为 None）
+    cache = _render_cache.get_cache(config) if _render_cache is not None else None
 
     log.info("run() 启动 Excel → JPG 转换流程")     # 输出流程开始日志
-    mapping = excel_to_jpgs()                      # 调用主函数执行转换
+    mapping = excel_to_jpgs(ws, pool, cache)       # 调用主函数执行转换
     log.info("=== 输出文件映射 ===")                # 输出结果映射表头
     for k, v in mapping.items():                   # 遍历每个 sheet 对应的 JPG 文件
         log.info(f"{k} -> {v}")                    # 输出映射关系日志
-    log.info(f"✅ 输出目录：{IMAGES_DIR}")          # 输出最终目录路径
+    log.info(f"✅ 输出目录：{ws.images_dir}")       # 输出最终目录路径
 
 # ============================================================
 # main 程序入口
 # ============================================================
 if __name__ == "__main__":                           # 若脚本以主程序方式运行
     """命令行入口函数（教学示例）。"""
-    #EXCEL_PATH = "../data/销售统计表.xlsx"           # 设置输入 Excel 文件路径
-    EXCEL_PATH = "../data/巡检报告数据集(1.0).xlsx"   # 设置输入 Excel 文件路径    
-    PDFS_DIR = "../tmp/pdfs/"                        # 设置 PDF 输出目录
-    IMAGES_DIR = "../tmp/images/"                    # 设置 JPG 输出目录
+    ws = _ut.Workspace(
+        report_id="",
+        #input_path="../data/销售统计表.xlsx",         # 设置输入 Excel 文件路径
+        input_path="../data/巡检报告数据集(1.0).xlsx",  # 设置输入 Excel 文件路径
+        temp_dir="../tmp/",                            # 设置临时文件目录
+        pdfs_dir="../tmp/pdfs/",                       # 设置 PDF 输出目录
+        images_dir="../tmp/images/",                   # 设置 JPG 输出目录
+        output_path="",
+    )
     PAGE_SIZE = 8
     ORIENTATION = "portrait"
     DPI = 300                                        # 设置转换分辨率（打印级清晰度）
     log.info("run() 启动 Excel → JPG 转换流程")       # 输出流程开始日志
-    mapping = excel_to_jpgs()                        # 调用主函数执行转换
+    mapping = excel_to_jpgs(ws)                      # 调用主函数执行转换
     log.info("=== 输出文件映射 ===")                  # 输出结果映射表头
     for k, v in mapping.items():                     # 遍历每个 sheet 对应的 JPG 文件
         log.info(f"{k} -> {v}")                      # 输出映射关系日志
-    log.info(f"✅ 输出目录：{IMAGES_DIR}")           # 输出最终目录路径
+    log.info(f"✅ 输出目录：{ws.images_dir}")        # 输出最终目录路径
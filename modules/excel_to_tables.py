@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Excel → Word 原生表格模块（excel_to_tables.py）
+------------------------------------------------------------
+功能：
+    原生表格模式（[PageConf] image_format = table）下，直接读取 Excel 各 sheet 的单元格数据与样式，
+    生成 python-docx 原生表格，替换报告中的 {{表N}} 占位符（占位符名 = sheet 名）。
+    不再经过 LibreOffice（Excel → PDF）与 poppler（PDF → JPG），报告中的表格可检索、体积小。
+支持的样式：
+    合并单元格、边框、字体（字体名、字号、粗体、斜体、下划线、颜色）、纯色填充、
+    水平/垂直对齐、列宽（按比例缩放到表格总宽度）、隐藏行列。
+依赖：
+    openpyxl、python-docx
+"""
+
+# ============================================================
+# 导入模块
+# ============================================================
+import os                                  # 文件和路径操作
+import re                                  # 匹配占位符
+import sys                                 # 修正模块搜索路径
+import datetime                            # 日期单元格格式化
+from typing import Dict, List, Optional, Tuple   # 类型标注
+from openpyxl import load_workbook         # 读取 Excel 单元格数据与样式
+from openpyxl.styles.colors import COLOR_INDEX   # 索引色 → RGB
+from openpyxl.utils import get_column_letter     # 列号 → 列字母
+from docx import Document                  # Word 文档对象
+from docx.enum.table import WD_TABLE_ALIGNMENT, WD_CELL_VERTICAL_ALIGNMENT
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.oxml import OxmlElement          # 构造单元格边框、底纹元素
+from docx.oxml.ns import qn                # 带命名空间的属性名
+from docx.shared import Inches, Pt, RGBColor
+from docx.table import _Cell               # 单元格包装类
+
+# ============================================================
+# 修正项目模块搜索路径
+# ============================================================
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+# ============================================================
+# 项目模块 util
+# ============================================================
+# 日志在模块导入时即创建，util 为必需模块，直接导入
+from modules import util as _ut
+
+log = _ut.Logger()
+
+# 表格总宽度（与图片模式的图片宽度一致）
+TABLE_WIDTH = Inches(6.5)
+
+# 占位符：{{表1}}（docxtpl 以 DebugUndefined 渲染后为 {{ 表1 }}）
+PLACEHOLDER_RE = re.compile(r"\{\{\s*([^{}\s]+)\s*\}\}")
+
+# Excel 边框样式 → Word 边框（w:val, w:sz 以 1/8 磅为单位）
+BORDER_STYLES = {
+    "hair": ("single", 2),
+    "thin": ("single", 4),
+    "medium": ("single", 12),
+    "thick": ("single", 18),
+    "double": ("double", 4),
+    "dotted": ("dotted", 4),
+    "dashed": ("dashed", 4),
+    "mediumDashed": ("dashed", 12),
+    "dashDot": ("dotDash", 4),
+    "mediumDashDot": ("dotDash", 12),
+    "dashDotDot": ("dotDotDash", 4),
+    "mediumDashDotDot": ("dotDotDash", 12),
+    "slantDashDot": ("dotDash", 12),
+}
+
+# Excel 水平/垂直对齐 → Word 对齐
+HORIZONTAL_ALIGNMENTS = {
+    "left": WD_PARAGRAPH_ALIGNMENT.LEFT,
+    "center": WD_PARAGRAPH_ALIGNMENT.CENTER,
+    "centerContinuous": WD_PARAGRAPH_ALIGNMENT.CENTER,
+    "right": WD_PARAGRAPH_ALIGNMENT.RIGHT,
+    "justify": WD_PARAGRAPH_ALIGNMENT.JUSTIFY,
+    "distributed": WD_PARAGRAPH_ALIGNMENT.DISTRIBUTE,
+}
+VERTICAL_ALIGNMENTS = {
+    "top": WD_CELL_VERTICAL_ALIGNMENT.TOP,
+    "center": WD_CELL_VERTICAL_ALIGNMENT.CENTER,
+    "bottom": WD_CELL_VERTICAL_ALIGNMENT.BOTTOM,
+}
+
+
+def color_hex(color) -> Optional[str]:
+    """openpyxl 颜色 → 6 位十六进制 RGB；主题色等无法直接换算的颜色返回 None。"""
+    if color is None:
+        return None
+    if color.type == "rgb" and isinstance(color.rgb, str) and len(color.rgb) == 8:
+        return color.rgb[2:]
+    if color.type == "indexed" and isinstance(color.indexed, int) and color.indexed < len(COLOR_INDEX):
+        return COLOR_INDEX[color.indexed][2:]
+    return None
+
+
+def format_cell_value(cell) -> str:
+    """按单元格的数字格式生成显示文本（覆盖常用的整数、小数、百分比、千分位与日期格式）。"""
+    value = cell.value
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(value).upper()
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M" if value.time() != datetime.time() else "%Y-%m-%d")
+    if isinstance(value, datetime.date):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, datetime.time):
+        return value.strftime("%H:%M:%S")
+    if isinstance(value, (int, float)):
+        fmt = cell.number_format or "General"
+        # 小数位数：格式中小数点后的 0 的个数
+        match = re.search(r"\.(0+)", fmt)
+        decimals = len(match.group(1)) if match else 0
+        if "%" in fmt:
+            return f"{value * 100:.{decimals}f}%"
+        if fmt != "General":
+            return f"{value:,.{decimals}f}" if "," in fmt else f"{value:.{decimals}f}"
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return f"{value:.10g}" if isinstance(value, float) else str(value)
+    return str(value)
+
+
+def cell_style_spec(cell, font_size: float) -> dict:
+    """将 openpyxl 单元格样式转换为 Word 单元格样式描述（同一样式组合只转换一次）。"""
+    font, fill, border, alignment = cell.font, cell.fill, cell.border, cell.alignment
+    borders = {}
+    for edge in ("top", "left", "bottom", "right"):
+        side = getattr(border, edge)
+        if side is not None and side.style in BORDER_STYLES:
+            borders[edge] = BORDER_STYLES[side.style] + (color_hex(side.color) or "000000",)
+    return {
+        "font_name": font.name,
+        "font_size": font_size or font.sz,
+        "bold": bool(font.b),
+        "italic": bool(font.i),
+        "underline": bool(font.u),
+        "color": color_hex(font.color),
+        "fill": color_hex(fill.fgColor) if fill.fill_type == "solid" else None,
+        "halign": HORIZONTAL_ALIGNMENTS.get(alignment.horizontal),
+        "valign": VERTICAL_ALIGNMENTS.get(alignment.vertical, WD_CELL_VERTICAL_ALIGNMENT.BOTTOM),
+        "borders": borders,
+    }
+
+
+def apply_cell_frame(dcell: _Cell, spec: dict) -> None:
+    """设置 Word 单元格的边框与底纹（合并区域内被覆盖的单元格也需设置，以绘制完整边框）。"""
+    tc_pr = dcell._tc.get_or_add_tcPr()
+    if spec["borders"]:
+        tc_borders = OxmlElement("w:tcBorders")
+        for edge in ("top", "left", "bottom", "right"):
+            if edge in spec["borders"]:
+                val, size, color = spec["borders"][edge]
+                el = OxmlElement(f"w:{edge}")
+                el.set(qn("w:val"), val)
+                el.set(qn("w:sz"), str(size))
+                el.set(qn("w:space"), "0")
+                el.set(qn("w:color"), color)
+                tc_borders.append(el)
+        tc_pr.append(tc_borders)
+    if spec["fill"]:
+        shd = OxmlElement("w:shd")
+        shd.set(qn("w:val"), "clear")
+        shd.set(qn("w:color"), "auto")
+        shd.set(qn("w:fill"), spec["fill"])
+        tc_pr.append(shd)
+    # vAlign 位于 tcBorders、shd 之后，由 python-docx 按元素顺序插入
+    dcell.vertical_alignment = spec["valign"]
+
+
+def apply_cell_text(dcell: _Cell, text: str, spec: dict) -> None:
+    """写入单元格文本并设置段落对齐与字体。"""
+    paragraph = dcell.paragraphs[0]
+    paragraph.paragraph_format.space_before = Pt(0)
+    paragraph.paragraph_format.space_after = Pt(0)
+    if spec["halign"] is not None:
+        paragraph.alignment = spec["halign"]
+    if not text:
+        return
+    run = paragraph.add_run(text)             # 文本中的换行符转换为 w:br
+    font = run.font
+    if spec["font_name"]:
+        font.name = spec["font_name"]
+        # 中文字体需同时设置 eastAsia 属性
+        run._element.rPr.rFonts.set(qn("w:eastAsia"), spec["font_name"])
+    if spec["font_size"]:
+        font.size = Pt(spec["font_size"])
+    font.bold = spec["bold"] or None
+    font.italic = spec["italic"] or None
+    font.underline = spec["underline"] or None
+    if spec["color"]:
+        font.color.rgb = RGBColor.from_string(spec["color"])
+
+
+def visible_indexes(start: int, end: int, dimensions, key) -> List[int]:
+    """返回 start ~ end 中未隐藏的行号/列号。"""
+    return [i for i in range(start, end + 1) if not (key(i) in dimensions and dimensions[key(i)].hidden)]
+
+
+def build_table(doc: Document, sheet, font_size: float = 0):
+    """
+    根据 openpyxl 工作表生成 python-docx 表格（追加在文档末尾，由调用方移动到占位符处）。
+    参数：
+        doc: python-docx 文档对象
+        sheet: openpyxl 工作表（data_only 方式加载，公式单元格取缓存值）
+        font_size: 统一字号（磅），0 表示沿用 Excel 字号
+    """
+    rows = visible_indexes(sheet.min_row, sheet.max_row, sheet.row_dimensions, lambda i: i)
+    cols = visible_indexes(sheet.min_column, sheet.max_column, sheet.column_dimensions, get_column_letter)
+    table = doc.add_table(rows=len(rows), cols=len(cols))
+    table.alignment = WD_TABLE_ALIGNMENT.CENTER
+    table.autofit = False
+    # Excel 行号/列号 → 表格行/列下标
+    row_pos = {r: i for i, r in enumerate(rows)}
+    col_pos = {c: i for i, c in enumerate(cols)}
+
+    # 1️ 列宽：按 Excel 列宽比例缩放到表格总宽度
+    raw_widths = []
+    for c in cols:
+        dim = sheet.column_dimensions.get(get_column_letter(c))
+        raw_widths.append(dim.width if dim is not None and dim.width else 8.43)
+    total = sum(raw_widths) or 1
+    col_widths = [int(TABLE_WIDTH * w / total) for w in raw_widths]
+    for column, width in zip(table.columns, col_widths):
+        column.width = width
+
+    # 2️ 合并单元格（裁剪掉隐藏的行列）
+    #    合并区域的文本只保存在左上角单元格：左上角所在行/列被隐藏时，
+    #    仍从该单元格取文本，写入区域内第一个可见单元格（表格位置 → Excel 左上角单元格坐标）
+    merged_text_src: Dict[Tuple[int, int], Tuple[int, int]] = {}
+    for merged in sheet.merged_cells.ranges:
+        r_idx = [row_pos[r] for r in range(merged.min_row, merged.max_row + 1) if r in row_pos]
+        c_idx = [col_pos[c] for c in range(merged.min_col, merged.max_col + 1) if c in col_pos]
+        if not (r_idx and c_idx):
+            continue
+        merged_text_src[(r_idx[0], c_idx[0])] = (merged.min_row, merged.min_col)
+        if len(r_idx) > 1 or len(c_idx) > 1:
+            table.cell(r_idx[0], c_idx[0]).merge(table.cell(r_idx[-1], c_idx[-1]))
+
+    # 3️ 逐个 w:tc 写入文本与样式（同一样式组合只转换一次）
+    specs: Dict[tuple, dict] = {}
+    for r_i, tr in enumerate(table._tbl.tr_lst):
+        grid_col = 0
+        for tc in tr.tc_lst:
+            cell = sheet.cell(row=rows[r_i], column=cols[grid_col])
+            style_key = tuple(cell._style) if cell.has_style else ()
+            spec = specs.get(style_key)
+            if spec is None:
+                spec = specs[style_key] = cell_style_spec(cell, font_size)
+            dcell = _Cell(tc, table)
+            dcell.width = sum(col_widths[grid_col:grid_col + tc.grid_span])
+            apply_cell_frame(dcell, spec)
+            # 纵向合并的延续单元格不写文本；合并区域取左上角单元格的文本
+            if tc.vMerge != "continue":
+                src = merged_text_src.get((r_i, grid_col))
+                text_cell = sheet.cell(row=src[0], column=src[1]) if src else cell
+                apply_cell_text(dcell, format_cell_value(text_cell), spec)
+            grid_col += tc.grid_span
+    return table
+
+
+def replace_placeholders_with_tables(doc: Document, excel_path: str, font_size: float = 0) -> Dict[str, int]:
+    """
+    将文档中独占一段的 {{sheet 名}} 占位符替换为该 sheet 的原生表格。
+    返回：
+        sheet 名 → 表格行数（只含已替换的占位符）
+    """
+    log.info(f"📊 读取 Excel 数据生成原生表格：{excel_path}")
+    # data_only：公式单元格取 Excel 保存时的计算结果
+    wb = load_workbook(excel_path, data_only=True)
+    sheets = {sheet.title: sheet for sheet in wb.worksheets}
+    replaced: Dict[str, int] = {}
+    for paragraph in list(doc.paragraphs):
+        match = PLACEHOLDER_RE.fullmatch(paragraph.text.strip())
+        if match is None or match.group(1) not in sheets:
+            continue
+        name = match.group(1)
+        table = build_table(doc, sheets[name], font_size)
+        # 将表格移动到占位符段落处，并删除占位符段落
+        paragraph._p.addnext(table._tbl)
+        paragraph._p.getparent().remove(paragraph._p)
+        replaced[name] = len(table.rows)
+        log.info(f"✅ 已生成原生表格：{name}（{len(table.rows)} 行 × {len(table.columns)} 列）")
+    wb.close()
+    return replaced
+
+
+# ============================================================
+# main 程序入口
+# ============================================================
+if __name__ == "__main__":
+    doc = Document("../template/实验性项目巡检报告模板(1.0).docx")
+    replace_placeholders_with_tables(doc, "../data/巡检报告数据集(1.0).xlsx", 9)
+    doc.save("../out/原生表格示例.docx")
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+巡检报告异步任务队列模块（job_queue.py）
+------------------------------------------------
+功能说明：
+    1. 以 report_id 为键登记报告生成任务，提交后立即返回；
+    2. 由固定数量的工作线程在后台执行报告生成流程；
+       任务分为交互通道（单份报告）与批量通道（批量提交），交互通道的排队任务总是优先执行，
+       可限制每个客户端同时执行的任务数，避免一个客户端占满全部工作线程；
+    3. 准入控制：通道排队任务数、单个客户端未完成的交互任务数超过上限时拒绝提交（QueueFullError），
+       并按近期任务平均耗时给出建议的重试等待时间；
+    4. 记录任务状态（排队/运行/成功/失败）、正在执行的阶段与各阶段耗时（并发阶段分别计时），
+       供服务进程的状态查询接口与下载接口使用；
+    5. 相同请求去重：提交时可附带请求指纹，与排队/运行中的任务或有效期内成功的任务
+       指纹相同时直接返回已有任务，并发的相同请求合并为一次执行；
+    6. 按顺序记录任务事件（状态变化、阶段切换与生成过程中的进度事件），
+       供服务进程的事件流接口（SSE）等待并推送。
+调用方式：
+    由服务进程 server_detection.py 创建 JobQueue 实例并提交任务。
+"""
+# ============================================================
+# 导入模块
+# ============================================================
+import os                                            # 检查已生成的报告文件是否存在
+import math                                          # 重试等待时间取整
+import time                                          # 记录任务与阶段耗时
+import threading                                     # 工作线程、任务表互斥锁与调度条件变量
+from collections import deque                        # 各通道的排队任务
+from dataclasses import dataclass, field             # 定义任务数据类
+from typing import Callable, Dict, List, Optional, Tuple   # 类型标注
+
+# ============================================================
+# 任务状态常量
+# ============================================================
+STATE_QUEUED = "queued"          # 已排队，等待工作线程
+STATE_RUNNING = "running"        # 正在生成
+STATE_SUCCEEDED = "succeeded"    # 生成成功，可下载
+STATE_FAILED = "failed"          # 生成失败
+
+# ============================================================
+# 调度通道常量（按优先级从高到低排列）
+# ============================================================
+LANE_INTERACTIVE = "interactive"  # 交互通道：单份报告提交
+LANE_BATCH = "batch"              # 批量通道：批量提交，交互通道没有可执行的任务时才执行
+LANES = (LANE_INTERACTIVE, LANE_BATCH)
+LANE_NAMES = {LANE_INTERACTIVE: "交互", LANE_BATCH: "批量"}
+
+# ============================================================
+# 阶段事件常量（与 pipeline.Pipeline 的 on_stage 回调一致）
+# ============================================================
+STAGE_START = "start"            # 阶段开始
+STAGE_END = "end"                # 阶段完成
+STAGE_FAILED = "failed"          # 阶段失败
+
+
+class QueueFullError(Exception):
+    """准入控制拒绝提交：排队已满或客户端未完成任务数达到上限；retry_after 为建议的重试等待秒数。"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ============================================================
+# 任务数据类
+# ============================================================
+@dataclass
+class ReportJob:
+    """一次巡检报告生成任务的状态记录。"""
+    # 报告编号（任务键）
+    report_id: str
+    # 前端提交的巡检报告基础信息
+    info: dict
+    # 请求指纹（基础信息、输入文件、模板与相关配置的哈希），为空时不参与去重
+    fingerprint: str = ""
+    # 调度通道与提交方客户端标识
+    lane: str = LANE_INTERACTIVE
+    client: str = ""
+    # 任务状态
+    state: str = STATE_QUEUED
+    # 当前执行阶段名称（多个阶段并发执行时为最近开始的阶段，失败后为失败的阶段）
+    stage: str = ""
+    # 生成的报告文件路径（成功后有效）
+    output_path: str = ""
+    # 失败原因（失败后有效）
+    error: str = ""
+    # 提交、开始、结束时间戳
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # 各阶段耗时（秒）：阶段名 → 耗时
+    stage_timings: Dict[str, float] = field(default_factory=dict)
+    # 计时汇总：区间名 → 次数、耗时、CPU、进程级子进程 CPU 与峰值内存、写出字节数（启用 [Timing] 时由报告生成函数填写）
+    profile: Dict[str, dict] = field(default_factory=dict)
+    # 任务事件：[{"seq", "event", "time", "data"}, ...]，seq 从 1 开始递增
+    events: List[dict] = field(default_factory=list, repr=False)
+    # 正在执行的阶段：阶段名 → 开始时间戳（并发阶段各自计时，内部使用）
+    _stage_started: Dict[str, float] = field(default_factory=dict, repr=False)
+    # 保护阶段记录的互斥锁（并发阶段在不同线程中回调，内部使用）
+    _stage_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    # 新事件通知（内部使用）
+    _events_cond: threading.Condition = field(default_factory=threading.Condition, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        """任务是否已结束（成功或失败）。"""
+        return self.state in (STATE_SUCCEEDED, STATE_FAILED)
+
+    def add_event(self, event: str, data: dict = None) -> dict:
+        """追加一条任务事件并唤醒等待中的事件流。"""
+        with self._events_cond:
+            item = {"seq": len(self.events) + 1, "event": event, "time": round(time.time(), 3), "data": data or {}}
+            self.events.append(item)
+            self._events_cond.notify_all()
+        return item
+
+    def wait_events(self, after: int, timeout: float) -> List[dict]:
+        """返回序号大于 after 的事件；暂无新事件时最多等待 timeout 秒（超时返回空列表）。"""
+        with self._events_cond:
+            if len(self.events) <= after:
+                self._events_cond.wait(timeout)
+            return self.events[after:]
+
+    def to_dict(self) -> dict:
+        """转换为状态查询接口返回的字典。"""
+        now = time.time()
+        # 排队耗时：开始执行前为截至当前的等待时间
+        queued_seconds = (self.started_at or now) - self.submitted_at
+        # 运行耗时：未开始为 0，运行中为截至当前的时间
+        if self.started_at is None:
+            elapsed_seconds = 0.0
+        else:
+            elapsed_seconds = (self.finished_at or now) - self.started_at
+        return {
+            "report_id": self.report_id,
+            "state": self.state,
+            "lane": self.lane,
+            "stage": self.stage,
+            "running_stages": list(self._stage_started),
+            "error": self.error,
+            "timings": {
+                "queued_seconds": round(queued_seconds, 3),
+                "elapsed_seconds": round(elapsed_seconds, 3),
+                "stages": {k: round(v, 3) for k, v in self.stage_timings.items()},
+                "profile": self.profile,
+            },
+        }
+
+
+# ============================================================
+# 任务队列类
+# ============================================================
+class JobQueue:
+    """
+    报告生成任务队列
+    -------------------------
+    runner(job) 为实际执行报告生成的函数，返回生成的报告文件路径；
+    max_workers 决定同时执行的任务数，应与可承受的 LibreOffice 实例数一致。
+    准入与调度参数（0 表示不限制）：
+        max_queued          各通道排队（未开始执行）任务数上限：通道 → 上限
+        per_client_queued   单个客户端未完成（排队 + 运行中）的交互通道任务数上限
+        per_client_running  单个客户端同时执行的任务数上限（超出的任务继续排队，不拒绝）
+        retry_after         尚无已完成任务、无法估计耗时时建议的重试等待秒数
+    """
+
+    def __init__(self, runner: Callable[[ReportJob], str], max_workers: int = 1, max_history: int = 200,
+                 max_queued: Dict[str, int] = None, per_client_queued: int = 0, per_client_running: int = 0,
+                 retry_after: int = 30):
+        # 报告生成函数
+        self._runner = runner
+        # 任务表：report_id → ReportJob（按提交顺序保存）
+        self._jobs: Dict[str, ReportJob] = {}
+        # 保留的已结束任务数上限，超出后淘汰最早的已结束任务
+        self._max_history = max_history
+        # 请求指纹 → 最近一次提交的 report_id
+        self._by_fingerprint: Dict[str, str] = {}
+        # 准入与调度参数
+        self._max_queued = max_queued or {}
+        self._per_client_queued = per_client_queued
+        self._per_client_running = per_client_running
+        self._retry_after = retry_after
+        # 各通道的排队任务（先进先出）与各客户端运行中的任务数
+        self._pending: Dict[str, deque] = {lane: deque() for lane in LANES}
+        self._running_by_client: Dict[str, int] = {}
+        # 近期任务平均运行耗时（秒，指数移动平均），用于估计重试等待时间
+        self._avg_seconds: Optional[float] = None
+        # 保护任务表与排队任务的互斥锁；工作线程在条件变量上等待可执行的任务
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._closed = False
+        # 固定数量的工作线程
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"report-job_{i}", daemon=True)
+            for i in range(max(1, max_workers))
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, report_id: str, info: dict, fingerprint: str = "", dedupe_ttl: float = 0,
+               lane: str = LANE_INTERACTIVE, client: str = "") -> ReportJob:
+        """
+        登记任务并放入 lane 通道排队，立即返回任务记录；超过准入上限时抛出 QueueFullError。
+        fingerprint 非空时先查找相同指纹的已有任务：排队/运行中的任务，或 dedupe_ttl 秒内成功且报告文件仍存在的任务，
+        找到则直接返回该任务（report_id 为已有任务的编号），不再重复生成；失败的任务不复用。
+        """
+        return self.submit_many([(report_id, info, fingerprint)], dedupe_ttl, lane, client)[0]
+
+    def submit_many(self, entries: List[Tuple[str, dict, str]], dedupe_ttl: float = 0,
+                    lane: str = LANE_INTERACTIVE, client: str = "") -> List[ReportJob]:
+        """
+        一次登记多个任务 [(report_id, info, fingerprint), ...]，按 entries 顺序返回任务记录（去重规则同 submit）。
+        准入检查针对全部新任务整体进行：要么全部入队，要么抛出 QueueFullError 全部不入队；
+        新任务数超过通道排队上限（永远无法入队）时抛出 ValueError。
+        复用已有任务不新增工作，不计入本客户端的准入名额（名额仍计在原提交方）；
+        复用的任务仍在较低优先级通道排队时（如交互提交命中排队中的批量任务），将其提升到 lane 通道队尾，
+        避免交互请求排在全部交互任务之后等待批量任务。
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("任务队列已关闭")
+            jobs: List[ReportJob] = []
+            new_jobs: List[ReportJob] = []
+            reused: List[ReportJob] = []
+            # 本次提交中的相同请求也只生成一次
+            claimed: Dict[str, ReportJob] = {}
+            for report_id, info, fingerprint in entries:
+                existing = claimed.get(fingerprint) or self._find_duplicate_locked(fingerprint, dedupe_ttl)
+                if existing is None:
+                    existing = ReportJob(report_id=report_id, info=info, fingerprint=fingerprint,
+                                         lane=lane, client=client)
+                    new_jobs.append(existing)
+                    if fingerprint:
+                        claimed[fingerprint] = existing
+                elif existing not in new_jobs:
+                    reused.append(existing)
+                jobs.append(existing)
+            self._admit_locked(lane, client, len(new_jobs))
+            for job in reused:
+                self._promote_locked(job, lane)
+            for job in new_jobs:
+                job.add_event("state", {"state": STATE_QUEUED, "lane": lane})
+                self._jobs[job.report_id] = job
+                if job.fingerprint:
+                    self._by_fingerprint[job.fingerprint] = job.report_id
+                self._pending[lane].append(job)
+            self._prune_locked()
+            self._cond.notify_all()
+        return jobs
+
+    def get(self, report_id: str) -> Optional[ReportJob]:
+        """按 report_id 查询任务，不存在时返回 None。"""
+        with self._lock:
+            return self._jobs.get(report_id)
+
+    def queue_depth(self) -> Dict[str, int]:
+        """各通道排队（未开始执行）的任务数。"""
+        with self._lock:
+            return {lane: len(pending) for lane, pending in self._pending.items()}
+
+    def running_count(self) -> int:
+        """正在执行的任务数。"""
+        with self._lock:
+            return sum(self._running_by_client.values())
+
+    def mark_stage(self, job: ReportJob, stage: str, event: str = STAGE_START) -> None:
+        """
+        记录阶段开始（STAGE_START）、完成（STAGE_END）或失败（STAGE_FAILED）。
+        流水线中互不依赖的阶段在不同线程中并发执行，各阶段分别记录开始时间，结束时累加本阶段耗时；
+        每次调用追加一条 stage 事件（结束事件附带本阶段耗时）。
+        """
+        now = time.time()
+        with job._stage_lock:
+            if event == STAGE_START:
+                job._stage_started[stage] = now
+                job.stage = stage
+                data = {"stage": stage, "event": event}
+            else:
+                started = job._stage_started.pop(stage, now)
+                job.stage_timings[stage] = job.stage_timings.get(stage, 0.0) + now - started
+                if event == STAGE_FAILED:
+                    job.stage = stage
+                elif job.stage == stage and job._stage_started:
+                    # 当前阶段完成后改为显示仍在执行的、最近开始的阶段
+                    job.stage = next(reversed(job._stage_started))
+                data = {"stage": stage, "event": event, "seconds": round(now - started, 3)}
+            job.add_event("stage", data)
+
+    def shutdown(self, wait: bool = False) -> None:
+        """停止工作线程；尚未开始执行的任务标记为失败。wait 为 True 时等待运行中的任务结束。"""
+        with self._cond:
+            self._closed = True
+            pending = [job for lane in LANES for job in self._pending[lane]]
+            for lane in LANES:
+                self._pending[lane].clear()
+            self._cond.notify_all()
+        for job in pending:
+            job.error = "服务已关闭，任务未执行"
+            job.state = STATE_FAILED
+            job.finished_at = time.time()
+            job.add_event("state", {"state": STATE_FAILED, "error": job.error})
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    # ---------------------------
+    # 内部方法：工作线程主循环（取出可执行的任务并执行）
+    # ---------------------------
+    def _worker_loop(self) -> None:
+        while True:
+            with self._cond:
+                job = self._next_job_locked()
+                while job is None and not self._closed:
+                    self._cond.wait()
+                    job = self._next_job_locked()
+                if job is None:
+                    return
+                self._running_by_client[job.client] = self._running_by_client.get(job.client, 0) + 1
+            self._execute(job)
+            with self._cond:
+                self._running_by_client[job.client] -= 1
+                if job.state == STATE_SUCCEEDED:
+                    seconds = job.finished_at - job.started_at
+                    self._avg_seconds = seconds if self._avg_seconds is None else 0.7 * self._avg_seconds + 0.3 * seconds
+                # 客户端运行数减少后，其排队任务可能变为可执行
+                self._cond.notify_all()
+
+    # ---------------------------
+    # 内部方法：按通道优先级取出下一个可执行的任务（调用方需持有锁）
+    # ---------------------------
+    def _next_job_locked(self) -> Optional[ReportJob]:
+        for lane in LANES:
+            pending = self._pending[lane]
+            for job in pending:
+                # 该客户端运行中的任务数已达上限时跳过，先执行其他客户端的任务
+                if self._per_client_running and self._running_by_client.get(job.client, 0) >= self._per_client_running:
+                    continue
+                pending.remove(job)
+                return job
+        return None
+
+    # ---------------------------
+    # 内部方法：将排队中的任务提升到更高优先级的通道（调用方需持有锁）
+    # ---------------------------
+    def _promote_locked(self, job: ReportJob, lane: str) -> None:
+        if job.state != STATE_QUEUED or LANES.index(lane) >= LANES.index(job.lane):
+            return
+        self._pending[job.lane].remove(job)
+        self._pending[lane].append(job)
+        job.lane = lane
+        job.add_event("lane", {"lane": lane})
+
+    # ---------------------------
+    # 内部方法：准入检查（调用方需持有锁）
+    # ---------------------------
+    def _admit_locked(self, lane: str, client: str, count: int) -> None:
+        if count == 0:
+            return
+        limit = self._max_queued.get(lane, 0)
+        queued = len(self._pending[lane])
+        if limit and count > limit:
+            raise ValueError(f"一次提交 {count} 个任务，超过{LANE_NAMES[lane]}通道排队上限 {limit}")
+        if limit and queued + count > limit:
+            raise QueueFullError(f"{LANE_NAMES[lane]}通道排队任务已满（{queued}/{limit}），请稍后重试",
+                                 self._estimate_retry_after_locked(lane))
+        if self._per_client_queued and client and lane == LANE_INTERACTIVE:
+            active = sum(1 for job in self._jobs.values()
+                         if job.client == client and job.lane == lane and not job.finished)
+            if active + count > self._per_client_queued:
+                raise QueueFullError(f"客户端 {client} 未完成的报告任务已达上限（{active}/{self._per_client_queued}），"
+                                     f"请等待已提交的任务完成", self._estimate_retry_after_locked(lane))
+
+    # ---------------------------
+    # 内部方法：估计重试等待时间（调用方需持有锁）
+    # ---------------------------
+    def _estimate_retry_after_locked(self, lane: str) -> int:
+        # 约为一个工作线程空出所需时间；批量通道还需等待交互通道的排队任务
+        ahead = len(self._pending[LANE_INTERACTIVE]) if lane == LANE_BATCH else 0
+        seconds = (self._avg_seconds or self._retry_after) * (ahead + 1) / len(self._workers)
+        return max(1, math.ceil(seconds))
+
+    # ---------------------------
+    # 内部方法：执行单个任务
+    # ---------------------------
+    def _execute(self, job: ReportJob) -> None:
+        job.state = STATE_RUNNING
+        job.started_at = time.time()
+        job.add_event("state", {"state": STATE_RUNNING})
+        error_type = ""
+        try:
+            job.output_path = self._runner(job)
+            job.state = STATE_SUCCEEDED
+        except Exception as e:
+            job.error = str(e)
+            error_type = type(e).__name__
+            job.state = STATE_FAILED
+        finally:
+            job.finished_at = time.time()
+            self._close_stage(job, job.finished_at)
+            # 结束事件在状态更新之后追加：事件流读到它即可关闭
+            data = {"state": job.state, "elapsed_seconds": round(job.finished_at - job.started_at, 3)}
+            if job.state == STATE_FAILED:
+                data.update(stage=job.stage, error_type=error_type, error=job.error)
+            job.add_event("state", data)
+
+    # ---------------------------
+    # 内部方法：结算未收到结束回调的阶段耗时
+    # ---------------------------
+    @staticmethod
+    def _close_stage(job: ReportJob, now: float) -> None:
+        with job._stage_lock:
+            for stage, started in job._stage_started.items():
+                job.stage_timings[stage] = job.stage_timings.get(stage, 0.0) + now - started
+            job._stage_started.clear()
+
+    # ---------------------------
+    # 内部方法：查找可复用的相同指纹任务（调用方需持有锁）
+    # ---------------------------
+    def _find_duplicate_locked(self, fingerprint: str, dedupe_ttl: float) -> Optional[ReportJob]:
+        if not fingerprint:
+            return None
+        job = self._jobs.get(self._by_fingerprint.get(fingerprint, ""))
+        if job is None:
+            return None
+        if job.state in (STATE_QUEUED, STATE_RUNNING):
+            return job
+        if (job.state == STATE_SUCCEEDED and job.finished_at is not None
+                and time.time() - job.finished_at <= dedupe_ttl
+                and os.path.exists(job.output_path)):
+            return job
+        return None
+
+    # ---------------------------
+    # 内部方法：淘汰过多的已结束任务（调用方需持有锁）
+    # ---------------------------
+    def _prune_locked(self) -> None:
+        finished = [rid for rid, j in self._jobs.items() if j.state in (STATE_SUCCEEDED, STATE_FAILED)]
+        for rid in finished[: max(0, len(finished) - self._max_history)]:
+            job = self._jobs.pop(rid)
+            if job.fingerprint and self._by_fingerprint.get(job.fingerprint) == rid:
+                del self._by_fingerprint[job.fingerprint]
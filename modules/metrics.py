@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务监控指标模块（metrics.py）
+------------------------------------------------------------
+功能：
+    1. 计数器（Counter）、直方图（Histogram）与取值函数指标（CallbackMetric），支持标签；
+    2. 按 Prometheus 文本格式（text/plain; version=0.0.4）输出全部已登记的指标，
+       供服务进程的 /metrics 接口抓取，用于容量规划与性能回退告警。
+说明：
+    不依赖 prometheus_client；指标在进程内累计，服务重启后从 0 开始（Prometheus 的 rate/increase 可正确处理）。
+    取值函数指标在每次输出时调用函数读取当前值（如队列深度、存活的 soffice 实例数）。
+"""
+
+# ============================================================
+# 导入模块
+# ============================================================
+import math                                            # 浮点数格式化（+Inf）
+import threading                                       # 保护指标数据的互斥锁
+from typing import Callable, Dict, Iterable, List, Tuple   # 类型标注
+
+# 输出格式的 Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认直方图分桶（秒）：覆盖单个阶段从亚秒级到十分钟级的耗时
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def format_value(value: float) -> str:
+    """数值 → 文本（整数不带小数点，无穷大为 +Inf）。"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    """标签字典 → {k="v",...}；值中的反斜杠、双引号与换行按格式要求转义。"""
+    if not labels:
+        return ""
+    items = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        items.append(f'{key}="{value}"')
+    return "{" + ",".join(items) + "}"
+
+
+# ============================================================
+# 指标基类
+# ============================================================
+class Metric:
+    """带标签的指标：name 为指标名，labelnames 为标签名（按顺序），collect() 输出文本行。"""
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """标签字典 → 按 labelnames 排列的取值元组（缺少或多余的标签抛出 ValueError）。"""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 的标签应为 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """只增不减的计数器。"""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{format_labels(dict(zip(self.labelnames, key)))} {format_value(value)}"
+                for key, value in values]
+
+
+class Histogram(Metric):
+    """直方图：按分桶累计观测值个数，并记录总和与总数。"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # 标签取值元组 → [各分桶计数（非累计）, 总和, 总数]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{format_labels({**labels, 'le': format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return lines
+
+
+class CallbackMetric(Metric):
+    """
+    取值函数指标：输出时调用 func()，返回 [(标签字典, 值), ...]；type_name 可为 gauge 或 counter
+    （如渲染缓存对象自身累计的命中次数）。func 出错时本指标不输出样本。
+    """
+
+    def __init__(self, name: str, documentation: str, func: Callable[[], List[Tuple[Dict[str, str], float]]],
+                 type_name: str = "gauge"):
+        super().__init__(name, documentation)
+        self.func = func
+        self.type_name = type_name
+
+    def collect(self) -> List[str]:
+        try:
+            samples = self.func()
+        except Exception as e:
+            print(f"⚠️  读取指标 {self.name} 失败：{e}")
+            return []
+        return [f"{self.name}{format_labels(labels)} {format_value(value)}" for labels, value in samples]
+
+
+# ============================================================
+# 指标登记表
+# ============================================================
+class Registry:
+    """已登记指标的集合，render() 按登记顺序输出全部指标。"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        登记指标。同名指标已登记时（模块被重复导入，如 server_detection 与 modules.server_detection）
+        返回已登记的指标，保留已累计的数据；取值函数指标改用最新的取值函数。
+        """
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is None:
+                self._metrics[metric.name] = metric
+                return metric
+            if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                raise ValueError(f"指标 {metric.name} 已按不同的类型或标签登记")
+            if isinstance(existing, CallbackMetric):
+                existing.func = metric.func
+            return existing
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+# 进程级默认登记表
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    """创建并登记计数器。"""
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Iterable[str] = (),
+              buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+    """创建并登记直方图。"""
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+def callback(name: str, documentation: str, func: Callable[[], List[Tuple[Dict[str, str], float]]],
+             type_name: str = "gauge") -> CallbackMetric:
+    """创建并登记取值函数指标。"""
+    return REGISTRY.register(CallbackMetric(name, documentation, func, type_name))
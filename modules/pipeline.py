@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告生成流水线模块（pipeline.py）
+------------------------------------------------------------
+功能：
+    1. 以声明式的阶段（Stage）描述报告生成流程：每个阶段声明依赖的阶段、输入文件、
+       影响结果的参数（相关配置项、封面信息等）与输出文件/目录；
+    2. 按依赖关系调度：依赖已完成的阶段即可开始，互不依赖的阶段在线程池中并发执行；
+    3. 阶段指纹 = 输入文件内容哈希 + 参数 + 依赖阶段的指纹；指纹未变化时直接从本地缓存
+       恢复该阶段的输出文件与返回值并跳过执行（例如只修改封面信息时，统计与表格渲染均被跳过）；
+    4. 缓存目录总大小超过上限时按最近使用时间（LRU）淘汰。
+配置：
+    config.ini 的 [Pipeline] 节。
+"""
+
+# ============================================================
+# 导入模块
+# ============================================================
+import os                                  # 文件和路径操作
+import sys                                 # 修正模块搜索路径
+import time                                # 阶段计时
+import json                                # 阶段返回值与指纹参数序列化
+import shutil                              # 复制缓存文件
+import hashlib                             # 计算内容哈希
+import threading                           # 缓存条目锁
+import contextvars                         # 向工作线程传递计时上下文
+import configparser                        # 配置解释器
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait   # 并发调度阶段
+from dataclasses import dataclass, field   # 定义阶段数据类
+from typing import Any, Callable, Dict, List, Optional, Tuple   # 类型标注
+
+# ============================================================
+# 修正项目模块搜索路径
+# ============================================================
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+# ============================================================
+# 项目模块 util
+# ============================================================
+try:
+    from modules import util as _ut
+except Exception as e:
+    _ut = None
+    print(f"⚠️  未找到 util 模块：{e}")
+
+# 计时与资源统计模块（每个阶段包在计时区间内执行）
+from modules import timing as _timing
+
+# 进度事件模块（只依赖标准库，直接导入）
+from modules import progress as _progress
+
+log = _ut.Logger()
+
+# 指纹格式版本：阶段实现（输出内容）变化时递增，使旧缓存自然失效
+PIPELINE_VERSION = "1"
+
+# 阶段执行结果状态
+STATUS_RUN = "run"          # 实际执行
+STATUS_CACHED = "cached"    # 指纹未变化，从缓存恢复
+
+# 阶段回调事件：on_stage(阶段名, 事件)，并发阶段在各自的线程中回调
+STAGE_START = "start"       # 阶段开始
+STAGE_END = "end"           # 阶段完成（执行或从缓存恢复）
+STAGE_FAILED = "failed"     # 阶段失败
+
+
+# ============================================================
+# 阶段数据类
+# ============================================================
+@dataclass
+class Stage:
+    """
+    流水线阶段
+    -------------------------
+    func(results) 执行阶段并返回结果值，results 为依赖阶段名 → 结果值；
+    结果值需可 JSON 序列化才能缓存（不需要返回值的阶段返回 None）。
+    outputs 中的文件或目录在阶段完成后存入缓存，命中缓存时恢复到原路径。
+    """
+    name: str
+    func: Callable[[Dict[str, Any]], Any]
+    # 依赖的阶段名
+    deps: Tuple[str, ...] = ()
+    # 输入文件路径（按内容计算哈希，路径本身不计入指纹，不同工作区可共用缓存）
+    inputs: Tuple[str, ...] = ()
+    # 影响输出的其他参数（配置项、封面信息等，需可 JSON 序列化）
+    params: Dict[str, Any] = field(default_factory=dict)
+    # 输出文件或目录
+    outputs: Tuple[str, ...] = ()
+    # 是否允许缓存
+    cacheable: bool = True
+
+
+def file_digest(path: str) -> str:
+    """文件内容的 SHA-256；文件不存在时返回 "missing"。"""
+    if not path or not os.path.isfile(path):
+        return "missing"
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def stage_fingerprint(stage: Stage, dep_fingerprints: List[str]) -> str:
+    """阶段指纹：阶段名、输入文件内容哈希、参数与依赖阶段指纹的哈希。"""
+    payload = {
+        "version": PIPELINE_VERSION,
+        "stage": stage.name,
+        "inputs": [file_digest(path) for path in stage.inputs],
+        "params": stage.params,
+        "deps": dep_fingerprints,
+    }
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ============================================================
+# 阶段结果缓存类
+# ============================================================
+class StageCache:
+    """
+    阶段结果缓存
+    -------------------------
+    缓存条目为目录 <cache_dir>/<阶段名>/<指纹>/：
+        result.json   阶段返回值与各输出的类型（file / dir）
+        outputs/<i>   第 i 个输出（文件，或目录的全部文件）
+    条目目录的修改时间即最近使用时间（命中时刷新），写入新条目后总大小超过 max_bytes 时淘汰最久未使用的条目。
+    并发：每个条目各有一把锁，恢复与写入只锁住所涉及的条目，不同阶段、不同指纹的文件复制互不阻塞；
+    写入先复制到临时目录，再在条目锁内整体改名；淘汰在锁外扫描，跳过正被恢复或写入的条目。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # 保护命中计数与条目锁表（只在极短的时间内持有）
+        self._lock = threading.Lock()
+        # 条目目录 → 条目锁
+        self._entry_locks: Dict[str, threading.Lock] = {}
+        # 同一时刻只有一个线程执行淘汰；淘汰期间有新条目写入时由该线程再淘汰一轮
+        self._evict_lock = threading.Lock()
+        self._evict_again = False
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_dir(self, stage: str, fingerprint: str) -> str:
+        """阶段 stage 指纹 fingerprint 对应的缓存条目目录。"""
+        return os.path.join(self.cache_dir, stage, fingerprint)
+
+    def restore(self, stage: Stage, fingerprint: str) -> Tuple[bool, Any]:
+        """命中时将缓存的输出恢复到 stage.outputs 并返回 (True, 返回值)，否则返回 (False, None)。"""
+        entry = self.entry_dir(stage.name, fingerprint)
+        with self._entry_lock(entry):
+            meta_path = os.path.join(entry, "result.json")
+            if not os.path.exists(meta_path):
+                self._count(hit=False)
+                return False, None
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            for i, (dest, kind) in enumerate(zip(stage.outputs, meta["outputs"])):
+                src = os.path.join(entry, "outputs", str(i))
+                if kind == "dir":
+                    # 目录输出：先清空目标目录，避免残留上次运行的文件
+                    os.makedirs(dest, exist_ok=True)
+                    _ut.remove_path_recursio_files_func(dest)
+                    shutil.copytree(src, dest, dirs_exist_ok=True)
+                else:
+                    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+                    shutil.copyfile(src, dest)
+            # 刷新最近使用时间
+            os.utime(entry, None)
+        self._count(hit=True)
+        return True, meta["value"]
+
+    def put(self, stage: Stage, fingerprint: str, value: Any) -> None:
+        """将阶段返回值与输出存入缓存（返回值不可 JSON 序列化或输出缺失时不缓存），并按容量上限淘汰旧条目。"""
+        entry = self.entry_dir(stage.name, fingerprint)
+        tmp_entry = f"{entry}.part{os.getpid()}_{threading.get_ident()}"
+        try:
+            value_json = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            log.warn(f"阶段 {stage.name} 的返回值不可序列化，不缓存：{e}", "Pipeline")
+            return
+        kinds = []
+        try:
+            # 复制输出到本线程独占的临时目录，不持有任何锁
+            os.makedirs(os.path.join(tmp_entry, "outputs"), exist_ok=True)
+            for i, src in enumerate(stage.outputs):
+                dest = os.path.join(tmp_entry, "outputs", str(i))
+                if os.path.isdir(src):
+                    shutil.copytree(src, dest)
+                    kinds.append("dir")
+                elif os.path.isfile(src):
+                    shutil.copyfile(src, dest)
+                    kinds.append("file")
+                else:
+                    log.warn(f"阶段 {stage.name} 的输出不存在，不缓存：{src}", "Pipeline")
+                    return
+            with open(os.path.join(tmp_entry, "result.json"), "w", encoding="utf-8") as f:
+                f.write(f'{{"value": {value_json}, "outputs": {json.dumps(kinds)}}}')
+            # 在条目锁内整体改名，并发恢复不会读到不完整的条目
+            with self._entry_lock(entry):
+                if os.path.exists(entry):
+                    shutil.rmtree(entry)
+                os.replace(tmp_entry, entry)
+        finally:
+            if os.path.exists(tmp_entry):
+                shutil.rmtree(tmp_entry, ignore_errors=True)
+        self._evict()
+
+    def hit_rate(self) -> float:
+        """累计命中率（0 ~ 1）。"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    # ---------------------------
+    # 内部方法：条目锁与命中计数
+    # ---------------------------
+    def _entry_lock(self, entry: str) -> threading.Lock:
+        with self._lock:
+            return self._entry_locks.setdefault(entry, threading.Lock())
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    # ---------------------------
+    # 内部方法：LRU 淘汰（已有线程在淘汰时直接返回，由该线程再淘汰一轮）
+    # ---------------------------
+    def _evict(self) -> None:
+        self._evict_again = True
+        while self._evict_again and self._evict_lock.acquire(blocking=False):
+            try:
+                self._evict_again = False
+                self._evict_once()
+            finally:
+                self._evict_lock.release()
+
+    def _evict_once(self) -> None:
+        entries = []
+        for stage in os.listdir(self.cache_dir):
+            stage_dir = os.path.join(self.cache_dir, stage)
+            if not os.path.isdir(stage_dir):
+                continue
+            for name in os.listdir(stage_dir):
+                entry = os.path.join(stage_dir, name)
+                if ".part" in name or not os.path.isdir(entry):
+                    continue
+                try:
+                    size = sum(os.path.getsize(os.path.join(root, f))
+                               for root, _, files in os.walk(entry) for f in files)
+                    entries.append((os.stat(entry).st_mtime, size, entry))
+                except OSError:
+                    # 扫描期间被替换或删除的条目
+                    continue
+        total = sum(size for _, size, _ in entries)
+        # 按最近使用时间从旧到新淘汰
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            lock = self._entry_lock(entry)
+            if not lock.acquire(blocking=False):
+                # 正被恢复或写入的条目本轮不淘汰
+                continue
+            try:
+                shutil.rmtree(entry, ignore_errors=True)
+            finally:
+                lock.release()
+            total -= size
+            log.info(f"🧹 流水线缓存淘汰：{entry}", "Pipeline")
+
+
+# ============================================================
+# 流水线类
+# ============================================================
+class Pipeline:
+    """
+    报告生成流水线
+    -------------------------
+    run() 按依赖关系调度全部阶段，返回阶段名 → 结果值；
+    report 记录各阶段的执行状态（run / cached）、指纹与耗时。
+    on_stage(阶段名, 事件) 在每个阶段开始与结束（STAGE_END / STAGE_FAILED）时调用，
+    互不依赖的阶段并发执行时各自成对回调，调用方据此分别计时。
+    """
+
+    def __init__(self, stages: List[Stage], cache: Optional[StageCache] = None, workers: int = 2,
+                 on_stage: Callable[[str, str], None] = None):
+        self.stages: Dict[str, Stage] = {stage.name: stage for stage in stages}
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.on_stage = on_stage
+        self.report: Dict[str, dict] = {}
+        self._fingerprints: Dict[str, str] = {}
+        self._check_graph()
+
+    def run(self) -> Dict[str, Any]:
+        """执行流水线；任一阶段失败时不再启动新阶段，等待已启动的阶段结束后抛出该异常。"""
+        results: Dict[str, Any] = {}
+        pending = dict(self.stages)
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pipeline") as executor:
+            while pending or running:
+                # 启动依赖已全部完成的阶段
+                if error is None:
+                    for name, stage in list(pending.items()):
+                        if all(dep in results for dep in stage.deps):
+                            dep_results = {dep: results[dep] for dep in stage.deps}
+                            # 复制当前上下文提交，使阶段内的计时区间归入本次运行记录
+                            ctx = contextvars.copy_context()
+                            running[executor.submit(ctx.run, self._run_stage, stage, dep_results)] = name
+                            del pending[name]
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        log.error(f"❌ 阶段 {name} 执行失败：{e}", "Pipeline")
+                        error = error or e
+        if error is not None:
+            raise error
+        return results
+
+    # ---------------------------
+    # 内部方法：执行单个阶段（指纹未变化时从缓存恢复）
+    # ---------------------------
+    def _run_stage(self, stage: Stage, dep_results: Dict[str, Any]) -> Any:
+        self._notify(stage.name, STAGE_START)
+        try:
+            with _timing.span(f"stage:{stage.name}") as attrs:
+                value = self._execute_stage(stage, dep_results)
+                attrs["cache"] = self.report[stage.name]["status"]
+        except Exception as e:
+            self._notify(stage.name, STAGE_FAILED)
+            # 出错的阶段与异常类型随进度事件推送，便于定位失败原因
+            _progress.emit("stage_failed", stage=stage.name, error_type=type(e).__name__, error=str(e))
+            raise
+        self._notify(stage.name, STAGE_END)
+        _progress.emit("stage_done", stage=stage.name, **self.report[stage.name])
+        return value
+
+    def _notify(self, name: str, event: str) -> None:
+        """调用阶段回调；回调出错不影响阶段执行。"""
+        if self.on_stage is None:
+            return
+        try:
+            self.on_stage(name, event)
+        except Exception as e:
+            log.warn(f"阶段回调出错（{name} {event}）：{e}", "Pipeline")
+
+    def _execute_stage(self, stage: Stage, dep_results: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        fingerprint = stage_fingerprint(stage, [self._fingerprints[dep] for dep in stage.deps])
+        self._fingerprints[stage.name] = fingerprint
+        use_cache = self.cache is not None and stage.cacheable
+        if use_cache:
+            hit, value = self.cache.restore(stage, fingerprint)
+            if hit:
+                self._record(stage.name, STATUS_CACHED, fingerprint, started)
+                log.info(f"⏭️ 阶段 {stage.name} 输入未变化，已从缓存恢复（指纹 {fingerprint[:12]}）", "Pipeline")
+                return value
+        log.info(f"▶️ 开始执行阶段 {stage.name} ...", "Pipeline")
+        value = stage.func(dep_results)
+        if use_cache:
+            self.cache.put(stage, fingerprint, value)
+        self._record(stage.name, STATUS_RUN, fingerprint, started)
+        log.info(f"✅ 阶段 {stage.name} 完成（{self.report[stage.name]['seconds']} 秒）", "Pipeline")
+        return value
+
+    def _record(self, name: str, status: str, fingerprint: str, started: float) -> None:
+        self.report[name] = {
+            "status": status,
+            "fingerprint": fingerprint,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    # ---------------------------
+    # 内部方法：校验依赖关系（依赖的阶段存在且无环）
+    # ---------------------------
+    def _check_graph(self) -> None:
+        visited, visiting = set(), set()
+
+        def visit(name: str):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"流水线阶段存在循环依赖：{name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                if dep not in self.stages:
+                    raise ValueError(f"阶段 {name} 依赖的阶段不存在：{dep}")
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+
+# ============================================================
+# 进程级单例
+# ============================================================
+_CACHE: Optional[StageCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache(config: configparser.ConfigParser) -> Optional[StageCache]:
+    """获取进程级阶段结果缓存；未配置或 enabled = false 时返回 None。"""
+    global _CACHE
+    if not config.getboolean("Pipeline", "enabled", fallback=False):
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = StageCache(
+                cache_dir=config.get("Pipeline", "cache_dir", fallback="cache/pipeline/"),
+                max_bytes=config.getint("Pipeline", "max_size_mb", fallback=1024) * 1024 * 1024,
+            )
+        return _CACHE
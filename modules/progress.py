@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告生成进度事件模块（progress.py）
+------------------------------------------------------------
+功能：
+    报告生成各步骤在完成一个细粒度单元时发出进度事件，由调用方登记的监听函数接收：
+        stage_done        流水线阶段结束（stage、status = run / cached、seconds）
+        sheet_analyzed    一个 sheet 统计完成（sheet、index、total、ok）
+        sheet_rendered    一个 sheet 图片渲染完成（sheet、cached）
+        images_embedded   图片写入报告模板（count）
+        tables_embedded   表格写入报告（count）
+        toc_refreshed     目录与域刷新完成
+    服务进程据此向任务事件流（SSE）推送进度，前端无需轮询状态接口。
+说明：
+    监听函数通过 contextvars 传递，与 timing.py 的运行记录一样随 copy_context() 进入线程池；
+    子进程中没有监听函数，事件由父进程在取回结果时补发。
+    没有监听函数时 emit 不做任何处理；监听函数出错不影响报告生成。
+"""
+
+# ============================================================
+# 导入模块
+# ============================================================
+import contextvars                         # 当前监听函数（跨线程池传递）
+from contextlib import contextmanager      # 监听上下文
+from typing import Callable, Optional      # 类型标注
+
+# 当前监听函数：listener(kind, data)
+_LISTENER: "contextvars.ContextVar[Optional[Callable[[str, dict], None]]]" = \
+    contextvars.ContextVar("progress_listener", default=None)
+
+
+@contextmanager
+def listen(listener: Callable[[str, dict], None]):
+    """在 with 块内将 listener 设为当前监听函数。"""
+    token = _LISTENER.set(listener)
+    try:
+        yield listener
+    finally:
+        _LISTENER.reset(token)
+
+
+def emit(kind: str, **data) -> None:
+    """发出进度事件；没有监听函数时直接返回。"""
+    listener = _LISTENER.get()
+    if listener is None:
+        return
+    try:
+        listener(kind, data)
+    except Exception as e:
+        print(f"⚠️  进度事件处理失败（{kind}）：{e}")
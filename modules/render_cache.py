@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+sheet 图片渲染缓存模块（render_cache.py）
+------------------------------------------------------------
+功能：
+    1. 以 sheet 内容（单元格值与样式、合并单元格、行高列宽、打印设置、页眉页脚、条件格式、图片）、
+       工作簿主题与默认样式，以及页面设置（PAGE_SIZE、ORIENTATION、DPI、图片格式）的哈希值为键，持久保存裁剪后的最终图片
+       （JPG，或 SVG 矢量图及其 PNG 后备图）；含公式或图表等渲染结果依赖其他 sheet 的 sheet 不使用缓存；
+    2. 未变化的 sheet 直接从缓存取图，只有变化的 sheet 需要重新渲染；
+    3. 缓存目录总大小超过上限时按最近使用时间（LRU）淘汰；
+    4. 记录命中/未命中次数并输出日志；
+    5. 保存每个 Excel 文件上次运行的 sheet 指纹清单（manifest.json），供增量渲染比对变化。
+配置：
+    config.ini 的 [RenderCache] 节。
+"""
+
+# ============================================================
+# 导入模块
+# ============================================================
+import os                                  # 文件和路径操作
+import re                                  # 识别页眉页脚中的动态字段
+import html                                # 还原页眉页脚 XML 中的转义字符
+import sys                                 # 修正模块搜索路径
+import shutil                              # 复制缓存文件
+import json                                # 读写指纹清单
+import hashlib                             # 计算内容哈希
+import threading                           # 保护缓存目录的互斥锁
+import configparser                        # 配置解释器
+from typing import Dict, Optional          # 类型标注
+from openpyxl.xml.functions import tostring   # 页面设置、条件格式、图片锚点序列化后计入指纹
+
+# ============================================================
+# 修正项目模块搜索路径
+# ============================================================
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+# ============================================================
+# 项目模块 util
+# ============================================================
+try:
+    from modules import util as _ut
+except Exception as e:
+    _ut = None
+    print(f"⚠️  未找到 util 模块：{e}")
+
+log = _ut.Logger()
+
+# 缓存键格式版本：渲染流程（裁剪方式、编码参数等）或指纹覆盖范围变化时递增，使旧缓存自然失效
+CACHE_KEY_VERSION = "4"
+
+# 页眉页脚中的日期、时间字段（每次渲染的结果不同）
+_DYNAMIC_HEADER_FIELD = re.compile(r"(?<!&)&[DT]")
+
+
+def _xml(obj) -> bytes:
+    """openpyxl 对象 → XML 文本（用于哈希；对象为空时返回 b""）。"""
+    return tostring(obj.to_tree()) if obj is not None else b""
+
+
+def workbook_style_digest(wb) -> str:
+    """
+    工作簿级样式的摘要：主题（theme1.xml，主题颜色与主题字体）、默认字体、命名样式与日期纪元。
+    单元格样式中的主题颜色、未设置样式的单元格的字体都取决于这些设置，替换模板主题后缓存图片不能复用。
+    """
+    h = hashlib.sha256()
+    theme = wb.loaded_theme
+    h.update(b"theme:" + (theme.encode("utf-8") if isinstance(theme, str) else theme or b""))
+    h.update(f"|font:{wb._fonts[0]!r}|epoch:{wb.epoch}".encode("utf-8"))
+    for style in wb._named_styles:
+        h.update(f"|named:{style!r}".encode("utf-8"))
+    return h.hexdigest()
+
+
+def sheet_fingerprint(sheet, page_size: int, orientation: str, dpi: int, image_format: str = "jpg") -> Optional[str]:
+    """
+    计算 openpyxl 工作表的内容指纹（十六进制 SHA-256）；渲染结果不只取决于本 sheet 内容时返回 None（不使用缓存）。
+    覆盖：单元格坐标、值与样式，合并单元格，行高列宽与默认行高列宽，内容区域（副本的打印区域按它设置），
+    打印标题、页边距、打印选项、页眉页脚，条件格式，嵌入图片（内容与位置），页面设置参数与输出图片格式，
+    以及所在工作簿的主题与默认样式（见 workbook_style_digest）。
+    返回 None 的情况：
+        含公式的单元格 —— 工作簿中只有公式文本，渲染的是计算结果，可能引用其他 sheet 或随数据变化；
+        含图表 —— 数据区域可能位于其他 sheet；
+        条件格式的公式引用其他 sheet；页眉页脚含日期、时间字段。
+    同一样式组合只解析一次，避免逐单元格展开样式对象。
+    """
+    if sheet._charts:
+        return None
+    h = hashlib.sha256()
+    h.update(f"v{CACHE_KEY_VERSION}|{page_size}|{orientation}|{dpi}|{image_format}".encode("utf-8"))
+    h.update(f"|workbook:{workbook_style_digest(sheet.parent)}".encode("utf-8"))
+    # 样式组合 → 样式描述的哈希
+    style_digests = {}
+    for row in sheet.iter_rows():
+        for cell in row:
+            if cell.value is None and not cell.has_style:
+                continue
+            if cell.data_type == "f":
+                return None
+            style_key = tuple(cell._style) if cell.has_style else ()
+            digest = style_digests.get(style_key)
+            if digest is None:
+                desc = repr((cell.font, cell.fill, cell.border, cell.alignment, cell.number_format)) \
+                    if cell.has_style else ""
+                digest = hashlib.sha1(desc.encode("utf-8")).hexdigest()
+                style_digests[style_key] = digest
+            h.update(f"{cell.coordinate}={cell.value!r}@{digest};".encode("utf-8"))
+    # 合并单元格
+    h.update(("|merged:" + ",".join(sorted(str(r) for r in sheet.merged_cells.ranges))).encode("utf-8"))
+    # 行高列宽
+    for key, dim in sorted(sheet.column_dimensions.items()):
+        h.update(f"|col:{key}:{dim.min}:{dim.max}:{dim.width}:{dim.hidden}".encode("utf-8"))
+    for key, dim in sorted(sheet.row_dimensions.items()):
+        h.update(f"|row:{key}:{dim.height}:{dim.hidden}".encode("utf-8"))
+    h.update(b"|format:" + _xml(sheet.sheet_format))
+    # 打印设置：原打印区域在副本中被替换为内容区域，故计入内容区域
+    h.update(f"|area:{sheet.calculate_dimension()}|titles:{sheet.print_title_rows}:{sheet.print_title_cols}"
+             f"|state:{sheet.sheet_state}".encode("utf-8"))
+    h.update(b"|margins:" + _xml(sheet.page_margins) + b"|options:" + _xml(sheet.print_options))
+    header_footer = _xml(sheet.HeaderFooter)
+    if _DYNAMIC_HEADER_FIELD.search(html.unescape(header_footer.decode("utf-8"))):
+        return None
+    h.update(b"|header:" + header_footer)
+    # 条件格式（含差异样式）
+    for cf in sheet.conditional_formatting:
+        for rule in cf.rules:
+            if any("!" in str(formula) for formula in rule.formula or ()):
+                return None
+            h.update(f"|cf:{cf.sqref}:".encode("utf-8") + _xml(rule) + _xml(rule.dxf))
+    # 嵌入图片：内容与锚点位置
+    for image in sheet._images:
+        data = image.ref.getvalue() if hasattr(image.ref, "getvalue") else None
+        if data is None:
+            return None
+        anchor = _xml(image.anchor) if hasattr(image.anchor, "to_tree") else str(image.anchor).encode("utf-8")
+        h.update(b"|image:" + hashlib.sha256(data).hexdigest().encode("ascii") + anchor)
+    return h.hexdigest()
+
+
+# ============================================================
+# 渲染缓存类
+# ============================================================
+class RenderCache:
+    """
+    sheet 图片渲染缓存
+    -------------------------
+    缓存文件为 <cache_dir>/<key>.<扩展名>（一个 sheet 可对应多个文件，如 .svg 与 .png），
+    文件修改时间即最近使用时间（命中时刷新），写入新图片后若总大小超过 max_bytes，
+    则从最久未使用的文件开始淘汰。
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, key: str, ext: str = ".jpg") -> str:
+        """缓存键对应的缓存文件路径（ext 为扩展名，如 .jpg）。"""
+        return os.path.join(self.cache_dir, f"{key}{ext}")
+
+    def get(self, key: str, *dest_paths: str) -> bool:
+        """
+        命中时将缓存图片复制到 dest_paths 并返回 True，否则返回 False。
+        每个目标文件按自身扩展名查找缓存文件，全部存在才算命中。
+        """
+        paths = [self.path_for(key, os.path.splitext(dest)[1]) for dest in dest_paths]
+        with self._lock:
+            if not all(os.path.exists(path) for path in paths):
+                self.misses += 1
+                return False
+            for path, dest in zip(paths, dest_paths):
+                shutil.copyfile(path, dest)
+                # 刷新最近使用时间
+                os.utime(path, None)
+            self.hits += 1
+            return True
+
+    def put(self, key: str, *src_paths: str) -> None:
+        """将渲染完成的图片存入缓存（按源文件扩展名保存），并按容量上限淘汰旧文件。"""
+        with self._lock:
+            for src in src_paths:
+                path = self.path_for(key, os.path.splitext(src)[1])
+                tmp_path = path + ".part"
+                # 先写临时文件再原子替换，避免并发读取到半个文件
+                shutil.copyfile(src, tmp_path)
+                os.replace(tmp_path, path)
+            self._evict_locked()
+
+    def load_manifest(self, name: str) -> Dict[str, str]:
+        """读取 Excel 文件 name 上次运行的 sheet 指纹清单（sheet 名 → 指纹），无记录时返回空字典。"""
+        with self._lock:
+            return self._read_manifest_locked().get(name, {})
+
+    def save_manifest(self, name: str, fingerprints: Dict[str, str]) -> None:
+        """保存 Excel 文件 name 本次运行的 sheet 指纹清单。"""
+        path = os.path.join(self.cache_dir, "manifest.json")
+        with self._lock:
+            manifests = self._read_manifest_locked()
+            manifests[name] = dict(fingerprints)
+            with open(path + ".part", "w", encoding="utf-8") as f:
+                json.dump(manifests, f, ensure_ascii=False, indent=2)
+            os.replace(path + ".part", path)
+
+    def hit_rate(self) -> float:
+        """累计命中率（0 ~ 1）。"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    # ---------------------------
+    # 内部方法：读取全部指纹清单（调用方需持有锁；文件缺失或损坏时返回空字典）
+    # ---------------------------
+    def _read_manifest_locked(self) -> Dict[str, Dict[str, str]]:
+        path = os.path.join(self.cache_dir, "manifest.json")
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            log.warn(f"指纹清单读取失败，按首次运行处理：{e}", "RenderCache")
+            return {}
+
+    # ---------------------------
+    # 内部方法：LRU 淘汰（调用方需持有锁）
+    # ---------------------------
+    def _evict_locked(self) -> None:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name == "manifest.json" or name.endswith(".part"):
+                continue
+            st = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        # 按最近使用时间从旧到新淘汰
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+            log.info(f"🧹 渲染缓存淘汰：{name}", "RenderCache")
+
+
+# ============================================================
+# 进程级单例
+# ============================================================
+_CACHE: Optional[RenderCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache(config: configparser.ConfigParser) -> Optional[RenderCache]:
+    """获取进程级渲染缓存；未配置或 enabled = false 时返回 None。"""
+    global _CACHE
+    if not config.getboolean("RenderCache", "enabled", fallback=False):
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = RenderCache(
+                cache_dir=config.get("RenderCache", "cache_dir", fallback="cache/render/"),
+                max_bytes=config.getint("RenderCache", "max_size_mb", fallback=512) * 1024 * 1024,
+            )
+        return _CACHE
+
+
+def current_cache() -> Optional[RenderCache]:
+    """已创建的进程级渲染缓存（尚未创建时返回 None，不会创建缓存目录）。"""
+    return _CACHE
@@ -4,7 +4,7 @@
 巡检报告模板插入表格图片模块（report_embedder.py）
 --------------------------------------------------
 功能说明：
-    本模块用于将 Excel 表格截图（JPG 文件）自动嵌入到 Word 巡检报告模板中，
+    本模块用于将 Excel 表格截图（JPG 文件，或矢量模式下的 SVG 文件）自动嵌入到 Word 巡检报告模板中，
     按照模板中定义的占位符（如 {{表1}}、{{表2}} ... {{表7}}）依次替换为对应的图片。
 
 核心流程：
@@ -24,12 +24,17 @@
 """
 
 import os
+import io
 import re
 import sys
-from typing import Dict
+import threading
+from typing import Dict, Tuple
 from docx import Document
 from docx.shared import Inches
 from docxtpl import DocxTemplate, InlineImage      # 导入 docxtpl 模板类与插图类
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.part import Part
+from docx.oxml import parse_xml
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 import configparser
 from jinja2 import Environment, DebugUndefined
@@ -50,6 +55,19 @@ except Exception as e:
     _ut = None
     print(f"⚠️  未找到 util 模块：{e}")
 
+# Excel → Word 原生表格模块（原生表格模式使用）
+try:
+    from modules import excel_to_tables as _excel_to_tables
+except Exception as e:
+    _excel_to_tables = None
+    print(f"⚠️  未找到 excel_to_tables 模块：{e}")
+
+# 计时与资源统计模块（docx_save 的计时装饰器在模块导入时求值）
+from modules import timing as _timing
+
+# 进度事件模块（只依赖标准库，直接导入）
+from modules import progress as _progress
+
 log = _ut.Logger()
 
 # 全局参数
@@ -58,6 +76,47 @@ PDFS_DIR = ""
 IMAGES_DIR = ""
 OUTPUT_DIR = ""
 COVER_TEMPLATE_PATH = ""
+# SVG 图片扩展（Office 2016 起支持）：a:blip 内的 asvg:svgBlip 引用 SVG 部件，a:blip 本身引用 PNG 后备图
+SVG_BLIP_EXT_XML = (
+    '<a:extLst xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main">'
+    '<a:ext uri="{96DAC541-7B7A-43D3-8B79-37D633B846F1}">'
+    '<asvg:svgBlip xmlns:asvg="http://schemas.microsoft.com/office/drawing/2016/SVG/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" r:embed="%s"/>'
+    '</a:ext></a:extLst>'
+)
+
+# 模板文件内容缓存：(绝对路径, 修改时间, 大小) → 文件字节；批量生成时各报告共用同一份模板内容，不重复读盘
+_TEMPLATE_CACHE: Dict[Tuple[str, int, int], bytes] = {}
+_TEMPLATE_LOCK = threading.Lock()
+
+# ============================================================
+# 矢量图插图类
+# ============================================================
+class SvgInlineImage(InlineImage):
+    """
+    docxtpl 矢量插图：嵌入 SVG 图片，并以同名 PNG 文件作为后备图。
+    支持 SVG 的 Word 显示矢量图，其他软件显示 PNG 后备图；图片尺寸按 PNG 后备图的宽高比计算。
+    """
+
+    def __init__(self, tpl, svg_path: str, width=None, height=None):
+        super().__init__(tpl, os.path.splitext(svg_path)[0] + ".png", width, height)
+        self.svg_path = svg_path
+
+    def _insert_image(self):
+        part = self.tpl.current_rendering_part
+        # 以 PNG 后备图生成内联图片
+        inline = part.new_pic_inline(self.image_descriptor, self.width, self.height)
+        # 添加 SVG 图片部件，并在 a:blip 中引用
+        with open(self.svg_path, "rb") as f:
+            blob = f.read()
+        partname = part.package.next_partname("/word/media/image%d.svg")
+        r_id = part.relate_to(Part(partname, "image/svg+xml", blob, part.package), RT.IMAGE)
+        inline.xpath(".//a:blip")[0].append(parse_xml(SVG_BLIP_EXT_XML % r_id))
+        return (
+            "</w:t></w:r><w:r><w:drawing>%s</w:drawing></w:r><w:r>"
+            '<w:t xml:space="preserve">' % inline.xml
+        )
+
 # ============================================================
 # 模块函数定义
 # ============================================================
@@ -74,11 +133,32 @@ def load_template_file() -> Document:
         sys.exit(1)
 
 
-def load_jpg_files() -> Dict[str, str]:
+def load_template(template_path: str) -> DocxTemplate:
+    """
+    加载 Word 模板为 docxtpl 文档对象。
+    模板文件内容在进程内缓存（文件修改后自动重新读取），每次从内存副本创建新的文档对象，
+    渲染互不影响，批量生成与服务进程中的多个任务共用同一份模板内容。
+    """
+    st = os.stat(template_path)
+    key = (os.path.abspath(template_path), st.st_mtime_ns, st.st_size)
+    with _TEMPLATE_LOCK:
+        blob = _TEMPLATE_CACHE.get(key)
+        if blob is None:
+            with open(template_path, "rb") as f:
+                blob = f.read()
+            # 只保留每个模板的最新版本
+            for old in [k for k in _TEMPLATE_CACHE if k[0] == key[0]]:
+                del _TEMPLATE_CACHE[old]
+            _TEMPLATE_CACHE[key] = blob
+            log.info(f"模板已载入内存：{template_path}")
+    return DocxTemplate(io.BytesIO(blob))
+
+
+def load_jpg_files(images_dir: str) -> Dict[str, str]:
     """
      加载指定目录下的所有表格截图文件，并构建占位符映射表。
      功能：
-         - 自动扫描表1.jpg ~ 表7.jpg；
+         - 自动扫描表1.jpg ~ 表7.jpg（矢量模式下为 表1.svg ~ 表7.svg，附同名 PNG 后备图）；
          - 生成占位符与对应图片路径的字典：
              例如：{"{{表1}}": "/path/to/表1.jpg", ...}
      参数：
@@ -89,20 +169,20 @@ def load_jpg_files() -> Dict[str, str]:
     log.info("✅ 加载图片文件.....")
     image_map = {}
     # 检查图片目录是否存在
-    if not os.path.isdir(IMAGES_DIR):
-        log.info(f"❌ 图片目录不存在：{IMAGES_DIR}")
+    if not os.path.isdir(images_dir):
+        log.info(f"❌ 图片目录不存在：{images_dir}")
         return  # 退出函数
 
-    # 获取所有 .jpg 文件名列表
-    image_files = [f for f in os.listdir(IMAGES_DIR) if f.lower().endswith(".jpg")]
+    # 获取所有 .jpg / .svg 文件名列表
+    image_files = [f for f in os.listdir(images_dir) if f.lower().endswith((".jpg", ".svg"))]
     # 如果未发现任何图片，提示用户
     if not image_files:
-        log.info("⚠️ 未找到任何 .jpg 文件，模板将不进行替换。")
+        log.info("⚠️ 未找到任何 .jpg / .svg 文件，模板将不进行替换。")
 
     # 遍历所有图片文件
     for filename in image_files:
         key = os.path.splitext(filename)[0]  # 从文件名中提取变量名（去除扩展名）
-        img_path = os.path.join(IMAGES_DIR, filename)  # 拼接图片的完整路径
+        img_path = os.path.join(images_dir, filename)  # 拼接图片的完整路径
 
         # 再次确认文件存在（保险处理）
         if os.path.exists(img_path):
@@ -112,7 +192,25 @@ def load_jpg_files() -> Dict[str, str]:
     return image_map
 
 
-def find_placeholders_and_replace_docxtemplate(doc: DocxTemplate, image_map: Dict[str, str]) -> None:
+def build_image_context(doc: DocxTemplate, image_map: Dict[str, str]) -> dict:
+    """
+    占位符 → 图片路径映射表 → docxtpl 渲染上下文（模板变量名 → 插图对象）。
+    参数：
+        doc: DocxTemplate 文档对象
+        image_map (Dict[str, str]): 占位符 → 图片路径 映射表
+    """
+    context = {}  # 初始化上下文字典，用于存放变量名和图片对象
+    for key, img_path in image_map.items():
+        if img_path.lower().endswith(".svg"):
+            context[key] = SvgInlineImage(doc, img_path, width=Inches(6.5))  # 矢量图，宽度 6.5 英寸
+        else:
+            context[key] = InlineImage(doc, img_path, width=Inches(6.5))  # 设置图片宽度为 6.5 英寸
+        log.info(f"键：{key}，值：{img_path}")
+    return context
+
+
+def find_placeholders_and_replace_docxtemplate(doc: DocxTemplate, image_map: Dict[str, str],
+                                               extra_context: dict = None) -> None:
     """
     遍历整个文档（段落与表格单元格），匹配占位符并插入图片。
     逻辑：
@@ -122,17 +220,17 @@ def find_placeholders_and_replace_docxtemplate(doc: DocxTemplate, image_map: Dic
     参数：
         DocxTemplate: Word 文档对象
         image_map (Dict[str, str]): 占位符 → 图片路径 映射表
+        extra_context: 同一次渲染中一并填充的其他模板变量（汇总结果、封面字段等）
     """
-
-    context = {}  # 初始化上下文字典，用于存放变量名和图片对象
-    for key, img_path in image_map.items():
-        context[key] = InlineImage(doc, img_path, width=Inches(6.5))  # 设置图片宽度为 6.5 英寸
-        log.info(f"键：{key}，值：{img_path}")
+    context = build_image_context(doc, image_map)
+    if extra_context:
+        context.update(extra_context)
     # 创建 Jinja 环境对象
     jinja_env = Environment(undefined=DebugUndefined)
 
-    # 渲染模板
-    doc.render(context, jinja_env=jinja_env)
+    # 渲染模板（模板中没有对应变量的占位符保持原样）
+    with _timing.span("docxtpl_render"):
+        doc.render(context, jinja_env=jinja_env)
 
 
 def find_placeholders_and_replace(doc: Document, image_map: Dict[str, str]) -> Document:
@@ -195,26 +293,9 @@ def clean_doc(doc: Document) -> Document:
         log.error(f"❌ 清洗 doc 对象失败：{e}")
     return doc
 
-def create_report_cover(config : configparser.ConfigParser(), info: dict):
-    """
-    生成巡检报告封面。
-    输出路径：out/实验性项目巡检报告.docx
-    """
-    TEMPLATE_PATH =config.get("Path", "template_path")
-    basename = os.path.basename(TEMPLATE_PATH)
-    #print(f"basename = {basename}")
-    # 去掉文件名中的“模板”，构成输出文件名。
-    new_name = re.sub(r"模板\(.*?\)", "", basename).replace(".docx", "")
-    #print(f"new_name = {new_name}")
-    new_name = new_name.strip("-_ ") + ".docx"
-    #print(f"new_name = {new_name}")
-    # 构成输出文件全路径。
-    OUTPUT_DIR = config.get("Path", "output_dir")
-    log.info(f"📄 OUTPUT_DIR：{OUTPUT_DIR}")
-    output_path = os.path.join(OUTPUT_DIR, new_name)
-    log.info(f"📄 正在生成封面：{output_path}")
-    # 填充模板上下文
-    context = {
+def cover_context(info: dict) -> dict:
+    """ 报告基础信息（UI 提交的 JSON）→ 封面模板变量。 """
+    return {
         "项目名称": info.get("project_name", ""),
         "机房名称": info.get("room_name", ""),
         "年度": info.get("year", ""),
@@ -222,31 +303,36 @@ def create_report_cover(config : configparser.ConfigParser(), info: dict):
         "报告日期": info.get("report_date",),
         "责任人": info.get("report_person", ""),
     }
+
+def create_report_cover(config : configparser.ConfigParser(), info: dict, output_path: str = ""):
+    """
+    生成巡检报告封面（单独重新打开并保存报告；generate_report 已在一次渲染中填充封面，仅供单独调用）。
+    输出路径：output_path（未提供时为 out/实验性项目巡检报告.docx）
+    """
+    if not output_path:
+        TEMPLATE_PATH =config.get("Path", "template_path")
+        OUTPUT_DIR = config.get("Path", "output_dir")
+        log.info(f"📄 OUTPUT_DIR：{OUTPUT_DIR}")
+        # 构成输出文件全路径。
+        output_path = _ut.gen_report_output_path_func(TEMPLATE_PATH, OUTPUT_DIR)
+    log.info(f"📄 正在生成封面：{output_path}")
+    # 填充模板上下文
+    context = cover_context(info)
     jinja_env = Environment(undefined=DebugUndefined)
     doc = DocxTemplate(output_path)
     doc.render(context, jinja_env=jinja_env)
     doc.save(output_path)
     log.info(f"✅ 封面生成成功：{output_path}")
+    return output_path
 
-def save_doc(doc: DocxTemplate) -> str:
-    """ 保存 Word 文档到指定目录。 """
-    # 从模板弯路路径取出模板文件名
-    basename = os.path.basename(TEMPLATE_PATH)
-    #print(f"basename = {basename}")
-    # 去掉文件名中的“模板”，构成输出文件名。
-    new_name = re.sub(r"模板\(.*?\)", "", basename).replace(".docx", "")
-    #print(f"new_name = {new_name}")
-    new_name = new_name.strip("-_ ") + ".docx"
-    #print(f"new_name = {new_name}")
-    # 构成输出文件全路径。
-    output_path = os.path.join(OUTPUT_DIR, new_name)
+@_timing.timed("docx_save")
+def save_doc(doc: DocxTemplate, output_path: str) -> str:
+    """ 保存 Word 文档到指定路径。 """
     # 确保输出文件目录存在。
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
     # 保存输出文件。
     doc.save(output_path)
     log.info(f"✅ 生成报告成功：{output_path}")
-    doc = Document(output_path)
-    doc.save(output_path)
     """
     import win32com.client
 
@@ -260,21 +346,41 @@ def save_doc(doc: DocxTemplate) -> str:
     return output_path
 
 
-def run(config: configparser.ConfigParser):
-    """ 模块主执行函数。 """
-    # 提取配置文件参数项
-    global TEMPLATE_PATH, IMAGES_DIR, OUTPUT_DIR
-    TEMPLATE_PATH = config.get("Path", "template_path")
-    IMAGES_DIR = config.get("Path", "images_dir")
-    OUTPUT_DIR = config.get("Path", "output_dir")
+def run(config: configparser.ConfigParser, ws: "_ut.Workspace" = None,
+        summary_text: str = None, info: dict = None):
+    """
+    模块主执行函数。ws 为本次任务的工作区，未提供时使用配置文件中的默认路径。
+    表格图片、汇总结果（summary_text）与封面字段（info）组装为同一个渲染上下文，
+    只执行一次 DocxTemplate.render 与一次保存；未提供的变量在报告中保持占位符原样。
+    """
+    # 提取配置文件参数项（局部变量，避免并发任务互相覆盖）
+    template_path = config.get("Path", "template_path")
+    if ws is None:
+        ws = _ut.create_workspace_func(config)
+    image_format = config.get("PageConf", "image_format", fallback="jpg").strip().lower()
+    # 汇总结果与封面字段
+    extra_context = {}
+    if summary_text is not None:
+        extra_context["汇总结果"] = summary_text
+    if info is not None:
+        extra_context.update(cover_context(info))
     # 加载模板。
-    doc = DocxTemplate(TEMPLATE_PATH)  # 加载 Word 模板为 docxtpl 文档对象
-    # 加载表格截图映射表；
-    image_map = load_jpg_files()
-    # 查找占位符并替换为图片
-    find_placeholders_and_replace_docxtemplate(doc, image_map)
+    doc = load_template(template_path)  # 加载 Word 模板为 docxtpl 文档对象（模板内容进程内共用）
+    if image_format == "table":
+        # 原生表格模式：渲染后 {{表N}} 占位符保持原样，再替换为由 Excel 数据生成的 Word 原生表格
+        find_placeholders_and_replace_docxtemplate(doc, {}, extra_context)
+        font_size = config.getfloat("PageConf", "table_font_size", fallback=0)
+        with _timing.span("excel_to_tables"):
+            replaced = _excel_to_tables.replace_placeholders_with_tables(doc.docx, ws.input_path, font_size)
+        _progress.emit("tables_embedded", count=len(replaced))
+    else:
+        # 加载表格截图映射表；
+        image_map = load_jpg_files(ws.images_dir)
+        # 查找占位符并替换为图片
+        find_placeholders_and_replace_docxtemplate(doc, image_map, extra_context)
+        _progress.emit("images_embedded", count=len(image_map))
     # 保存生成的新报告文件
-    save_doc(doc)
+    save_doc(doc, ws.output_path)
 
 # ============================================================
 # 测试运行（仅在独立运行时触发）
@@ -286,11 +392,11 @@ if __name__ == "__main__":
     # 加载模板。
     doc = DocxTemplate(TEMPLATE_PATH)  # 加载 Word 模板为 docxtpl 文档对象
     #加载表格截图映射表；
-    image_map = load_jpg_files()
+    image_map = load_jpg_files(IMAGES_DIR)
     #查找占位符并替换为图片
     find_placeholders_and_replace_docxtemplate(doc, image_map)
     #保存生成的新报告文件
-    save_doc(doc)
+    save_doc(doc, _ut.gen_report_output_path_func(TEMPLATE_PATH, OUTPUT_DIR))
     # info = {
     #         "project_name": "实验性项目AI巡检系统",
     #         "room_name": "主数据中心机房",
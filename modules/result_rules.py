@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+巡检检查结果判定规则模块（result_rules.py）
+-----------------------------------------
+功能：
+    1. 从声明式规则文件（config/result_rules.json，路径见 config.ini [Path] rules_path）
+       读取表头识别关键词与“检查结果”正常/异常判定词表；
+    2. 规则在加载时一次性编译：关键词表按公共前缀合并为单个正则（前缀树），
+       异常判定的全部条件合并为一个正则，词表增加时判定开销基本不变；
+    3. 以 pandas 向量化字符串运算（str.contains）与布尔掩码运算整列判定，
+       并以向量化字符串拼接生成异常详细描述，代替逐行 apply / iterrows；
+    4. 规则文件修改后自动重新编译（热加载），无需重启服务；新规则有误时沿用旧规则。
+判定规则（与原逐行实现一致）：
+    先去除全部空白字符；
+    正常：匹配 normal_pattern（默认“正常”且其前一个字符不是“不”）；
+    异常：不满足“正常”，包含任一异常关键词，且不包含任一排除词（如“无告警”）。
+"""
+import os
+import re
+import json
+import threading
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# 默认判定参数（未配置规则文件或规则文件缺少对应项时使用）
+DEFAULT_NORMAL_PATTERN = r"(?<!不)正常"
+DEFAULT_ABNORMAL_KEYWORDS = ("不正常", "异常", "错误", "失败", "需检查", "告警")
+DEFAULT_ABNORMAL_EXCLUSIONS = ("无告警",)
+# 默认表头识别关键词：表组 → {标准列名: 关键词列表}（按顺序匹配，每列只归入第一个匹配的标准列）
+DEFAULT_COLUMN_KEYWORDS = {
+    "inspection": {
+        "技术指标": ("指标", "项目", "检查项", "设备序列号", "序列号", "主机名", "机器序号"),
+        "说明": ("说明", "内容", "要求", "描述", "类型", "状态"),
+        "检查结果": ("检查", "检测", "结果", "结论", "运行状态"),
+    },
+    "device": {
+        "统计指标1": ("数据中心",),
+        "统计指标2": ("设备类型",),
+        "统计指标3": ("设备型号",),
+    },
+}
+
+# 永不匹配的正则（空关键词表）
+NEVER_MATCH = r"(?!x)x"
+
+
+def trie_pattern(keywords) -> str:
+    """
+    关键词表 → 按公共前缀合并的正则（关键词按字面匹配），
+    例如 ["不正常", "不在位", "异常"] → "(?:不(?:在位|正常)|异常)"。
+    只用于“是否包含任一关键词”的判断：某关键词是另一关键词的前缀时，只保留较短的关键词。
+    """
+    trie: dict = {}
+    for keyword in keywords:
+        if not keyword:
+            continue
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    if not trie:
+        return NEVER_MATCH
+
+    def build(node: dict) -> str:
+        # 到达某个关键词的结尾即可判定包含，无需继续匹配更长的关键词
+        if "" in node:
+            return ""
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items())]
+        return alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+
+    return build(trie)
+
+
+@dataclass
+class ResultRules:
+    """检查结果判定规则（正则在创建时编译一次，可在多个 sheet 间复用）"""
+    normal_pattern: str = DEFAULT_NORMAL_PATTERN
+    abnormal_keywords: Tuple[str, ...] = DEFAULT_ABNORMAL_KEYWORDS
+    abnormal_exclusions: Tuple[str, ...] = DEFAULT_ABNORMAL_EXCLUSIONS
+    column_keywords: Dict[str, Dict[str, Tuple[str, ...]]] = field(default_factory=lambda: DEFAULT_COLUMN_KEYWORDS)
+    # 规则来源（文件路径，默认规则为空）
+    source: str = ""
+    _normal_re: "re.Pattern" = field(init=False, repr=False)
+    _abnormal_re: "re.Pattern" = field(init=False, repr=False)
+    _column_res: Dict[str, List[Tuple[str, "re.Pattern"]]] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self._normal_re = re.compile(self.normal_pattern)
+        # 异常判定合并为一个正则：不含“正常”、不含排除词、含任一异常关键词
+        self._abnormal_re = re.compile(
+            rf"^(?!.*?(?:{self.normal_pattern}))"
+            rf"(?!.*?{trie_pattern(self.abnormal_exclusions)})"
+            rf".*?{trie_pattern(self.abnormal_keywords)}",
+            re.DOTALL,
+        )
+        self._column_res = {
+            group: [(name, re.compile(trie_pattern(words))) for name, words in mapping.items()]
+            for group, mapping in self.column_keywords.items()
+        }
+
+    @staticmethod
+    def normalize(results: pd.Series) -> pd.Series:
+        """检查结果列 → 去除全部空白字符的字符串（与原实现一致）"""
+        return results.astype(str).fillna("").str.replace(r"\s+", "", regex=True)
+
+    def classify(self, results: pd.Series) -> Tuple[pd.Series, pd.Series]:
+        """整列判定，返回 (异常掩码, 正常掩码)"""
+        s = self.normalize(results)
+        abnormal_mask = s.str.contains(self._abnormal_re, regex=True)
+        # 正常与异常互斥：含“正常”的记录不会被判为异常
+        normal_mask = s.str.contains(self._normal_re, regex=True) & ~abnormal_mask
+        return abnormal_mask, normal_mask
+
+    def match_columns(self, columns: List[str], group: str) -> Dict[str, Optional[str]]:
+        """按表组 group 的表头关键词识别列，返回 {标准列名: 实际列名}（未识别的为 None）"""
+        col_map: Dict[str, Optional[str]] = {name: None for name, _ in self._column_res[group]}
+        for column in columns:
+            for name, pattern in self._column_res[group]:
+                if col_map[name] is None and pattern.search(column):
+                    col_map[name] = column
+                    break
+        return col_map
+
+    def summary(self) -> dict:
+        """规则概要（供服务接口返回）"""
+        return {
+            "source": self.source or "默认规则",
+            "normal_pattern": self.normal_pattern,
+            "abnormal_keywords": len(self.abnormal_keywords),
+            "abnormal_exclusions": len(self.abnormal_exclusions),
+            "column_groups": {group: list(mapping) for group, mapping in self.column_keywords.items()},
+        }
+
+
+def rules_from_dict(data: dict, source: str = "") -> ResultRules:
+    """规则字典（规则文件内容）→ 编译后的 ResultRules；缺少的项使用默认值"""
+    results = data.get("results", {})
+    columns = {
+        group: {name: tuple(words) for name, words in mapping.items()}
+        for group, mapping in data.get("columns", DEFAULT_COLUMN_KEYWORDS).items()
+    }
+    return ResultRules(
+        normal_pattern=results.get("normal_pattern", DEFAULT_NORMAL_PATTERN),
+        abnormal_keywords=tuple(results.get("abnormal_keywords", DEFAULT_ABNORMAL_KEYWORDS)),
+        abnormal_exclusions=tuple(results.get("abnormal_exclusions", DEFAULT_ABNORMAL_EXCLUSIONS)),
+        column_keywords=columns,
+        source=source,
+    )
+
+
+def load_rules_file(path: str) -> ResultRules:
+    """读取并编译 JSON 规则文件（文件或正则有误时抛出异常）"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return rules_from_dict(data, source=path)
+
+
+def join_abnormal_detail(abnormal_df: pd.DataFrame, c_item: str, c_result: str) -> str:
+    """异常详细描述：“1. 指标（结果）；2. ...”，以向量化字符串拼接生成"""
+    if abnormal_df.empty:
+        return ""
+    numbers = pd.Series(range(1, len(abnormal_df) + 1), index=abnormal_df.index).astype(str)
+    # map(str)：空值与原实现一样显示为 "nan"（pandas 3 的 astype(str) 会保留空值）
+    items = abnormal_df[c_item].map(str).str.strip()
+    results = abnormal_df[c_result].map(str).str.strip()
+    return (numbers + ". " + items + "（" + results + "）").str.cat(sep="；")
+
+
+# 默认规则实例
+DEFAULT_RULES = ResultRules()
+
+# ============================================================
+# 当前生效规则（进程级，支持热加载）
+# ============================================================
+RULES_PATH = ""
+_ACTIVE_RULES = DEFAULT_RULES
+_ACTIVE_MTIME = None
+_RULES_LOCK = threading.Lock()
+
+
+def configure(path: str) -> None:
+    """设置规则文件路径（路径变化时下次取用规则会重新加载）"""
+    global RULES_PATH, _ACTIVE_MTIME
+    with _RULES_LOCK:
+        if path != RULES_PATH:
+            RULES_PATH = path
+            _ACTIVE_MTIME = None
+
+
+def reload_rules() -> ResultRules:
+    """立即重新加载规则文件并生效；文件或规则有误时抛出异常，原规则保持不变"""
+    global _ACTIVE_RULES, _ACTIVE_MTIME
+    with _RULES_LOCK:
+        if not RULES_PATH:
+            _ACTIVE_RULES, _ACTIVE_MTIME = DEFAULT_RULES, None
+            return _ACTIVE_RULES
+        mtime = os.stat(RULES_PATH).st_mtime_ns
+        _ACTIVE_RULES = load_rules_file(RULES_PATH)
+        _ACTIVE_MTIME = mtime
+        print(f"✅ 已加载检查结果判定规则：{RULES_PATH}")
+        return _ACTIVE_RULES
+
+
+def current_rules() -> ResultRules:
+    """当前生效规则；规则文件修改时间变化时自动重新编译（热加载），新规则有误时沿用旧规则"""
+    global _ACTIVE_MTIME
+    if not RULES_PATH:
+        return _ACTIVE_RULES
+    try:
+        mtime = os.stat(RULES_PATH).st_mtime_ns
+    except OSError:
+        return _ACTIVE_RULES
+    if mtime != _ACTIVE_MTIME:
+        try:
+            reload_rules()
+        except Exception as e:
+            print(f"⚠️  规则文件有误，继续使用原规则：{RULES_PATH}：{e}")
+            # 记录本次修改时间，文件再次修改前不再重复尝试
+            _ACTIVE_MTIME = mtime
+    return _ACTIVE_RULES
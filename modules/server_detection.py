@@ -5,48 +5,144 @@
 ------------------------------------------------
 功能说明：
     1. 接收 UI 端提交的巡检报告基础信息（JSON 格式）
-    2. 分配唯一报告编号 report_id
-    3. 自动触发巡检报告生成流程：生成封面、采集数据、汇总生成报告
+    2. 分配唯一报告编号 report_id，并将生成任务放入异步任务队列后立即返回
+    3. 后台工作线程执行巡检报告生成流程：生成封面、采集数据、汇总生成报告
+    4. 提供任务状态查询接口与报告下载接口
+    5. 提供巡检统计判定规则的热加载接口
+    6. 批量提交接口：一次提交多个机房/项目的报告（各自指定输入 Excel），返回批次编号与各报告的结果清单
+    7. 任务事件流接口（SSE）：实时推送状态变化、阶段切换与逐 sheet 进度，任务结束后关闭
+    8. 相同请求去重：基础信息、输入 Excel、模板、判定规则与页面设置都相同的请求，
+       返回排队/运行中或有效期内已完成的同一任务，不重复生成
+    9. 准入控制：单份报告走交互通道、批量提交走批量通道（交互通道优先执行）；
+       排队已满或客户端未完成任务过多时返回 HTTP 429 与 Retry-After 响应头
+    10. 监控指标接口 /metrics（Prometheus 文本格式）：任务提交/成功/失败数、各阶段耗时、队列深度、
+        存活的 soffice 实例数、渲染缓存命中率与报告文件大小
 启动方式：
     uvicorn server_detection:app --host 0.0.0.0 --port 8000 --reload
 """
 # ============================================================
 # 导入模块
 # ============================================================
-from fastapi import FastAPI                          # 导入 FastAPI 框架
+from fastapi import FastAPI, Request, Response       # 导入 FastAPI 框架
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse   # 报告下载、429 拒绝、事件流响应
 from pydantic import BaseModel                       # 导入 Pydantic 用于定义请求模型
 from datetime import date                            # 导入日期类型
+from typing import Dict, List, Tuple                 # 类型标注
 import uuid                                          # 导入 uuid 用于生成报告编号
+import time                                          # 任务运行耗时（监控指标）
+import json                                          # 事件流数据、请求指纹序列化
+import hashlib                                       # 计算请求指纹
+import threading                                     # 保护批次表的互斥锁
 import uvicorn
 import configparser
 import os,sys
 
 # PROJECT_ROOT 指向项目的根目录，以便导入 modules 下的自定义模块
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
 # 工具模块（日志、配置打印等）
 try:
-    from util import Logger
+    from modules.util import Logger, create_workspace_func, remove_workspace_func
 except Exception as e:
     print(f"⚠️  未找到 util 模块：{e}")
 # 导入业务模块接口
 try:
-    from report_embedder import create_report_cover      # 封面生成模块
-except Exception as e:
-    print(f"⚠️  未找到 report_embedder 模块：{e}")
-try:
-    from get_data_for_sheet import run_data_fill_pipeline # 数据填表模块
+    from modules.get_data_for_sheet import run_data_fill_pipeline # 数据填表模块
 except Exception as e:
     print(f"⚠️  未找到 get_data_for_sheet 模块：{e}")
 try:
-    from detection_report_gen import generate_report # 报告汇总模块
+    from modules.detection_report_gen import generate_report # 报告汇总模块
 except Exception as e:
     print(f"⚠️  未找到 detection_report_gen 模块：{e}")
+try:
+    from modules.job_queue import (JobQueue, ReportJob, QueueFullError, STATE_SUCCEEDED, STATE_FAILED,  # 异步任务队列模块
+                                   LANE_INTERACTIVE, LANE_BATCH)
+except Exception as e:
+    print(f"⚠️  未找到 job_queue 模块：{e}")
+try:
+    from modules import timing as _timing                 # 计时与资源统计
+except Exception as e:
+    _timing = None
+    print(f"⚠️  未找到 timing 模块：{e}")
+try:
+    from modules import result_rules as _result_rules     # 巡检统计判定规则
+except Exception as e:
+    _result_rules = None
+    print(f"⚠️  未找到 result_rules 模块：{e}")
+try:
+    from modules.soffice_pool import shutdown_pool, current_pool   # LibreOffice 常驻进程池
+except Exception as e:
+    shutdown_pool = current_pool = None
+    print(f"⚠️  未找到 soffice_pool 模块：{e}")
+try:
+    from modules.render_cache import current_cache       # sheet 图片渲染缓存（命中率指标）
+except Exception as e:
+    current_cache = None
+    print(f"⚠️  未找到 render_cache 模块：{e}")
+# 监控指标（Prometheus 文本格式）：只依赖标准库，模块级指标定义直接使用，不做可选导入
+from modules import metrics as _metrics
+# 生成过程进度事件（只依赖标准库，任务执行时直接使用）
+from modules import progress as _progress
+# 文件内容哈希（请求指纹）：报告生成流程本身依赖 pipeline，直接导入
+from modules import pipeline as _pipeline
 
 # 创建日志记录器实例
 log = Logger()
 
 # 全局变量
 CONFIG = None
+# 报告生成任务队列（服务启动时创建）
+JOB_QUEUE = None
+# 批次表：batch_id → 该批次的 report_id 列表（按提交顺序）
+BATCHES: Dict[str, List[str]] = {}
+BATCHES_LOCK = threading.Lock()
+
+# .docx 文件的 MIME 类型
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# ============================================================
+# 监控指标（/metrics 接口输出）
+# ============================================================
+JOBS_SUBMITTED = _metrics.counter("report_jobs_submitted_total", "已入队的报告生成任务数", ["lane"])
+JOBS_DEDUPLICATED = _metrics.counter("report_jobs_deduplicated_total", "复用已有任务的重复提交数", ["lane"])
+JOBS_REJECTED = _metrics.counter("report_jobs_rejected_total", "准入控制拒绝（HTTP 429）的提交数", ["lane"])
+JOBS_FINISHED = _metrics.counter("report_jobs_finished_total", "已结束的报告生成任务数", ["state"])
+JOB_DURATION = _metrics.histogram("report_job_duration_seconds", "报告生成任务运行耗时（秒，不含排队）", ["state"])
+STAGE_DURATION = _metrics.histogram(
+    "report_stage_duration_seconds", "流水线阶段耗时（秒）；cache 为 run（执行）或 cached（从缓存恢复）",
+    ["stage", "cache"])
+STAGE_FAILURES = _metrics.counter("report_stage_failures_total", "流水线阶段失败次数", ["stage"])
+OUTPUT_SIZE = _metrics.histogram(
+    "report_output_bytes", "生成的报告文件大小（字节）",
+    buckets=[2 ** n * 1024 * 1024 // 4 for n in range(9)])  # 256KB ~ 64MB
+
+
+def queue_metrics() -> List[Tuple[dict, float]]:
+    """各通道排队任务数"""
+    return [({"lane": lane}, depth) for lane, depth in JOB_QUEUE.queue_depth().items()] if JOB_QUEUE else []
+
+def soffice_metrics() -> List[Tuple[dict, float]]:
+    """存活的常驻 soffice 实例数（未启用进程池时为 0）"""
+    pool = current_pool() if current_pool is not None else None
+    return [({}, pool.active_count() if pool is not None else 0)]
+
+def render_cache_metrics(field: str):
+    """渲染缓存累计命中/未命中次数或命中率的取值函数（缓存尚未创建时不输出）"""
+    def collect() -> List[Tuple[dict, float]]:
+        cache = current_cache() if current_cache is not None else None
+        if cache is None:
+            return []
+        return [({}, cache.hit_rate() if field == "hit_rate" else getattr(cache, field))]
+    return collect
+
+_metrics.callback("report_queue_depth", "排队（未开始执行）的报告生成任务数", queue_metrics)
+_metrics.callback("report_jobs_running", "正在执行的报告生成任务数",
+                  lambda: [({}, JOB_QUEUE.running_count())] if JOB_QUEUE else [])
+_metrics.callback("soffice_instances_active", "存活的常驻 soffice 实例数", soffice_metrics)
+_metrics.callback("render_cache_hits_total", "sheet 图片渲染缓存累计命中次数", render_cache_metrics("hits"), "counter")
+_metrics.callback("render_cache_misses_total", "sheet 图片渲染缓存累计未命中次数", render_cache_metrics("misses"), "counter")
+_metrics.callback("render_cache_hit_ratio", "sheet 图片渲染缓存累计命中率", render_cache_metrics("hit_rate"))
 
 # ============================================================
 # FastAPI 应用定义
@@ -65,34 +161,280 @@ class ReportInfo(BaseModel):
     report_date: date          # 上报日期
     report_person: str         # 上报责任人
 
+class BatchReportItem(ReportInfo):
+    """批量提交中的一份报告：基础信息 + 本报告的输入 Excel（为空时使用配置文件中的 input_path）"""
+    input_path: str = ""
+
+class BatchRequest(BaseModel):
+    """批量提交请求体"""
+    reports: List[BatchReportItem]
+
 # ============================================================
-# 接口：提交巡检基础信息并自动生成报告
+# 后台任务：执行一次完整的报告生成流程
 # ============================================================
-@app.post("/api/report/basic-info")
-def create_report(info: ReportInfo):
+def on_job_progress(job: ReportJob, event: str, data: dict) -> None:
+    """生成过程的进度事件：写入任务事件（事件流接口推送），阶段结束/失败时记录阶段指标。"""
+    job.add_event(event, data)
+    if event == "stage_done":
+        STAGE_DURATION.observe(data["seconds"], stage=data["stage"], cache=data["status"])
+    elif event == "stage_failed":
+        STAGE_FAILURES.inc(stage=data["stage"])
+
+def run_report_job(job: ReportJob) -> str:
+    """ 在工作线程中执行报告生成，返回生成的报告文件路径。 """
+    # 每个任务使用独立工作区（tmp/<report_id>/ 与 out/..._<report_id>.docx），并发任务互不干扰
+    ws = create_workspace_func(CONFIG, job.report_id, job.info.get("input_path", ""))
+    # 本任务的计时记录（未启用 [Timing] 时为 None）
+    trace = _timing.new_trace(CONFIG, job.report_id) if _timing is not None else None
     try:
-        report_id = "REP-" + uuid.uuid4().hex[:8].upper()
-        print(f"✅ 创建任务报告编号: {report_id} ({info.project_name})")
+        # Step 1: 调用 get_data_for_sheet 采集数据并填表
+        #run_data_fill_pipeline(job.report_id)
 
+        # Step 2: 调用 detection_report_gen 汇总生成最终报告（封面字段与图片、汇总结果在同一次渲染中填充）
+        #         生成过程中的进度事件（逐 sheet 统计、渲染、嵌入、目录刷新）写入任务事件，供事件流接口推送
+        with _progress.listen(lambda event, data: on_job_progress(job, event, data)):
+            output_path = generate_report(CONFIG, on_stage=lambda stage, event: JOB_QUEUE.mark_stage(job, stage, event),
+                                          ws=ws, info=job.info, trace=trace)
+        log.info(f"✅ 报告生成成功: {job.report_id} → {output_path}")
+        JOBS_FINISHED.inc(state=STATE_SUCCEEDED)
+        JOB_DURATION.observe(time.time() - job.started_at, state=STATE_SUCCEEDED)
+        if os.path.exists(output_path):
+            OUTPUT_SIZE.observe(os.path.getsize(output_path))
+        return output_path
+    except Exception as e:
+        print(f"[ERROR] ❌ 生成失败: {job.report_id}: {e}")
+        JOBS_FINISHED.inc(state=STATE_FAILED)
+        JOB_DURATION.observe(time.time() - job.started_at, state=STATE_FAILED)
+        raise
+    finally:
+        # 计时汇总写入任务状态（查询接口 timings.profile）
+        if trace is not None:
+            job.profile = trace.summary()
+        # 清理本任务的中间文件，只保留输出报告
+        remove_workspace_func(ws)
 
+# ============================================================
+# 相同请求去重：请求指纹与任务提交
+# ============================================================
+def request_fingerprint(info: dict) -> str:
+    """
+    请求指纹：基础信息（不含 input_path 本身）、输入 Excel、模板与判定规则文件的内容哈希，以及 [PageConf] 页面设置；
+    未启用去重（[ServerConf] dedupe = false）时返回空字符串。
+    """
+    if not CONFIG.getboolean("ServerConf", "dedupe", fallback=False):
+        return ""
+    input_path = info.get("input_path") or CONFIG.get("Path", "input_path")
+    payload = {
+        "info": {k: v for k, v in info.items() if k != "input_path"},
+        "input": _pipeline.file_digest(input_path),
+        "template": _pipeline.file_digest(CONFIG.get("Path", "template_path")),
+        "rules": _pipeline.file_digest(CONFIG.get("Path", "rules_path", fallback="")),
+        "page_conf": dict(CONFIG.items("PageConf")),
+    }
+    text = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
+def submit_report_jobs(infos: List[dict], lane: str, client: str) -> List[Tuple[ReportJob, bool]]:
+    """
+    为每份报告分配报告编号并提交到 lane 通道，返回 [(任务, 是否复用已有任务), ...]；
+    相同请求的任务已存在时返回已有任务；超过准入上限时抛出 QueueFullError（全部不入队）。
+    """
+    entries = [("REP-" + uuid.uuid4().hex[:8].upper(), info, request_fingerprint(info)) for info in infos]
+    ttl = CONFIG.getfloat("ServerConf", "dedupe_ttl", fallback=0)
+    jobs = JOB_QUEUE.submit_many(entries, dedupe_ttl=ttl, lane=lane, client=client)
+    results = []
+    for (report_id, info, _), job in zip(entries, jobs):
+        if job.report_id != report_id:
+            JOBS_DEDUPLICATED.inc(lane=lane)
+            print(f"♻️ 相同请求的报告任务已存在，复用: {job.report_id} ({job.state})")
+        else:
+            JOBS_SUBMITTED.inc(lane=lane)
+            print(f"✅ 创建任务报告编号: {report_id} ({info.get('project_name', '')}，{lane})")
+        results.append((job, job.report_id != report_id))
+    return results
 
-        # Step 1: 调用 get_data_for_sheet 采集数据并填表
-        #run_data_fill_pipeline(report_id)
+def client_id(request: Request) -> str:
+    """提交方客户端标识：请求头 X-Client-Id，未提供时使用客户端 IP。"""
+    return request.headers.get("x-client-id") or (request.client.host if request.client else "")
 
-        # Step 2: 调用 detection_report_gen 汇总生成最终报告
-        generate_report(CONFIG)
-        if create_report_cover is None:
-            raise RuntimeError("create_report_cover 未正确导入")
-        # Step 3: 调用 report_embedder 生成封面
-        create_report_cover(CONFIG,info.dict())
+def too_many_requests(e: QueueFullError, lane: str) -> JSONResponse:
+    """准入控制拒绝：HTTP 429 + Retry-After 响应头。"""
+    JOBS_REJECTED.inc(lane=lane)
+    print(f"⚠️  拒绝提交: {e}（建议 {e.retry_after} 秒后重试）")
+    return JSONResponse(status_code=429, headers={"Retry-After": str(e.retry_after)},
+                        content={"code": 429, "message": str(e), "data": {"retry_after": e.retry_after}})
+
+# ============================================================
+# 接口：提交巡检基础信息，报告生成任务入队后立即返回
+# ============================================================
+@app.post("/api/report/basic-info")
+def create_report(info: ReportInfo, request: Request):
+    try:
+        [(job, reused)] = submit_report_jobs([info.model_dump()], LANE_INTERACTIVE, client_id(request))
+        message = "相同请求的巡检报告任务已存在，返回已有任务" if reused else "巡检报告任务已提交"
+        return {"code": 200, "message": message, "data": {
+            "report_id": job.report_id,
+            "state": job.state,
+            "deduplicated": reused,
+        }}
+    except QueueFullError as e:
+        return too_many_requests(e, LANE_INTERACTIVE)
+    except Exception as e:
+        print(f"[ERROR] ❌ 提交失败: {e}")
+        return {"code": 500, "message": f"提交失败: {str(e)}"}
 
-        return {"code": 200, "message": "巡检报告生成成功", "data": {
-            "report_id": report_id
+# ============================================================
+# 接口：批量提交报告生成任务（每个机房/项目一份报告），全部入队后立即返回
+# ============================================================
+@app.post("/api/report/batch")
+def create_report_batch(batch: BatchRequest, request: Request):
+    if not batch.reports:
+        return {"code": 400, "message": "批量提交的报告列表为空"}
+    # 提交前校验输入文件，避免部分入队
+    missing = [item.input_path for item in batch.reports if item.input_path and not os.path.exists(item.input_path)]
+    if missing:
+        return {"code": 400, "message": f"输入文件不存在: {missing}"}
+    try:
+        batch_id = "BAT-" + uuid.uuid4().hex[:8].upper()
+        jobs = [job for job, _ in submit_report_jobs([item.model_dump() for item in batch.reports],
+                                                     LANE_BATCH, client_id(request))]
+        with BATCHES_LOCK:
+            BATCHES[batch_id] = [job.report_id for job in jobs]
+        print(f"✅ 创建批次: {batch_id}，共 {len(jobs)} 份报告")
+        return {"code": 200, "message": "批量报告任务已提交", "data": {
+            "batch_id": batch_id,
+            "reports": [batch_result_item(job.report_id) for job in jobs],
         }}
+    except QueueFullError as e:
+        return too_many_requests(e, LANE_BATCH)
+    except ValueError as e:
+        return {"code": 400, "message": str(e)}
+    except Exception as e:
+        print(f"[ERROR] ❌ 批量提交失败: {e}")
+        return {"code": 500, "message": f"批量提交失败: {str(e)}"}
+
+# ============================================================
+# 接口：查询批次结果清单（各报告的状态、输出文件与耗时）
+# ============================================================
+@app.get("/api/report/batch/{batch_id}")
+def get_report_batch(batch_id: str):
+    with BATCHES_LOCK:
+        report_ids = BATCHES.get(batch_id)
+    if report_ids is None:
+        return {"code": 404, "message": f"批次不存在: {batch_id}"}
+    reports = [batch_result_item(report_id) for report_id in report_ids]
+    states = [item["state"] for item in reports]
+    return {"code": 200, "message": "查询成功", "data": {
+        "batch_id": batch_id,
+        "total": len(reports),
+        "succeeded": states.count(STATE_SUCCEEDED),
+        "finished": all(state in (STATE_SUCCEEDED, STATE_FAILED) for state in states),
+        "reports": reports,
+    }}
+
+def batch_result_item(report_id: str) -> dict:
+    """批次结果清单中的一项：报告编号、机房/项目、状态、输出文件与耗时（任务记录已淘汰时状态为 expired）"""
+    job = JOB_QUEUE.get(report_id)
+    if job is None:
+        return {"report_id": report_id, "state": "expired"}
+    return {
+        "report_id": report_id,
+        "project_name": job.info.get("project_name", ""),
+        "room_name": job.info.get("room_name", ""),
+        "input_path": job.info.get("input_path", ""),
+        "state": job.state,
+        "output_path": job.output_path,
+        "error": job.error,
+        "timings": job.to_dict()["timings"],
+    }
+
+# ============================================================
+# 接口：查询报告生成任务状态（状态、当前阶段、耗时）
+# ============================================================
+@app.get("/api/report/{report_id}")
+def get_report_status(report_id: str):
+    job = JOB_QUEUE.get(report_id)
+    if job is None:
+        return {"code": 404, "message": f"报告任务不存在: {report_id}"}
+    return {"code": 200, "message": "查询成功", "data": job.to_dict()}
+
+# ============================================================
+# 接口：任务事件流（Server-Sent Events）
+#   每条事件：id 为事件序号，event 为事件类型（state / stage / stage_done / sheet_analyzed / ...），
+#   data 为 JSON；断线重连时按 Last-Event-ID 请求头（或 after 参数）从下一条事件继续推送。
+#   长时间没有新事件时发送注释行心跳，任务结束（state 为 succeeded / failed）后关闭。
+# ============================================================
+def format_sse(item: dict) -> str:
+    """任务事件 → SSE 文本帧"""
+    data = json.dumps({"time": item["time"], **item["data"]}, ensure_ascii=False, default=str)
+    return f"id: {item['seq']}\nevent: {item['event']}\ndata: {data}\n\n"
+
+def stream_job_events(job: ReportJob, after: int, heartbeat: float):
+    """逐条产出序号大于 after 的任务事件，直到任务结束事件。"""
+    while True:
+        items = job.wait_events(after, heartbeat)
+        if not items:
+            # 任务已结束且没有更多事件（after 已越过结束事件）
+            if job.finished:
+                return
+            yield f": heartbeat {job.state} {job.stage}\n\n"
+            continue
+        for item in items:
+            yield format_sse(item)
+            after = item["seq"]
+            if item["event"] == "state" and item["data"].get("state") in (STATE_SUCCEEDED, STATE_FAILED):
+                return
+
+@app.get("/api/report/{report_id}/events")
+def stream_report_events(report_id: str, request: Request, after: int = 0):
+    job = JOB_QUEUE.get(report_id)
+    if job is None:
+        return {"code": 404, "message": f"报告任务不存在: {report_id}"}
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        after = int(last_event_id)
+    heartbeat = CONFIG.getfloat("ServerConf", "events_heartbeat", fallback=15)
+    return StreamingResponse(stream_job_events(job, after, heartbeat), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ============================================================
+# 接口：下载已生成的报告文件
+# ============================================================
+@app.get("/api/report/{report_id}/download")
+def download_report(report_id: str):
+    job = JOB_QUEUE.get(report_id)
+    if job is None:
+        return {"code": 404, "message": f"报告任务不存在: {report_id}"}
+    if job.state != STATE_SUCCEEDED:
+        return {"code": 409, "message": f"报告尚未生成完成，当前状态: {job.state}"}
+    if not os.path.exists(job.output_path):
+        return {"code": 410, "message": f"报告文件已不存在: {job.output_path}"}
+    return FileResponse(job.output_path, media_type=DOCX_MEDIA_TYPE,
+                        filename=os.path.basename(job.output_path))
+
+# ============================================================
+# 接口：监控指标（Prometheus 文本格式，供 Prometheus 抓取）
+# ============================================================
+@app.get("/metrics")
+def get_metrics():
+    return Response(content=_metrics.REGISTRY.render(), media_type=_metrics.CONTENT_TYPE)
+
+# ============================================================
+# 接口：重新加载巡检统计判定规则文件（无需重启服务）
+# ============================================================
+@app.post("/api/rules/reload")
+def reload_rules():
+    if _result_rules is None:
+        return {"code": 500, "message": "result_rules 模块未正确导入"}
+    try:
+        _result_rules.configure(CONFIG.get("Path", "rules_path", fallback=""))
+        rules = _result_rules.reload_rules()
+        log.info(f"✅ 判定规则已重新加载：{rules.source or '默认规则'}")
+        return {"code": 200, "message": "判定规则已重新加载", "data": rules.summary()}
     except Exception as e:
-        print(f"[ERROR] ❌ 生成失败: {e}")
-        return {"code": 500, "message": f"生成失败: {str(e)}"}
+        # 新规则有误时原规则保持生效
+        print(f"[ERROR] ❌ 判定规则加载失败: {e}")
+        return {"code": 400, "message": f"判定规则加载失败，继续使用原规则: {str(e)}"}
 
 def run(config: configparser.ConfigParser):
     """ 模块主执行函数。 """
@@ -101,7 +443,7 @@ def run(config: configparser.ConfigParser):
     main()
 @app.on_event("startup")
 def init_config():
-    global CONFIG
+    global CONFIG, JOB_QUEUE
     """加载配置文件"""
     # ---------- 1. 初始化 ----------
     # modules_dir：当前脚本所在目录（通常为 detection/modules/）
@@ -121,6 +463,34 @@ def init_config():
     log.info(f"配置文件读取成功：{config_path}，配置文件内容如下：", "config")
     log.show_config(config, "config")   # 调用 Logger 类的 show_config 方法打印配置详情
     CONFIG = config
+
+    # ---------- 3. 加载巡检统计判定规则 ----------
+    if _result_rules is not None:
+        _result_rules.configure(config.get("Path", "rules_path", fallback=""))
+        _result_rules.current_rules()
+
+    # ---------- 4. 创建报告生成任务队列 ----------
+    workers = config.getint("ServerConf", "workers", fallback=1)
+    JOB_QUEUE = JobQueue(
+        run_report_job, max_workers=workers,
+        max_queued={
+            LANE_INTERACTIVE: config.getint("Admission", "max_queued", fallback=0),
+            LANE_BATCH: config.getint("Admission", "max_queued_batch", fallback=0),
+        },
+        per_client_queued=config.getint("Admission", "per_client_queued", fallback=0),
+        per_client_running=config.getint("Admission", "per_client_running", fallback=0),
+        retry_after=config.getint("Admission", "retry_after", fallback=30),
+    )
+    log.info(f"报告生成任务队列已启动，工作线程数：{workers}")
+
+@app.on_event("shutdown")
+def close_job_queue():
+    """服务关闭时停止任务队列，并关闭常驻 soffice 实例"""
+    if JOB_QUEUE is not None:
+        JOB_QUEUE.shutdown(wait=False)
+    if shutdown_pool is not None:
+        shutdown_pool()
+
 def main():
     """ 主函数 """
     # 启动 FastAPI 应用服务，监听 8100 端口
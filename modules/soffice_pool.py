@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LibreOffice 常驻转换进程池模块（soffice_pool.py）
+------------------------------------------------------------
+功能：
+    1. 维护若干个长期运行的 soffice 无头实例，每个实例使用独立的用户配置目录与 UNO 端口；
+    2. 通过 UNO 连接复用实例完成 Excel → PDF 转换与 Word 目录/域刷新，
+       避免每份报告都冷启动 soffice；
+    3. 启动时探测 UNO 就绪状态（代替固定等待），取用前做健康检查，
+       处理文档数达到上限后自动重启实例（回收内存）。
+依赖：
+    libreoffice、python3-uno
+配置：
+    config.ini 的 [SofficePool] 节；pool_size = 0 或缺少 uno 模块时不启用进程池。
+"""
+
+# ============================================================
+# 导入模块
+# ============================================================
+import os                                  # 文件和路径操作
+import sys                                 # 修正模块搜索路径
+import time                                # 就绪探测计时
+import queue                               # 空闲实例队列（阻塞获取）
+import atexit                              # 进程退出时关闭实例
+import threading                           # 保护进程池单例的互斥锁
+import subprocess                          # 启动 soffice 进程
+import configparser                        # 配置解释器
+from contextlib import contextmanager      # 实例借用上下文
+from pathlib import Path                   # 生成 file:// URL
+from typing import List, Optional          # 类型标注
+
+# uno 为可选依赖：缺失时进程池不可用，调用方回退到命令行转换
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
+    PropertyValue = None
+
+# ============================================================
+# 修正项目模块搜索路径
+# ============================================================
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+# ============================================================
+# 项目模块 util
+# ============================================================
+try:
+    from modules import util as _ut
+except Exception as e:
+    _ut = None
+    print(f"⚠️  未找到 util 模块：{e}")
+
+log = _ut.Logger()
+
+
+def uno_props(**kwargs) -> tuple:
+    """将关键字参数转换为 UNO PropertyValue 元组。"""
+    return tuple(PropertyValue(Name=k, Value=v) for k, v in kwargs.items())
+
+
+def resolve_uno_context(port: int, host: str = "localhost"):
+    """连接指定端口上的 soffice UNO 服务，返回远程组件上下文（失败时抛出异常）。"""
+    local_ctx = uno.getComponentContext()
+    resolver = local_ctx.ServiceManager.createInstanceWithContext(
+        "com.sun.star.bridge.UnoUrlResolver", local_ctx
+    )
+    return resolver.resolve(f"uno:socket,host={host},port={port};urp;StarOffice.ComponentContext")
+
+
+def wait_uno_ready(port: int, timeout: float, proc: subprocess.Popen = None, host: str = "localhost"):
+    """
+    轮询探测 soffice UNO 服务是否就绪（代替固定 sleep）。
+    参数：
+        port: UNO 端口
+        timeout: 最长等待秒数
+        proc: 对应的 soffice 进程，若进程提前退出则立即失败
+    返回：
+        远程组件上下文
+    """
+    deadline = time.monotonic() + timeout
+    last_error = None
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"soffice 进程已退出（端口 {port}，返回码 {proc.returncode}）")
+        try:
+            return resolve_uno_context(port, host)
+        except Exception as e:
+            last_error = e
+            time.sleep(0.2)
+    raise TimeoutError(f"soffice UNO 服务在 {timeout} 秒内未就绪（端口 {port}）：{last_error}")
+
+
+# ============================================================
+# 单个 soffice 实例
+# ============================================================
+class SofficeInstance:
+    """
+    常驻 soffice 实例
+    -------------------------
+    独立的用户配置目录与 UNO 端口；保存 UNO 连接（ctx / smgr / desktop）供复用。
+    """
+
+    def __init__(self, index: int, port: int, profile_dir: str, startup_timeout: float):
+        self.index = index
+        self.port = port
+        self.profile_dir = os.path.abspath(profile_dir)
+        self.startup_timeout = startup_timeout
+        # soffice 进程与 UNO 连接
+        self.proc: Optional[subprocess.Popen] = None
+        self.ctx = None
+        self.smgr = None
+        self.desktop = None
+        # 自上次启动以来处理的文档数
+        self.documents = 0
+
+    def start(self):
+        """启动 soffice 进程并等待 UNO 就绪。"""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        cmd = [
+            "soffice",
+            f"-env:UserInstallation={Path(self.profile_dir).as_uri()}",   # 独立用户配置目录
+            "--headless",
+            "--invisible",
+            "--norestore",
+            "--nodefault",
+            "--nolockcheck",
+            "--nologo",
+            f"--accept=socket,host=localhost,port={self.port};urp;StarOffice.ComponentContext",
+        ]
+        started = time.monotonic()
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._bind(wait_uno_ready(self.port, self.startup_timeout, self.proc))
+        self.documents = 0
+        log.info(f"✅ soffice 实例 #{self.index} 已就绪（端口 {self.port}，耗时 {time.monotonic() - started:.1f} 秒）", "SofficePool")
+
+    def stop(self):
+        """关闭 soffice 进程。"""
+        try:
+            if self.desktop is not None:
+                self.desktop.terminate()
+        except Exception:
+            pass
+        if self.proc is not None and self.proc.poll() is None:
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+        self.proc = None
+        self.ctx = self.smgr = self.desktop = None
+
+    def reconnect(self):
+        """重新建立 UNO 连接；进程已退出或连接仍不可用时重启实例。"""
+        if self.proc is not None and self.proc.poll() is None:
+            try:
+                self._bind(resolve_uno_context(self.port))
+                if self.is_healthy():
+                    log.info(f"✅ soffice 实例 #{self.index} 已重新连接", "SofficePool")
+                    return
+            except Exception:
+                pass
+        self.restart()
+
+    def restart(self):
+        """重启实例（回收或健康检查失败时使用）。"""
+        log.info(f"♻️ 重启 soffice 实例 #{self.index}（已处理 {self.documents} 个文档）", "SofficePool")
+        self.stop()
+        self.start()
+
+    def is_healthy(self) -> bool:
+        """健康检查：进程存活且 UNO 连接可正常调用。"""
+        if self.proc is None or self.proc.poll() is not None or self.desktop is None:
+            return False
+        try:
+            self.desktop.getComponents()
+            return True
+        except Exception:
+            return False
+
+    def load_document(self, path: str):
+        """以隐藏方式加载文档，返回 UNO 文档对象。"""
+        url = uno.systemPathToFileUrl(os.path.abspath(path))
+        doc = self.desktop.loadComponentFromURL(url, "_blank", 0, uno_props(Hidden=True))
+        if doc is None:
+            raise RuntimeError(f"soffice 无法加载文档：{path}")
+        return doc
+
+    def convert(self, input_path: str, output_path: str, filter_name: str):
+        """将文档按指定导出过滤器转换并保存到 output_path（例如 calc_pdf_Export）。"""
+        doc = self.load_document(input_path)
+        try:
+            out_url = uno.systemPathToFileUrl(os.path.abspath(output_path))
+            doc.storeToURL(out_url, uno_props(FilterName=filter_name))
+        finally:
+            doc.close(True)
+            self.documents += 1
+
+    # ---------------------------
+    # 内部方法：保存 UNO 连接
+    # ---------------------------
+    def _bind(self, ctx):
+        self.ctx = ctx
+        self.smgr = ctx.ServiceManager
+        self.desktop = self.smgr.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+
+
+# ============================================================
+# soffice 实例池
+# ============================================================
+class SofficePool:
+    """
+    soffice 实例池
+    -------------------------
+    acquire() 借出一个空闲实例（阻塞等待），归还时按已处理文档数上限回收。
+    """
+
+    def __init__(self, size: int, base_port: int, profile_root: str,
+                 max_documents: int = 50, startup_timeout: float = 60, acquire_timeout: float = 300):
+        self.max_documents = max_documents
+        self.acquire_timeout = acquire_timeout
+        self.instances: List[SofficeInstance] = [
+            SofficeInstance(i, base_port + i, os.path.join(profile_root, f"instance_{i}"), startup_timeout)
+            for i in range(size)
+        ]
+        self._idle: "queue.Queue[SofficeInstance]" = queue.Queue()
+
+    def start(self):
+        """启动全部实例并放入空闲队列。"""
+        for inst in self.instances:
+            inst.start()
+            self._idle.put(inst)
+        log.info(f"✅ soffice 进程池启动完成，共 {len(self.instances)} 个实例", "SofficePool")
+
+    @contextmanager
+    def acquire(self):
+        """借出一个健康的空闲实例，with 块结束后自动归还。"""
+        try:
+            inst = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"等待空闲 soffice 实例超时（{self.acquire_timeout} 秒）")
+        try:
+            # 取用前健康检查，异常实例先重连（必要时重启）
+            if not inst.is_healthy():
+                log.warn(f"soffice 实例 #{inst.index} 健康检查失败，正在重连", "SofficePool")
+                inst.reconnect()
+            yield inst
+        finally:
+            # 处理文档数达到上限后回收实例；重启失败时留待下次取用前重试
+            if inst.documents >= self.max_documents:
+                try:
+                    inst.restart()
+                except Exception as e:
+                    log.error(f"soffice 实例 #{inst.index} 回收重启失败：{e}", "SofficePool")
+            self._idle.put(inst)
+
+    def active_count(self) -> int:
+        """当前存活的实例数。"""
+        return sum(1 for inst in self.instances if inst.proc is not None and inst.proc.poll() is None)
+
+    def shutdown(self):
+        """关闭全部实例。"""
+        for inst in self.instances:
+            inst.stop()
+        log.info("soffice 进程池已关闭", "SofficePool")
+
+
+# ============================================================
+# 进程级单例
+# ============================================================
+_POOL: Optional[SofficePool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool(config: configparser.ConfigParser) -> Optional[SofficePool]:
+    """
+    获取（首次调用时创建并启动）进程级 soffice 实例池。
+    未配置 [SofficePool]、pool_size 为 0 或缺少 uno 模块时返回 None，调用方应回退到命令行方式。
+    """
+    global _POOL
+    size = config.getint("SofficePool", "pool_size", fallback=0)
+    if size <= 0 or uno is None:
+        return None
+    with _POOL_LOCK:
+        if _POOL is None:
+            pool = SofficePool(
+                size=size,
+                base_port=config.getint("SofficePool", "base_port", fallback=2100),
+                profile_root=config.get("SofficePool", "profile_dir", fallback="tmp/lo_profiles/"),
+                max_documents=config.getint("SofficePool", "max_documents", fallback=50),
+                startup_timeout=config.getfloat("SofficePool", "startup_timeout", fallback=60),
+                acquire_timeout=config.getfloat("SofficePool", "acquire_timeout", fallback=300),
+            )
+            try:
+                pool.start()
+            except Exception:
+                pool.shutdown()
+                raise
+            _POOL = pool
+            atexit.register(shutdown_pool)
+        return _POOL
+
+
+def current_pool() -> Optional[SofficePool]:
+    """已创建的进程级 soffice 实例池（尚未创建时返回 None，不会启动实例）。"""
+    return _POOL
+
+
+def shutdown_pool():
+    """关闭进程级 soffice 实例池（服务关闭或程序退出时调用）。"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown()
+            _POOL = None
@@ -9,10 +9,23 @@ statistic_inspection_table.py
     不生成文件。
 """
 import pandas as pd
-from typing import List
+from typing import Dict, List, Optional, Union
+from dataclasses import dataclass, field
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
 import re
-import io
-import sys
+import json
+import importlib.util
+# 检查结果判定规则（向量化）
+try:
+    from modules import result_rules as _rules
+    from modules import progress as _progress
+except ImportError:
+    import result_rules as _rules
+    import progress as _progress
+
+# Excel 读取引擎：安装了 python-calamine（需 pandas >= 2.2）时使用更快的 calamine 引擎，否则使用 pandas 默认引擎
+EXCEL_ENGINE = "calamine" if importlib.util.find_spec("python_calamine") is not None else None
 # 清洗 Excel sheet 目前没有用
 def clean_excel_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     """通用清洗：只保留可见有效内容"""
@@ -56,41 +69,22 @@ def get_columns_dict(df: pd.DataFrame, index: int) -> dict:
     自动匹配关键列名，适配不同表头写法，例如：
     返回映射字典：{'技术指标':..., '说明':..., '检查结果':...}
     """
+    # 表头关键词来自规则文件（result_rules），已预编译为正则
+    rules = _rules.current_rules()
+    cols = [str(c).strip().replace("\n", "").replace(" ", "") for c in df.columns]
     if index in [1, 2, 3, 5]:
-        # 统计字典：字典包含 3 个 Key-value 字段。
-        col_map = {"技术指标": None, "说明": None, "检查结果": None}
-        cols = [str(c).strip().replace("\n", "").replace(" ", "") for c in df.columns]
+        # 统计字典：字典包含 3 个 Key-value 字段：技术指标、说明、检查结果。
         # 打印显示表头信息
         print(f"📋 检测到表头共 {len(cols)} 项：{cols}")
-        # 遍历列
-        for c in cols:
-            name = str(c)
-            # 技术指标列（可识别“设备序列号”“机器序号”）
-            if col_map["技术指标"] is None and any(k in name for k in ["指标", "项目", "检查项", "设备序列号", "序列号", "主机名", "机器序号"]):
-                col_map["技术指标"] = c
-            # 说明列（可识别“数据类型”“运行说明”等）
-            elif col_map["说明"] is None and any(k in name for k in ["说明", "内容", "要求", "描述", "类型", "状态"]):
-                col_map["说明"] = c
-            # 检查结果列（兼容“运行状态”“检测结果”等）
-            elif col_map["检查结果"] is None and any(k in name for k in ["检查", "检测", "结果", "结论", "运行状态"]):
-                col_map["检查结果"] = c
+        col_map = rules.match_columns(cols, "inspection")
         # 校验
         if not col_map["技术指标"] or not col_map["检查结果"]:
             raise ValueError(f"❌ 无法识别必要列，请检查表头：{cols}")
         print(f"📋 当前表的列映射 col_map = {col_map}")
     elif index in [6, 7]:
-        # 统计字典：字典包含 3 个 Key-value 字段。
-        col_map = {"统计指标1": None, "统计指标2": None, "统计指标3": None}
-        cols = [str(c).strip().replace("\n", "").replace(" ", "") for c in df.columns]
-        for c in cols:
-            name = str(c)
-            if col_map["统计指标1"] is None and any(k in name for k in ["数据中心"]):
-                col_map["统计指标1"] = c
-            elif col_map["统计指标2"] is None and any(k in name for k in ["设备类型"]):
-                col_map["统计指标2"] = c
-            elif col_map["统计指标3"] is None and any(k in name for k in ["设备型号"]):
-                col_map["统计指标3"] = c    
-            print(f"📋 当前表的列映射 col_map = {col_map}")
+        # 统计字典：字典包含 3 个 Key-value 字段：数据中心、设备类型、设备型号。
+        col_map = rules.match_columns(cols, "device")
+        print(f"📋 当前表的列映射 col_map = {col_map}")
     return col_map
 
 # 加载 Excel sheet 数据
@@ -105,16 +99,89 @@ def load_table(excel_path: str, sheet_name: str) -> pd.DataFrame:
     df = df.reset_index(drop=True)
     return df
 
+# 一次性加载 Excel 全部 sheet
+def load_tables(excel_path: str) -> Dict[str, pd.DataFrame]:
+    """只打开、解析一次 Excel 文件，返回 sheet 名 → DataFrame（按 sheet 顺序，已做与 load_table 相同的清洗）"""
+    try:
+        try:
+            frames = pd.read_excel(excel_path, sheet_name=None, engine=EXCEL_ENGINE)
+        except (ImportError, ValueError):
+            # calamine 引擎不可用（pandas 版本过低等）时回退到默认引擎
+            if EXCEL_ENGINE is None:
+                raise
+            frames = pd.read_excel(excel_path, sheet_name=None)
+    except Exception as e:
+        raise RuntimeError(f"❌ 无法读取文件: {e}")
+    print(f"成功加载 {excel_path} 文件（引擎：{EXCEL_ENGINE or '默认'}），共 {len(frames)} 个表")
+    # 删除全空行
+    return {name: df.dropna(how="all").reset_index(drop=True) for name, df in frames.items()}
+
+# ============================================================
+# 统计结果对象
+# ============================================================
+@dataclass
+class InspectionStats:
+    """表1/2/3/5 巡检统计结果"""
+    sheet_name: str
+    total: int                       # 总项目数
+    check_items: str                 # 检查项（以“、”连接）
+    normal_count: int                # 正常数
+    abnormal_count: int              # 异常数
+    normal_rate: float               # 正常率(%)
+    abnormal_rate: float             # 异常率(%)
+    abnormal_detail: str             # 异常详细（“1. 指标（结果）；2. ...”）
+    abnormal_records: pd.DataFrame = field(repr=False)   # 异常记录
+
+    def to_dict(self) -> dict:
+        """转为可 JSON 序列化的字典（键名与原结果字典一致，异常记录为行列表）"""
+        return {
+            "sheet": self.sheet_name,
+            "总项目数": self.total,
+            "检查项": self.check_items,
+            "正常数": self.normal_count,
+            "异常数": self.abnormal_count,
+            "正常率(%)": self.normal_rate,
+            "异常率(%)": self.abnormal_rate,
+            "异常详细": self.abnormal_detail,
+            "异常记录": frame_records(self.abnormal_records),
+        }
+
+
+@dataclass
+class DeviceStats:
+    """表6/7 设备统计结果"""
+    sheet_name: str
+    center_stat: pd.DataFrame = field(repr=False)   # 按数据中心统计
+    type_stat: pd.DataFrame = field(repr=False)     # 按设备类型统计（跨数据中心）
+    model_stat: pd.DataFrame = field(repr=False)    # 按设备型号统计（跨数据中心）
+
+    def to_dict(self) -> dict:
+        """转为可 JSON 序列化的字典"""
+        return {
+            "sheet": self.sheet_name,
+            "中心统计": frame_records(self.center_stat),
+            "类型统计": frame_records(self.type_stat),
+            "型号统计": frame_records(self.model_stat),
+        }
+
+
+SheetStats = Union[InspectionStats, DeviceStats]
+
+
+def frame_records(df: pd.DataFrame) -> List[dict]:
+    """DataFrame → 行字典列表（空值转为 None，numpy 标量转为 Python 标量，便于 JSON 序列化）"""
+    return json.loads(df.to_json(orient="records", force_ascii=False, date_format="iso"))
+
 # 分析统计逻辑
-def analyze_all(df: pd.DataFrame, col_map: dict, index: int) -> dict:
+def analyze_all(df: pd.DataFrame, col_map: dict, index: int, sheet_name: str = "") -> SheetStats:
     if index in [1, 2, 3, 5]:
-        result = analyze_12345(df, col_map, index)
+        result = analyze_12345(df, col_map, index, sheet_name)
     elif index in [6, 7]:
-        result =analyze_67(df, col_map,index)
+        result =analyze_67(df, col_map,index, sheet_name)
     return result
 
 # 分析表1，表2，表3，表5。
-def analyze_12345(df: pd.DataFrame, col_map: dict, index: int) -> dict:
+def analyze_12345(df: pd.DataFrame, col_map: dict, index: int, sheet_name: str = "") -> InspectionStats:
     """ 执行巡检统计分析 """  
     print(f" .......... 对 sheet{index} 进行统计分析 ..........") 
     # 从列映射字典中提取关键列名
@@ -125,19 +192,8 @@ def analyze_12345(df: pd.DataFrame, col_map: dict, index: int) -> dict:
     # 打印 DataFrame 的结构和前几行内容
     print(f" sheet{index}（前 3 行预览）:")
     print(df.head(3).to_string(index=False))
-    # 将"检查结果c_result"列转换为字符串，去除空格、换行符，然后提交判断
-    s = df[c_result].astype(str).fillna("").str.replace(r"\s+", "", regex=True)
-    #print(f" s = {s}")
-    # 对 s 异常判定条件
-    abnormal_mask = s.apply(
-        lambda x: (
-            (not re.search(r"(?<!不)正常", x)) and
-            any(k in x for k in ["不正常", "异常", "错误", "失败", "需检查", "告警"]) and
-            not any(p in x for p in ["无告警"])
-        )
-    )
-    # 对 s 正常判定条件
-    normal_mask = s.apply(lambda x: re.search(r"(?<!不)正常", x) is not None) & ~abnormal_mask
+    # 将"检查结果c_result"列去除空格、换行符后整列判定（正则预编译，向量化匹配）
+    abnormal_mask, normal_mask = _rules.current_rules().classify(df[c_result])
     # 根据掩码提取正常和异常记录，异常记录: abnormal_df 项。
     abnormal_df = df[abnormal_mask]
     normal_df   = df[normal_mask]
@@ -161,39 +217,31 @@ def analyze_12345(df: pd.DataFrame, col_map: dict, index: int) -> dict:
     abnormal_rate  = round(abnormal_count / total * 100, 2) if total else 0
     print(f"\n统计比例 => 正常率: {normal_rate}% | 异常率: {abnormal_rate}% | 总项目: {total}")
     # 检查项": check_items 项
-    check_items = "、".join(df[c_item].astype(str).tolist())
-    # 异常详细: abnormal_detail 项
-    if not abnormal_df.empty:
-        abnormal_records = []
-        for idx, (_, row) in enumerate(abnormal_df.iterrows(), start=1):
-            item = str(row.get(c_item, "")).strip()
-            res  = str(row.get(c_result, "")).strip()
-            item_str = f"{idx}. {item}（{res}）"
-            abnormal_records.append(item_str)
-        abnormal_detail = "；".join(abnormal_records)
-    else:
-        abnormal_detail = ""
+    check_items = df[c_item].map(str).str.cat(sep="、")
+    # 异常详细: abnormal_detail 项（“1. 指标（结果）；2. ...”）
+    abnormal_detail = _rules.join_abnormal_detail(abnormal_df, c_item, c_result)
     print(f".......... sheet{index} 统计分析完毕 ..........") 
-    # 返回 result 结果字典
-    return {
-        "总项目数": total,
-        "检查项": check_items,
-        "正常数": normal_count,
-        "异常数": abnormal_count,
-        "正常率(%)": normal_rate,
-        "异常率(%)": abnormal_rate,
-        "异常详细": abnormal_detail,
-        "异常记录": abnormal_df
-    }
+    # 返回巡检统计结果对象
+    return InspectionStats(
+        sheet_name=sheet_name,
+        total=total,
+        check_items=check_items,
+        normal_count=normal_count,
+        abnormal_count=abnormal_count,
+        normal_rate=normal_rate,
+        abnormal_rate=abnormal_rate,
+        abnormal_detail=abnormal_detail,
+        abnormal_records=abnormal_df,
+    )
 
 # 分析表6，表75。
-def analyze_67(df: pd.DataFrame, col_map: dict, index: int) -> dict:
+def analyze_67(df: pd.DataFrame, col_map: dict, index: int, sheet_name: str = "") -> DeviceStats:
     """
     对表6/表7执行三维度设备统计分析：
         ① 以数据中心为基点的统计
         ② 以设备类型为基点的统计（跨数据中心）
         ③ 以设备型号为基点的统计（跨数据中心）
-    分析结果存入 result 字典。
+    分析结果存入 DeviceStats 对象。
     """
     print(f"\n.......... 对 sheet{index}（设备统计）进行分析 ..........")
 
@@ -231,114 +279,159 @@ def analyze_67(df: pd.DataFrame, col_map: dict, index: int) -> dict:
           .reset_index(drop=True)
     )
 
+    print(f".......... sheet{index} 统计分析完毕 ..........")
     # ========== 汇总结果 ==========
-    result = {
-        "中心统计": center_stat,
-        "类型统计": type_stat,
-        "型号统计": model_stat
-    }
+    return DeviceStats(
+        sheet_name=sheet_name,
+        center_stat=center_stat,
+        type_stat=type_stat,
+        model_stat=model_stat,
+    )
 
-    print(f".......... sheet{index} 统计分析完毕 ..........")
-    return result
+# ============================================================
+# 汇总文本渲染（只拼接字符串，不重定向 sys.stdout，可在多线程中并发调用）
+# ============================================================
+def render_summary(result: SheetStats) -> str:
+    """统计结果对象 → {{汇总结果}} 文本（与原 print_1235 / print_67 的打印内容一致）"""
+    if isinstance(result, InspectionStats):
+        lines = render_1235(result)
+    else:
+        lines = render_67(result)
+    return "\n".join(lines).strip()
 
-def print_all(sheet_name: str, result: dict, index: int)-> str:
-    """打印统计结果"""
-    """捕获 print_1235 的所有输出为字符串"""
-    buffer = io.StringIO()
+# 渲染表1，表2，表3，表5。
+def render_1235(result: InspectionStats) -> List[str]:
+    lines = [
+        f"\n====== {result.sheet_name} 巡检统计结果 ======",
+        f"总项目数：{result.total}",
+        f"检查项：{result.check_items}",
+        f"正常数：{result.normal_count}",
+        f"异常数：{result.abnormal_count}",
+        f"正常率：{result.normal_rate}%",
+        f"异常率：{result.abnormal_rate}%",
+    ]
+    if result.abnormal_count > 0:
+        lines.append("\n--- 异常项目详细 ---")
+        lines.append(result.abnormal_records.to_string(index=False))
+        lines.append(f"\n异常描述汇总：{result.abnormal_detail}")
+    lines.append("=============================")
+    return lines
 
+# 渲染表6，表7。
+def render_67(result: DeviceStats) -> List[str]:
+    lines = [f"\n====== {result.sheet_name} 巡检统计结果 ======"]
+    # ① 数据中心层统计
+    lines.append("\n[Ⅰ] 按数据中心统计：")
+    lines.append(result.center_stat.to_string(index=False))
+    # ② 设备类型层统计
+    lines.append("\n[Ⅱ] 按设备类型统计（跨数据中心）：")
+    lines.append(result.type_stat.to_string(index=False))
+    # ③ 设备型号层统计
+    lines.append("\n[Ⅲ] 按设备型号统计（跨数据中心）：")
+    lines.append(result.model_stat.to_string(index=False))
 
-            # 捕获所有 print 输出到字符串中
-    from io import StringIO
-    old_stdout = sys.stdout
-    buffer = StringIO()
-    sys.stdout = buffer
-    if index in [1, 2, 3, 5]:
-        print_1235(sheet_name, result)
-    elif index in [6, 7]:
-        print_67(sheet_name, result)
-    sys.stdout = old_stdout
-    summary_text = buffer.getvalue().strip()
-    # 获取内容并返回
+    # ④ 分布说明（按列取值拼接，代替 iterrows）
+    lines.append("\n📍 各数据中心设备类型分布：")
+    df_center = result.center_stat
+    lines.extend(f"  {center}：共 {count} 台设备" for center, count in zip(df_center["数据中心"], df_center["设备总数"]))
+
+    lines.append("\n📍 各设备类型在数据中心的分布：")
+    df_type = result.type_stat
+    lines.extend(f"  {dtype}：共 {count} 台" for dtype, count in zip(df_type["设备类型"], df_type["设备数量"]))
+
+    lines.append("\n📍 各型号在不同中心的分布：")
+    df_model = result.model_stat
+    lines.extend(
+        f"  {model}（{dtype}） - 数量：{count}"
+        for model, dtype, count in zip(df_model["设备型号"], df_model["设备类型"], df_model["数量"])
+    )
+    lines.append("=============================")
+    return lines
+
+def print_all(result: SheetStats) -> str:
+    """打印统计结果，并返回汇总文本"""
+    summary_text = render_summary(result)
+    print(summary_text)
     return summary_text
 
-# 打印表1，表2，表3，表5。
-def print_1235(sheet_name: str, result: dict):
-    print(f"\n====== {sheet_name} 巡检统计结果 ======")  
-    print(f"总项目数：{result['总项目数']}")
-    print(f"检查项：{result['检查项']}")
-    print(f"正常数：{result['正常数']}")
-    print(f"异常数：{result['异常数']}")
-    print(f"正常率：{result['正常率(%)']}%")
-    print(f"异常率：{result['异常率(%)']}%")
-    if result["异常数"] > 0:
-        print("\n--- 异常项目详细 ---")
-        print(result["异常记录"].to_string(index=False))
-        print(f"\n异常描述汇总：{result['异常详细']}")
-    print("=============================")     
-
-# 打印表6，表7。
-def print_67(sheet_name: str, result: dict):
-    print(f"\n====== {sheet_name} 巡检统计结果 ======")  
-    # ① 打印数据中心层统计
-    print("\n[Ⅰ] 按数据中心统计：")
-    print(result["中心统计"].to_string(index=False))
-
-    # ② 打印设备类型层统计
-    print("\n[Ⅱ] 按设备类型统计（跨数据中心）：")
-    print(result["类型统计"].to_string(index=False))
-
-    # ③ 打印设备型号层统计
-    print("\n[Ⅲ] 按设备型号统计（跨数据中心）：")
-    print(result["型号统计"].to_string(index=False))
-
-    # ④ 打印分布说明（结构化输出）
-    print("\n📍 各数据中心设备类型分布：")
-    df_center = result["中心统计"]
-    for _, row in df_center.iterrows():
-        print(f"  {row['数据中心']}：共 {row['设备总数']} 台设备")
-
-    print("\n📍 各设备类型在数据中心的分布：")
-    df_type = result["类型统计"]
-    for _, row in df_type.iterrows():
-        print(f"  {row['设备类型']}：共 {row['设备数量']} 台")
-
-    print("\n📍 各型号在不同中心的分布：")
-    df_model = result["型号统计"]
-    for _, row in df_model.iterrows():
-        print(f"  {row['设备型号']}（{row['设备类型']}） - 数量：{row['数量']}")
-    print("=============================")
-
-# 遍历 excel 的全部 sheet。
-def scan_excel_sheets(excel_path: str, sheet_names: List[str])->str :
-    """遍历并统计多个 Excel sheet"""
-    results_all = []
-    output_lines = []  # ⬅️ 新增：用于收集打印内容
-    for i, sheet_name in enumerate(sheet_names, start=1):
-        print(f"\n===== ({i}) 开始统计：{sheet_name} =====")
-        try:
-            # 加载 excel sheet。
+# 统计单个 sheet（可在线程池或进程池中执行）
+def analyze_sheet(index: int, sheet_name: str, df: pd.DataFrame, excel_path: str, rules_path: str = "") -> Optional[SheetStats]:
+    """
+    统计第 index 个 sheet，出错时打印原因并返回 None。
+    df 为已解析的 DataFrame（为 None 时在此读取该 sheet）；
+    rules_path 为判定规则文件路径，进程池子进程据此加载与主进程相同的规则。
+    """
+    print(f"\n===== ({index}) 开始统计：{sheet_name} =====")
+    try:
+        if rules_path:
+            _rules.configure(rules_path)
+        # 加载 excel sheet（优先使用已解析的 DataFrame）。
+        if df is None:
             df = load_table(excel_path, sheet_name)
-            # 获取表头字典的内容。
-            col_map = get_columns_dict(df, i)
-            # 分析统计。
-            result = analyze_all(df, col_map, i)
-            # 打印分析统计结果
-            output_lines.append(print_all(sheet_name, result, i))
-
+        # 获取表头字典的内容。
+        col_map = get_columns_dict(df, index)
+        # 分析统计。
+        return analyze_all(df, col_map, index, sheet_name)
+    except Exception as e:
+        print(f"❌ 处理 {sheet_name} 时出错：{e}")
+        return None
 
+# 遍历 excel 的全部 sheet，返回统计结果对象列表。
+def scan_excel_results(excel_path: str, sheet_names: List[str], tables: Dict[str, pd.DataFrame] = None,
+                       workers: int = 1, executor: str = "thread") -> List[SheetStats]:
+    """
+    遍历并统计多个 Excel sheet（tables 为 load_tables 的结果，未提供时在此一次性加载）；出错的 sheet 跳过。
+    workers > 1 时各 sheet 分发到线程池（executor="thread"）或进程池（executor="process"）并行统计，
+    结果按原 sheet 顺序合并。
+    """
+    if tables is None:
+        try:
+            tables = load_tables(excel_path)
         except Exception as e:
-            print(f"❌ 处理 {sheet_name} 时出错：{e}")
-            # 拼接所有输出文本为字符串
-    summary_text = "\n".join(output_lines)
-    # ⬅️ 返回两种内容：打印汇总文本 + result 列表
-    return summary_text
+            # 整体读取失败时回退到逐个 sheet 读取，由各 sheet 分别报告错误
+            print(f"⚠️  一次性读取失败，改为逐个 sheet 读取：{e}")
+            tables = {}
+    jobs = [(i, name, tables.get(name), excel_path, _rules.RULES_PATH) for i, name in enumerate(sheet_names, start=1)]
+    workers = min(workers, len(jobs))
+    if workers <= 1:
+        # 顺序统计
+        return collect_results(jobs, (analyze_sheet(*job) for job in jobs))
+    print(f"使用 {workers} 个{'进程' if executor == 'process' else '线程'}并行统计 {len(jobs)} 个 sheet")
+    if executor == "process":
+        # 服务进程是多线程的，fork 可能复制被其他线程持有的锁而死锁，改用 forkserver；
+        # analyze_sheet 为模块级函数，子进程按模块路径导入
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("forkserver"))
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+    with pool:
+        # map 按提交顺序返回，保持 sheet 顺序
+        return collect_results(jobs, pool.map(analyze_sheet, *zip(*jobs)))
+
+# 按 sheet 顺序取回统计结果，并逐个发出进度事件。
+def collect_results(jobs: list, results) -> List[SheetStats]:
+    """每取回一个 sheet 的结果发出 sheet_analyzed 事件（进程池中的 sheet 也由此在父进程发出）；跳过出错的 sheet"""
+    collected = []
+    for (index, name, *_), result in zip(jobs, results):
+        _progress.emit("sheet_analyzed", sheet=name, index=index, total=len(jobs), ok=result is not None)
+        if result is not None:
+            collected.append(result)
+    return collected
+
+# 遍历 excel 的全部 sheet，返回汇总文本。
+def scan_excel_sheets(excel_path: str, sheet_names: List[str], tables: Dict[str, pd.DataFrame] = None,
+                      workers: int = 1, executor: str = "thread")->str :
+    """遍历并统计多个 Excel sheet，返回全部 sheet 的 {{汇总结果}} 文本（workers、executor 见 scan_excel_results）"""
+    results_all = scan_excel_results(excel_path, sheet_names, tables, workers, executor)
+    return "\n".join(render_summary(result) for result in results_all)
+
 # 主入口函数
 def main():
     excel_path = "../data/巡检报告数据集(1.0).xlsx"   # 固定输入路径
-    # 获取 excel 的 sheet 更准确名称
-    sheet_names = get_excel_sheets(excel_path)
+    # 一次性加载 excel 的全部 sheet
+    tables = load_tables(excel_path)
     # 遍历 excel，对每个 sheet 进行 检查统计。
-    scan_excel_sheets(excel_path, sheet_names)
+    for result in scan_excel_results(excel_path, list(tables), tables):
+        print_all(result)
 
 # 程序入口
 if __name__ == "__main__":
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告生成计时与资源统计模块（timing.py）
+------------------------------------------------------------
+功能：
+    1. 以计时区间（span）包裹流水线阶段与子步骤（adjust_excel、soffice 转换、PDF 栅格化、
+       裁剪、docxtpl 渲染、保存、UNO 刷新等），记录：
+        wall_seconds        墙钟耗时
+        cpu_seconds                 当前线程 CPU 时间
+        process_child_cpu_seconds   区间内本进程任一线程的子进程结束时累计的 CPU 时间（pdftoppm、进程池等）
+        process_peak_rss_mb         本进程峰值常驻内存（截至区间结束的最高水位）
+        bytes_written               当前线程写出的字节数（/proc/thread-self/io 的 wchar）
+    2. 每个区间结束时以一行 JSON 追加到区间日志文件（JSON Lines）；
+    3. 每次运行汇总各区间的次数、耗时与资源，输出日志并写入任务状态接口。
+说明：
+    区间只在有活动的运行记录（Trace）时生效，否则不做任何统计；
+    运行记录通过 contextvars 传递，在线程池中执行的阶段需以 copy_context() 提交。
+    process_ 前缀的两项取自 getrusage，是进程级数值：服务进程同时执行多个任务（或流水线并发执行多个阶段）时，
+    包含其他任务与阶段的子进程 CPU 和内存，只能作为整个进程的参考，不能归因到单个区间。
+配置：
+    config.ini 的 [Timing] 节。
+"""
+
+# ============================================================
+# 导入模块
+# ============================================================
+import os                                  # 文件和路径操作
+import sys                                 # 修正模块搜索路径
+import time                                # 墙钟与 CPU 计时
+import json                                # 区间日志（JSON Lines）
+import functools                           # 计时装饰器
+import threading                           # 保护运行记录与日志文件的互斥锁
+import contextvars                         # 当前运行记录与父区间（跨线程池传递）
+import configparser                        # 配置解释器
+from contextlib import contextmanager      # 计时区间上下文
+from typing import Dict, List, Optional    # 类型标注
+
+# resource 为 Unix 模块：缺失时不统计峰值内存与子进程 CPU
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# ============================================================
+# 修正项目模块搜索路径
+# ============================================================
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+# 线程级 I/O 统计文件（Linux 3.17+），不存在时退回进程级
+PROC_IO_PATH = "/proc/thread-self/io" if os.path.exists("/proc/thread-self/io") else "/proc/self/io"
+
+# 当前运行记录与当前区间名（父区间）
+_CURRENT_TRACE: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar("timing_trace", default=None)
+_CURRENT_SPAN: "contextvars.ContextVar[str]" = contextvars.ContextVar("timing_span", default="")
+
+# 区间日志文件写入锁（多个运行记录可写同一文件）
+_WRITE_LOCK = threading.Lock()
+
+
+def read_bytes_written() -> Optional[int]:
+    """当前线程（或进程）累计写出的字节数；不支持时返回 None。"""
+    try:
+        with open(PROC_IO_PATH, "r") as f:
+            for line in f:
+                if line.startswith("wchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def children_cpu_seconds() -> float:
+    """本进程已结束子进程的累计 CPU 时间（用户态 + 内核态，进程级）。"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def peak_rss_mb() -> Optional[float]:
+    """本进程峰值常驻内存（MB，进程级）；Linux 的 ru_maxrss 单位为 KB。"""
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+# ============================================================
+# 运行记录类
+# ============================================================
+class Trace:
+    """
+    一次报告生成的计时记录
+    -------------------------
+    收集本次运行的全部区间记录；spans_path 非空时每个区间结束即追加一行 JSON。
+    """
+
+    def __init__(self, run_id: str, spans_path: str = ""):
+        self.run_id = run_id
+        self.spans_path = spans_path
+        self.records: List[dict] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self):
+        """在 with 块内将本记录设为当前运行记录。"""
+        token = _CURRENT_TRACE.set(self)
+        try:
+            yield self
+        finally:
+            _CURRENT_TRACE.reset(token)
+
+    def record(self, item: dict) -> None:
+        """保存一个区间记录，并写入区间日志。"""
+        with self._lock:
+            self.records.append(item)
+        if self.spans_path:
+            line = json.dumps(item, ensure_ascii=False, default=str)
+            with _WRITE_LOCK:
+                os.makedirs(os.path.dirname(self.spans_path) or ".", exist_ok=True)
+                with open(self.spans_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+    def summary(self) -> Dict[str, dict]:
+        """按区间名汇总：次数、总耗时、CPU 时间、写出字节数之和，进程峰值内存取最大值（按首次出现顺序）。"""
+        result: Dict[str, dict] = {}
+        with self._lock:
+            records = list(self.records)
+        for item in records:
+            agg = result.setdefault(item["span"], {
+                "count": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "process_child_cpu_seconds": 0.0,
+                "process_peak_rss_mb": None, "bytes_written": None,
+            })
+            agg["count"] += 1
+            for key in ("wall_seconds", "cpu_seconds", "process_child_cpu_seconds"):
+                agg[key] = round(agg[key] + item[key], 3)
+            if item["process_peak_rss_mb"] is not None:
+                agg["process_peak_rss_mb"] = max(agg["process_peak_rss_mb"] or 0.0, item["process_peak_rss_mb"])
+            if item["bytes_written"] is not None:
+                agg["bytes_written"] = (agg["bytes_written"] or 0) + item["bytes_written"]
+        return result
+
+
+def format_summary(summary: Dict[str, dict]) -> str:
+    """计时汇总 → 多行文本（输出到日志）；带“进程”字样的两列为进程级数值，含同时执行的其他任务。"""
+    lines = [f"{'区间':<28}{'次数':>4}{'耗时(s)':>10}{'CPU(s)':>9}{'进程子进程CPU(s)':>15}{'进程峰值内存(MB)':>15}{'写出(KB)':>10}"]
+    for name, agg in summary.items():
+        rss = f"{agg['process_peak_rss_mb']:.1f}" if agg["process_peak_rss_mb"] is not None else "-"
+        written = f"{agg['bytes_written'] / 1024:.0f}" if agg["bytes_written"] is not None else "-"
+        lines.append(f"{name:<28}{agg['count']:>4}{agg['wall_seconds']:>10.3f}{agg['cpu_seconds']:>9.3f}"
+                     f"{agg['process_child_cpu_seconds']:>15.3f}{rss:>15}{written:>10}")
+    return "\n".join(lines)
+
+
+# ============================================================
+# 计时区间
+# ============================================================
+@contextmanager
+def span(name: str, **attrs):
+    """
+    计时区间：with span("docx_save", path=...) as attrs: ...
+    with 块内可向 attrs 字典补充属性（如缓存命中状态），随区间记录一并输出。
+    没有活动的运行记录时不做任何统计。
+    """
+    trace = _CURRENT_TRACE.get()
+    if trace is None:
+        yield attrs
+        return
+    parent = _CURRENT_SPAN.get()
+    token = _CURRENT_SPAN.set(name)
+    started_at = time.time()
+    wall0 = time.perf_counter()
+    cpu0 = time.thread_time()
+    child0 = children_cpu_seconds()
+    written0 = read_bytes_written()
+    status = "ok"
+    try:
+        yield attrs
+    except BaseException as e:
+        status = "error"
+        attrs.setdefault("error", str(e))
+        raise
+    finally:
+        _CURRENT_SPAN.reset(token)
+        written1 = read_bytes_written()
+        trace.record({
+            "run_id": trace.run_id,
+            "span": name,
+            "parent": parent,
+            "started_at": round(started_at, 3),
+            "wall_seconds": round(time.perf_counter() - wall0, 4),
+            "cpu_seconds": round(time.thread_time() - cpu0, 4),
+            "process_child_cpu_seconds": round(children_cpu_seconds() - child0, 4),
+            "process_peak_rss_mb": peak_rss_mb(),
+            "bytes_written": written1 - written0 if written0 is not None and written1 is not None else None,
+            "status": status,
+            **attrs,
+        })
+
+
+def timed(name: str):
+    """计时装饰器：以区间 name 包裹整个函数调用。"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def new_trace(config: configparser.ConfigParser, run_id: str) -> Optional[Trace]:
+    """按 [Timing] 配置创建运行记录；enabled = false 时返回 None（不计时）。"""
+    if not config.getboolean("Timing", "enabled", fallback=False):
+        return None
+    return Trace(run_id, config.get("Timing", "spans_path", fallback=""))
@@ -3,81 +3,86 @@
 
 
 import os, sys, subprocess, time, socket
-
-import uno
+import threading
+from typing import List
 
 import re
 
 import configparser
 
-from com.sun.star.beans import PropertyValue
-import time
-import subprocess
+# uno 为可选依赖：服务自身的解释器缺少 uno 时，改用系统 python3 以子进程方式运行本脚本刷新目录
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+except ImportError:
+    uno = None
+    PropertyValue = None
+
+# 修正项目模块搜索路径（以脚本方式运行时也能导入 modules 下的模块）
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+# LibreOffice 常驻进程池模块
+from modules import soffice_pool as _soffice_pool
+# 计时与资源统计模块
+from modules import timing as _timing
+# 进度事件模块
+from modules import progress as _progress
+
+# 独立 soffice UNO 服务端口（未启用进程池时使用）
+UNO_PORT = 2002
+# 独立 soffice UNO 服务启动就绪探测超时（秒）
+UNO_STARTUP_TIMEOUT = 60
+# 本进程无法导入 uno 时，以子进程方式运行本脚本所用的解释器（通常为带 python3-uno 的系统解释器）
+UNO_PYTHON = "python3"
 
 def ensure_soffice_service():
     """
     检查 soffice UNO 服务是否在运行，否则自动启动。
+    以实际的 UNO 连接探测就绪状态，代替 pgrep 与固定等待。
     """
     print("🔍 检查 LibreOffice UNO 服务状态...")
-    result = subprocess.run(["pgrep", "-f", "soffice.*headless"], capture_output=True, text=True)
-    if result.returncode == 0:
+    try:
+        _soffice_pool.resolve_uno_context(UNO_PORT)
         print("✅ 检测到 soffice 服务已在运行。")
         return True
+    except Exception:
+        pass
 
     print("⚠️ 未检测到 soffice 服务，尝试启动中...")
     cmd = [
         "soffice",
         "--headless",
-        '--accept=socket,host=localhost,port=2002;urp;',
+        f'--accept=socket,host=localhost,port={UNO_PORT};urp;',
         "--norestore",
         "--nodefault",
         "--nolockcheck",
     ]
-    subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    time.sleep(5)  # 等待 UNO 服务完全启动
-    result = subprocess.run(["pgrep", "-f", "soffice.*headless"], capture_output=True, text=True)
-    if result.returncode == 0:
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # 轮询 UNO 连接直到服务就绪
+        _soffice_pool.wait_uno_ready(UNO_PORT, UNO_STARTUP_TIMEOUT, proc)
         print("✅ 已启动 soffice UNO 服务。")
         return True
-    else:
-        print("❌ soffice 服务启动失败")
+    except Exception as e:
+        print(f"❌ soffice 服务启动失败：{e}")
         return False
-    
 
 
-def update_docx_fields(template_path: str, output_dir: str):
+def default_output_path(template_path: str, output_dir: str) -> str:
     """
-    通过 LibreOffice UNO 刷新 Word 文档的目录、页码等所有域。
-    需先启动：
-      soffice --headless --accept="socket,host=localhost,port=2002;urp;" --norestore &
+    根据模板路径与输出目录生成默认输出报告路径（命令行旧用法）。
     """
-    ensure_soffice_service()
     basename = os.path.basename(template_path)
-    #print(f"basename = {basename}")
     # 去掉文件名中的“模板”，构成输出文件名。
     new_name = re.sub(r"模板\(.*?\)", "", basename).replace(".docx", "")
-    #print(f"new_name = {new_name}")
     new_name = new_name.strip("-_ ") + ".docx"
-    #print(f"new_name = {new_name}")
     # 构成输出文件全路径。
-    output_path = os.path.join(output_dir, new_name)
-    output_path = os.path.abspath(output_path)
-    # 连接到正在运行的 soffice 服务
-    local_ctx = uno.getComponentContext()
-    resolver = local_ctx.ServiceManager.createInstanceWithContext(
-        "com.sun.star.bridge.UnoUrlResolver", local_ctx
-    )
-    ctx = resolver.resolve(
-        "uno:socket,host=localhost,port=2002;urp;StarOffice.ComponentContext"
-    )
-    smgr = ctx.ServiceManager
-    desktop = smgr.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+    return os.path.join(output_dir, new_name)
 
-    # 以隐藏方式加载文档
-    props = (PropertyValue(Name="Hidden", Value=True),)
-    url = uno.systemPathToFileUrl( output_path )
-    doc = desktop.loadComponentFromURL(url, "_blank", 0, props)
 
+def refresh_loaded_document(ctx, smgr, doc):
+    """刷新已加载文档的全部域与文档索引：先用接口方式，失败时改用 Dispatcher；两种方式都失败时抛出 RuntimeError。"""
     # --- 方法A：通过接口刷新（首选） ---
     try:
         # 1) 刷新所有文本域（页码、交叉引用、日期等）
@@ -91,51 +96,188 @@ def update_docx_fields(template_path: str, output_dir: str):
         for i in range(indexes.getCount()):
             idx = indexes.getByIndex(i)        # XDocumentIndex
             idx.update()
-
-        refreshed = True
+        return
     except Exception:
-        refreshed = False
+        pass
 
     # --- 方法B：Dispatcher 触发 .uno:UpdateAll（兜底） ---
-    if not refreshed:
+    try:
+        frame = doc.getCurrentController().getFrame()
+        dispatcher = smgr.createInstanceWithContext("com.sun.star.frame.DispatchHelper", ctx)
+        # UpdateAll 会尝试更新所有域与索引
+        dispatcher.executeDispatch(frame, ".uno:UpdateAll", "", 0, tuple())
+        # 再明确触发 UpdateFields / UpdateAllIndexes，增强兼容性
+        dispatcher.executeDispatch(frame, ".uno:UpdateFields", "", 0, tuple())
+        dispatcher.executeDispatch(frame, ".uno:UpdateAllIndexes", "", 0, tuple())
+    except Exception as e:
+        # 两条路径都失败则抛出
+        raise RuntimeError(f"无法刷新目录/域：{e}")
+
+
+@_timing.timed("uno_refresh")
+def refresh_document_fields(ctx, smgr, desktop, output_path: str):
+    """
+    在已连接的 soffice 实例上刷新 Word 文档的目录、页码等所有域，并保存。
+    参数：
+        ctx / smgr / desktop: UNO 组件上下文、服务管理器与 Desktop 对象
+        output_path: 待刷新的报告文件路径
+    """
+    output_path = os.path.abspath(output_path)
+    # 以隐藏方式加载文档
+    props = (PropertyValue(Name="Hidden", Value=True),)
+    url = uno.systemPathToFileUrl( output_path )
+    doc = desktop.loadComponentFromURL(url, "_blank", 0, props)
+    # 刷新或保存出错时也必须关闭文档，否则文档会一直留在常驻 soffice 实例中
+    try:
+        refresh_loaded_document(ctx, smgr, doc)
+        # 保存
+        doc.store()
+    finally:
         try:
-            frame = doc.getCurrentController().getFrame()
-            dispatcher = smgr.createInstanceWithContext("com.sun.star.frame.DispatchHelper", ctx)
-            # UpdateAll 会尝试更新所有域与索引
-            dispatcher.executeDispatch(frame, ".uno:UpdateAll", "", 0, tuple())
-            # 再明确触发 UpdateFields / UpdateAllIndexes，增强兼容性
-            dispatcher.executeDispatch(frame, ".uno:UpdateFields", "", 0, tuple())
-            dispatcher.executeDispatch(frame, ".uno:UpdateAllIndexes", "", 0, tuple())
-        except Exception as e:
-            # 两条路径都失败则抛出
             doc.close(True)
-            raise RuntimeError(f"无法刷新目录/域：{e}")
-
-    # 保存并关闭
-    doc.store()
-    doc.close(True)
+        except Exception as e:
+            # 关闭失败不掩盖刷新/保存的异常
+            print(f"⚠️  关闭文档失败：{output_path}：{e}")
     print(f"✅ 已更新目录与页码：{ output_path }")
+    _progress.emit("toc_refreshed", path=os.path.basename(output_path))
 
-def run(config: configparser.ConfigParser):
-    """ 模块主执行函数。 """
-    # 提取配置文件参数项
-    global TEMPLATE_PATH, IMAGES_DIR, OUTPUT_DIR
-    TEMPLATE_PATH = config.get("Path", "template_path")
-    IMAGES_DIR = config.get("Path", "images_dir")
-    OUTPUT_DIR = config.get("Path", "output_dir")
-    update_docx_fields(TEMPLATE_PATH,OUTPUT_DIR)
+
+class UnoConnection:
+    """
+    缓存的 UNO Desktop 连接
+    -------------------------
+    首次使用时连接（必要时启动）独立 soffice UNO 服务，之后复用同一连接，
+    省去每份报告的解释器启动、import uno 与 UNO 握手；
+    连接失效（soffice 重启、桥接断开）时自动重连。
+    """
+
+    def __init__(self, port: int = UNO_PORT):
+        self.port = port
+        self.ctx = None
+        self.smgr = None
+        self.desktop = None
+        # 同一连接上的文档刷新串行执行
+        self.lock = threading.RLock()
+
+    def is_alive(self) -> bool:
+        """连接是否可用（能正常调用 Desktop）。"""
+        if self.desktop is None:
+            return False
+        try:
+            self.desktop.getComponents()
+            return True
+        except Exception:
+            return False
+
+    def connect(self):
+        """建立（或重新建立）到 soffice UNO 服务的连接。"""
+        ensure_soffice_service()
+        self.ctx = _soffice_pool.resolve_uno_context(self.port)
+        self.smgr = self.ctx.ServiceManager
+        self.desktop = self.smgr.createInstanceWithContext("com.sun.star.frame.Desktop", self.ctx)
+        print(f"✅ 已连接 soffice UNO 服务（端口 {self.port}）")
+
+    def get(self):
+        """返回可用的 (ctx, smgr, desktop)，连接失效时自动重连。"""
+        if not self.is_alive():
+            self.connect()
+        return self.ctx, self.smgr, self.desktop
+
+
+# 进程级缓存的 UNO 连接（未启用进程池时使用）
+_CONNECTION = UnoConnection()
+
+
+def update_docx_fields_batch(output_paths: List[str], connection: UnoConnection = None):
+    """
+    通过同一个缓存的 UNO 连接依次刷新多份 Word 文档的目录、页码等所有域。
+    刷新失败且连接已断开时，重连后重试一次；连接仍然正常则说明是文档本身的问题，直接抛出。
+    """
+    conn = connection or _CONNECTION
+    with conn.lock:
+        for output_path in output_paths:
+            ctx, smgr, desktop = conn.get()
+            try:
+                refresh_document_fields(ctx, smgr, desktop, output_path)
+            except Exception as e:
+                if conn.is_alive():
+                    raise
+                print(f"⚠️ UNO 连接已断开（{e}），重连后重试：{output_path}")
+                ctx, smgr, desktop = conn.get()
+                refresh_document_fields(ctx, smgr, desktop, output_path)
+
+
+def update_docx_fields(output_path: str, connection: UnoConnection = None):
+    """
+    通过缓存的 UNO 连接刷新 Word 文档的目录、页码等所有域（本进程内调用）。
+    未启动独立 soffice 服务时自动启动：
+      soffice --headless --accept="socket,host=localhost,port=2002;urp;" --norestore &
+    """
+    update_docx_fields_batch([output_path], connection)
+
+
+def update_docx_fields_pooled(pool, output_paths: List[str]):
+    """
+    借用一个常驻 soffice 实例依次刷新多份文档；
+    实例连接断开时先重连（进程已退出则重启）再重试一次。
+    """
+    with pool.acquire() as inst:
+        for output_path in output_paths:
+            try:
+                refresh_document_fields(inst.ctx, inst.smgr, inst.desktop, output_path)
+            except Exception as e:
+                if inst.is_healthy():
+                    raise
+                print(f"⚠️ soffice 实例 #{inst.index} 连接已断开（{e}），重连后重试：{output_path}")
+                inst.reconnect()
+                refresh_document_fields(inst.ctx, inst.smgr, inst.desktop, output_path)
+            inst.documents += 1
+
+
+def update_docx_fields_subprocess(output_path: str):
+    """
+    本进程无法导入 uno 时，以系统解释器运行本脚本刷新文档（每份报告启动一次解释器与 UNO 连接）。
+    """
+    script_path = os.path.abspath(__file__)
+    subprocess.run([UNO_PYTHON, script_path, output_path], check=True)
+
+
+def run(config: configparser.ConfigParser, ws=None):
+    """ 模块主执行函数。ws 为本次任务的工作区，未提供时使用配置文件中的默认路径。 """
+    if ws is not None:
+        output_path = ws.output_path
+    else:
+        # 提取配置文件参数项
+        output_path = default_output_path(config.get("Path", "template_path"), config.get("Path", "output_dir"))
+    # 本进程没有 uno：回退到子进程方式（进程池同样依赖 uno，此时不可用）
+    if uno is None:
+        update_docx_fields_subprocess(output_path)
+        return
+    # 有常驻实例池时借用实例刷新，否则使用缓存的独立 UNO 服务连接
+    pool = _soffice_pool.get_pool(config)
+    if pool is None:
+        update_docx_fields(output_path)
+    else:
+        update_docx_fields_pooled(pool, [output_path])
 if __name__ == "__main__":
     # 检查参数数量
-    if len(sys.argv) != 3:
-        print("❌ 参数错误：请提供输入模板路径和输出文件路径")
-        print("用法：python3 update_word_toc_uno.py TEMPLATE_PATH OUTPUT_PATH")
+    if len(sys.argv) == 2:
+        # 新用法：直接指定待刷新的报告文件路径
+        OUTPUT_PATH = sys.argv[1]
+    elif len(sys.argv) == 3:
+        # 旧用法：由模板路径与输出目录推导报告文件路径
+        OUTPUT_PATH = default_output_path(sys.argv[1], sys.argv[2])
+    else:
+        print("❌ 参数错误：请提供报告文件路径，或输入模板路径和输出目录")
+        print("用法：python3 update_dic_uno.py REPORT_PATH")
+        print("      python3 update_dic_uno.py TEMPLATE_PATH OUTPUT_DIR")
         sys.exit(1)
 
-    # 从命令行获取参数
-    TEMPLATE_PATH = sys.argv[1]
-    OUTPUT_DIR = sys.argv[2]
+    if uno is None:
+        print(f"❌ 当前解释器无法导入 uno 模块，请使用带 python3-uno 的解释器运行：{sys.executable}")
+        sys.exit(1)
 
     # 调用主函数
-    update_docx_fields(TEMPLATE_PATH, OUTPUT_DIR)
+    update_docx_fields(OUTPUT_PATH)
 
 
@@ -24,6 +24,10 @@ from typing import List, Any, Iterator, Optional, Iterable, Union, Tuple
 import configparser
 # 操作系统级功能（路径、环境变量、文件与目录检测等）
 import os
+# 正则表达式（生成报告输出文件名）
+import re
+# 高级文件操作（删除任务工作区目录树）
+import shutil
 # PyMuPDF - 用于PDF文档操作（打开、解析、提取文本/图像等）
 import fitz
 # 导入 PaddleOCR 库的 PPStructureV3 类，用于版面分析和结构化文档识别（表格、段落等）
@@ -980,6 +984,89 @@ def merge_documents_func(doc_list: list[Document]) -> Document:
     return final_doc
 # ========== End of 文件杂项 ==========
 
+# ========== 报告任务工作区 ==========
+# 每次报告生成使用独立的工作区（临时目录、PDF 目录、图片目录、输出文件），
+# 使服务进程中并发执行的多个报告任务互不覆盖中间文件。
+@dataclass
+class Workspace:
+    # 报告编号（为空表示命令行运行使用的默认工作区）
+    report_id: str
+    # 输入 Excel 数据文件路径
+    input_path: str
+    # 临时文件目录（存放调整后的 Excel 副本等）
+    temp_dir: str
+    # 生成 pdf 中间文件目录
+    pdfs_dir: str
+    # 生成 jpg 中间图片文件目录
+    images_dir: str
+    # 输出报告文件路径
+    output_path: str
+
+# 根据模板文件名生成输出报告路径（去掉文件名中的“模板(x.x)”，可附加报告编号）。
+def gen_report_output_path_func(template_path: str, output_dir: str, report_id: str = "") -> str:
+    """
+    参数：
+        template_path: str，模板文件路径，例如：template/实验性项目巡检报告模板(1.0).docx
+        output_dir: str，输出目录，例如：out/
+        report_id: str，报告编号，非空时附加在文件名末尾
+    返回：
+        str，例如：out/实验性项目巡检报告.docx 或 out/实验性项目巡检报告_REP-1A2B3C4D.docx
+    """
+    # 从模板路径取出模板文件名
+    basename = os.path.basename(template_path)
+    # 去掉文件名中的“模板”，构成输出文件名。
+    new_name = re.sub(r"模板\(.*?\)", "", basename).replace(".docx", "")
+    new_name = new_name.strip("-_ ")
+    # 附加报告编号，区分不同任务的输出文件
+    if report_id:
+        new_name = f"{new_name}_{report_id}"
+    # 构成输出文件全路径。
+    return os.path.join(output_dir, new_name + ".docx")
+
+# 创建报告任务工作区。
+def create_workspace_func(config: configparser.ConfigParser, report_id: str = "", input_path: str = "") -> Workspace:
+    """
+    参数：
+        config: 配置对象（读取 [Path] 节）
+        report_id: 报告编号。为空时返回配置文件中的默认路径（命令行运行）；
+                   非空时在临时文件目录下创建 <report_id>/ 子目录作为独立工作区。
+        input_path: 本报告的输入 Excel 数据文件（批量生成时每份报告各自指定），为空时使用配置文件中的 input_path
+    返回：
+        Workspace 工作区对象
+    """
+    input_path = input_path or config.get("Path", "input_path")
+    template_path = config.get("Path", "template_path")
+    output_dir = config.get("Path", "output_dir")
+    if report_id:
+        # 任务工作区：tmp/<report_id>/、tmp/<report_id>/pdfs/、tmp/<report_id>/images/
+        temp_dir = os.path.join(config.get("Path", "temp_file_dir"), report_id)
+        pdfs_dir = os.path.join(temp_dir, "pdfs")
+        images_dir = os.path.join(temp_dir, "images")
+    else:
+        # 默认工作区：沿用配置文件中的目录
+        temp_dir = config.get("Path", "temp_file_dir")
+        pdfs_dir = config.get("Path", "pdfs_dir")
+        images_dir = config.get("Path", "images_dir")
+    # 确保各目录存在
+    for d in (temp_dir, pdfs_dir, images_dir, output_dir):
+        os.makedirs(d, exist_ok=True)
+    return Workspace(
+        report_id=report_id,
+        input_path=input_path,
+        temp_dir=temp_dir,
+        pdfs_dir=pdfs_dir,
+        images_dir=images_dir,
+        output_path=gen_report_output_path_func(template_path, output_dir, report_id),
+    )
+
+# 删除任务工作区的中间文件目录（保留输出报告；默认工作区不删除）。
+def remove_workspace_func(ws: Workspace):
+    if not ws.report_id:
+        return
+    shutil.rmtree(ws.temp_dir, ignore_errors=True)
+    print(f"🗑️ 已删除任务工作区：{ws.temp_dir}")
+# ========== End of 报告任务工作区 ==========
+
 # ========= 判断输入文件类型 ==========
 # 判断指定文件是否是一个合法的 PDF 文件，并打印检查过程。
 def is_pdf_file_func(file_path: str) -> bool:
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+巡检统计性能基准（bench_statistic.py）
+------------------------------------------------------------
+功能：
+    1. 以 data/巡检报告数据集(1.0).xlsx 的“表1”为样本，生成 sheet 数不同的测试工作簿，
+       对比 Excel 读取方式的耗时：
+        逐 sheet 读取：get_excel_sheets + 每个 sheet 一次 load_table（文件解析 N+1 次）
+        一次性读取：load_tables（文件解析 1 次）
+    2. 对比检查结果判定的耗时（--classify 行数 ...）：
+        逐行实现：Series.apply + re.search + iterrows（原 analyze_12345 实现）
+        向量化实现：result_rules.ResultRules.classify + join_abnormal_detail
+       并校验两者的异常/正常掩码与异常详细完全一致。
+    3. 对比逐 sheet 顺序统计与线程池/进程池并行统计的耗时（--parallel 行数 ...）：
+        以样本工作簿的全部 sheet 为模板，每个 sheet 循环填充到指定行数生成大工作簿，
+        Excel 预先一次性读取，只计统计耗时，并校验 {{汇总结果}} 文本完全一致。
+运行方式（不属于 pytest 用例）：
+    cd test && python bench_statistic.py [sheet 数 ...] [--rows 每个 sheet 的行数]
+    cd test && python bench_statistic.py --classify 10000 50000 100000
+    cd test && python bench_statistic.py --parallel 20000 100000 [--workers 4]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+import io
+import re
+import random
+import pandas as pd
+
+# 修正项目模块搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "modules"))
+
+import statistic  # noqa: E402
+import result_rules  # noqa: E402
+
+SAMPLE_PATH = os.path.join(PROJECT_ROOT, "data", "巡检报告数据集(1.0).xlsx")
+
+
+def build_workbook(path: str, sheets: int, rows: int) -> None:
+    """以样本“表1”的行循环填充，生成 sheets 个 sheet、每个 rows 行的测试工作簿。"""
+    sample = pd.read_excel(SAMPLE_PATH, sheet_name="表1").dropna(how="all")
+    df = pd.concat([sample] * (rows // len(sample) + 1), ignore_index=True).head(rows)
+    with pd.ExcelWriter(path) as writer:
+        for i in range(1, sheets + 1):
+            df.to_excel(writer, sheet_name=f"表{i}", index=False)
+
+
+def timed(func, repeat: int) -> float:
+    """重复执行 repeat 次，返回最短耗时（秒）；屏蔽被测函数的打印输出。"""
+    best = float("inf")
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+    return best
+
+
+def read_per_sheet(path: str) -> None:
+    """逐 sheet 读取（原方式）。"""
+    for name in statistic.get_excel_sheets(path):
+        statistic.load_table(path, name)
+
+
+def classify_rowwise(df: pd.DataFrame, c_item: str, c_result: str):
+    """原 analyze_12345 的逐行判定与异常详细生成（对照实现）。"""
+    s = df[c_result].astype(str).fillna("").str.replace(r"\s+", "", regex=True)
+    abnormal_mask = s.apply(
+        lambda x: (
+            (not re.search(r"(?<!不)正常", x)) and
+            any(k in x for k in ["不正常", "异常", "错误", "失败", "需检查", "告警"]) and
+            not any(p in x for p in ["无告警"])
+        )
+    )
+    normal_mask = s.apply(lambda x: re.search(r"(?<!不)正常", x) is not None) & ~abnormal_mask
+    records = []
+    for idx, (_, row) in enumerate(df[abnormal_mask].iterrows(), start=1):
+        records.append(f"{idx}. {str(row.get(c_item, '')).strip()}（{str(row.get(c_result, '')).strip()}）")
+    return abnormal_mask, normal_mask, "；".join(records)
+
+
+def classify_vectorized(df: pd.DataFrame, c_item: str, c_result: str):
+    """向量化判定与异常详细生成。"""
+    abnormal_mask, normal_mask = result_rules.DEFAULT_RULES.classify(df[c_result])
+    return abnormal_mask, normal_mask, result_rules.join_abnormal_detail(df[abnormal_mask], c_item, c_result)
+
+
+def build_results(rows: int) -> pd.DataFrame:
+    """生成含各类检查结果写法的测试数据（固定随机种子）。"""
+    samples = ["正常", "不正常", "运行正常", "异常", "有告警", "无告警", "需检查 电源", "失败",
+               "错误\n重启", "  正 常 ", "良好", "", None, "告警已消除，正常"]
+    rng = random.Random(0)
+    return pd.DataFrame({
+        "设备序列号": [f"SN{i:08d}" for i in range(rows)],
+        "检查结果": [rng.choice(samples) for _ in range(rows)],
+    })
+
+
+def build_large_tables(rows: int) -> dict:
+    """样本工作簿的每个 sheet 循环填充到 rows 行（保持 sheet 顺序与表头）。"""
+    tables = statistic.load_tables(SAMPLE_PATH)
+    return {
+        name: pd.concat([df] * (rows // max(len(df), 1) + 1), ignore_index=True).head(rows)
+        for name, df in tables.items()
+    }
+
+
+def bench_parallel(rows_list, workers: int, repeat: int) -> None:
+    print(f"并行 worker 数：{workers}")
+    print(f"{'行数':>8} | {'顺序统计(s)':>11} | {'线程池(s)':>9} | {'进程池(s)':>9} | 结果一致")
+    for rows in rows_list:
+        with contextlib.redirect_stdout(io.StringIO()):
+            tables = build_large_tables(rows)
+        names = list(tables)
+
+        def scan(n, executor):
+            return statistic.scan_excel_sheets(SAMPLE_PATH, names, tables, n, executor)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            expected = scan(1, "thread")
+            same = expected == scan(workers, "thread") == scan(workers, "process")
+        seq = timed(lambda: scan(1, "thread"), repeat)
+        thread = timed(lambda: scan(workers, "thread"), repeat)
+        process = timed(lambda: scan(workers, "process"), repeat)
+        print(f"{rows:>8} | {seq:>11.3f} | {thread:>9.3f} | {process:>9.3f} | {'是' if same else '否'}")
+
+
+def bench_classify(rows_list, repeat: int) -> None:
+    print(f"{'行数':>8} | {'逐行实现(s)':>11} | {'向量化实现(s)':>13} | {'加速比':>6} | 结果一致")
+    for rows in rows_list:
+        df = build_results(rows)
+        expected = classify_rowwise(df, "设备序列号", "检查结果")
+        actual = classify_vectorized(df, "设备序列号", "检查结果")
+        same = (expected[0].equals(actual[0]) and expected[1].equals(actual[1]) and expected[2] == actual[2])
+        old = timed(lambda: classify_rowwise(df, "设备序列号", "检查结果"), repeat)
+        new = timed(lambda: classify_vectorized(df, "设备序列号", "检查结果"), repeat)
+        print(f"{rows:>8} | {old:>11.3f} | {new:>13.3f} | {old / new:>5.1f}x | {'是' if same else '否'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="巡检统计性能基准")
+    parser.add_argument("sheets", nargs="*", type=int, default=[1, 5, 10, 20, 40])
+    parser.add_argument("--rows", type=int, default=200, help="每个 sheet 的行数")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数（取最短耗时）")
+    parser.add_argument("--classify", nargs="+", type=int, metavar="ROWS",
+                        help="改为测试检查结果判定，参数为数据行数")
+    parser.add_argument("--parallel", nargs="+", type=int, metavar="ROWS",
+                        help="改为测试并行统计，参数为每个 sheet 的行数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="并行统计的 worker 数")
+    args = parser.parse_args()
+
+    if args.parallel:
+        bench_parallel(args.parallel, args.workers, args.repeat)
+        return
+    if args.classify:
+        bench_classify(args.classify, args.repeat)
+        return
+
+    print(f"Excel 引擎：{statistic.EXCEL_ENGINE or 'pandas 默认'}，每个 sheet {args.rows} 行")
+    print(f"{'sheet 数':>8} | {'逐 sheet 读取(s)':>16} | {'一次性读取(s)':>14} | {'加速比':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for sheets in args.sheets:
+            path = os.path.join(tmp, f"bench_{sheets}.xlsx")
+            build_workbook(path, sheets, args.rows)
+            old = timed(lambda: read_per_sheet(path), args.repeat)
+            new = timed(lambda: statistic.load_tables(path), args.repeat)
+            print(f"{sheets:>8} | {old:>16.3f} | {new:>14.3f} | {old / new:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量生成单元测试（test_batch.py）
+------------------------------------------------------------
+以替身 generate_report 代替报告生成（无需 LibreOffice），覆盖命令行批量生成（结果顺序、失败记录、结果清单文件），
+以及服务的批量提交与批次结果清单接口。
+"""
+import os
+import sys
+import json
+import time
+import configparser
+
+import pytest
+
+# 修正项目模块搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+# 服务模块与 uvicorn 启动时相同，按模块名 server_detection 导入
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "modules"))
+
+from modules import detection_report_gen  # noqa: E402
+from modules.job_queue import JobQueue, STATE_FAILED, STATE_SUCCEEDED  # noqa: E402
+
+
+def wait_until(predicate, timeout: float = 5.0) -> bool:
+    """轮询等待 predicate() 为真，超时返回 False。"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def fake_generate_report(config, on_stage=None, ws=None, info=None, trace=None) -> str:
+    """替身报告生成：机房名为“故障机房”时失败，否则写出报告文件并返回路径。"""
+    if info.get("room_name") == "故障机房":
+        raise RuntimeError("模板渲染失败")
+    with open(ws.output_path, "w", encoding="utf-8") as f:
+        f.write(f"{info['room_name']}:{os.path.basename(ws.input_path)}")
+    return ws.output_path
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = configparser.ConfigParser()
+    config.read_dict({
+        "Path": {
+            "input_path": str(tmp_path / "默认数据.xlsx"),
+            "template_path": str(tmp_path / "巡检报告模板(1.0).docx"),
+            "output_dir": str(tmp_path / "out"),
+            "temp_file_dir": str(tmp_path / "tmp"),
+        },
+        "ServerConf": {"workers": "2", "dedupe": "false"},
+    })
+    return config
+
+
+def make_entries(tmp_path) -> list:
+    entries = []
+    for room in ("一号机房", "故障机房", "三号机房"):
+        path = tmp_path / f"{room}.xlsx"
+        path.write_bytes(b"excel")
+        entries.append({"project_name": "项目", "room_name": room, "year": 2025, "quarter": "Q1",
+                        "report_date": "2025-03-31", "report_person": "张三", "input_path": str(path)})
+    entries.append(dict(entries[0], room_name="缺失机房", input_path=str(tmp_path / "缺失.xlsx")))
+    return entries
+
+
+def test_generate_batch_keeps_order_and_records_failures(config, tmp_path, monkeypatch):
+    monkeypatch.setattr(detection_report_gen, "generate_report", fake_generate_report)
+    results = detection_report_gen.generate_batch(config, make_entries(tmp_path), workers=2)
+    assert [r["room_name"] for r in results] == ["一号机房", "故障机房", "三号机房", "缺失机房"]
+    assert [r["state"] for r in results] == ["succeeded", "failed", "succeeded", "failed"]
+    assert results[1]["error"] == "模板渲染失败" and "输入文件不存在" in results[3]["error"]
+    # 每份报告独立工作区与输出文件，结束后删除工作区
+    assert len({r["report_id"] for r in results}) == 4
+    with open(results[2]["output_path"], encoding="utf-8") as f:
+        assert f.read() == "三号机房:三号机房.xlsx"
+    assert os.listdir(tmp_path / "tmp") == []
+
+
+def test_run_batch_manifest_writes_result_file(config, tmp_path, monkeypatch):
+    monkeypatch.setattr(detection_report_gen, "generate_report", fake_generate_report)
+    manifest = tmp_path / "2025Q1.json"
+    manifest.write_text(json.dumps({"reports": make_entries(tmp_path)[:3]}, ensure_ascii=False), encoding="utf-8")
+    result_path = detection_report_gen.run_batch_manifest(config, str(manifest))
+    assert result_path == str(tmp_path / "2025Q1.result.json")
+    with open(result_path, encoding="utf-8") as f:
+        result = json.load(f)
+    assert (result["total"], result["succeeded"]) == (3, 2)
+    assert [r["state"] for r in result["reports"]] == ["succeeded", "failed", "succeeded"]
+    assert all(r["elapsed_seconds"] >= 0 for r in result["reports"])
+
+
+def test_batch_endpoints_return_batch_results(config, tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import server_detection as server
+
+    queue = JobQueue(server.run_report_job, max_workers=1)
+    monkeypatch.setattr(server, "CONFIG", config)
+    monkeypatch.setattr(server, "JOB_QUEUE", queue)
+    monkeypatch.setattr(server, "generate_report", fake_generate_report)
+    client = TestClient(server.app)
+
+    assert client.post("/api/report/batch", json={"reports": []}).json()["code"] == 400
+    missing = client.post("/api/report/batch", json={"reports": make_entries(tmp_path)}).json()
+    assert missing["code"] == 400 and "缺失.xlsx" in missing["message"]
+
+    submitted = client.post("/api/report/batch", json={"reports": make_entries(tmp_path)[:3]}).json()
+    assert submitted["code"] == 200
+    batch_id = submitted["data"]["batch_id"]
+    report_ids = [item["report_id"] for item in submitted["data"]["reports"]]
+    assert wait_until(lambda: client.get(f"/api/report/batch/{batch_id}").json()["data"]["finished"])
+
+    data = client.get(f"/api/report/batch/{batch_id}").json()["data"]
+    assert (data["total"], data["succeeded"]) == (3, 2)
+    assert [item["report_id"] for item in data["reports"]] == report_ids
+    assert [item["state"] for item in data["reports"]] == [STATE_SUCCEEDED, STATE_FAILED, STATE_SUCCEEDED]
+    assert data["reports"][1]["error"] == "模板渲染失败"
+    assert data["reports"][0]["room_name"] == "一号机房" and os.path.exists(data["reports"][0]["output_path"])
+    assert client.get("/api/report/batch/BAT-MISSING").json()["code"] == 404
+    queue.shutdown(wait=True)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Excel 转图片增量渲染单元测试（test_excel_to_images.py）
+------------------------------------------------------------
+以替身 PDF 转换与栅格化函数代替 LibreOffice 与 poppler，覆盖增量模式下只导出未命中缓存的 sheet、
+缓存图片与新渲染图片按 sheet 顺序合并，以及预处理出错、PDF 页数不一致时回退到全量渲染。
+"""
+import os
+import sys
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+# 修正项目模块搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from modules import excel_to_images  # noqa: E402
+from modules import util  # noqa: E402
+from modules.render_cache import RenderCache  # noqa: E402
+
+SHEETS = ["表1", "表2", "表3"]
+
+
+def write_input(path, changed: str = "") -> None:
+    wb = Workbook()
+    wb.remove(wb.active)
+    for name in SHEETS:
+        ws = wb.create_sheet(name)
+        ws.append(["检查项", "结果"])
+        ws.append([name, "不正常" if name == changed else "正常"])
+    wb.save(path)
+
+
+class FakeRenderer:
+    """替身 soffice/poppler：PDF 页数取调整后副本中的 sheet 数，栅格化时按页写出文本“图片”。"""
+
+    def __init__(self, monkeypatch, page_delta: int = 0):
+        self.exported = []
+        self.rendered = []
+        self.page_delta = page_delta
+        monkeypatch.setattr(excel_to_images, "excel_to_libreoffice_pdf", self.to_pdf)
+        monkeypatch.setattr(excel_to_images, "pdfinfo_from_path", self.pdfinfo)
+        monkeypatch.setattr(excel_to_images, "pdf_to_jpgs", self.to_images)
+
+    def to_pdf(self, ws, pool=None, adjusted_excel_path=""):
+        wb = load_workbook(adjusted_excel_path)
+        self.exported = [sheet.title for sheet in wb.worksheets if sheet.sheet_state == "visible"]
+        return adjusted_excel_path
+
+    def pdfinfo(self, pdf_path):
+        return {"Pages": len(self.exported) + self.page_delta}
+
+    def to_images(self, pdf_path, sheet_names, images_dir, workers=1, window=1, scratch_dir="",
+                  pages=None, image_format="jpg"):
+        # 与 pdf_to_jpgs 相同：第 n 页对应 sheet_names[n - 1]
+        pages = pages or range(1, len(sheet_names) + 1)
+        mapping = {}
+        for page_no in pages:
+            name = sheet_names[page_no - 1]
+            path = os.path.join(images_dir, f"{name}.jpg")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(self.exported[page_no - 1])
+            mapping[name] = path
+        self.rendered.append((list(sheet_names), list(pages)))
+        return mapping
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_to_images, "INCREMENTAL", True)
+    monkeypatch.setattr(excel_to_images, "IMAGE_FORMAT", "jpg")
+    monkeypatch.setattr(excel_to_images, "PAGE_SIZE", 9)
+    monkeypatch.setattr(excel_to_images, "ORIENTATION", "portrait")
+    monkeypatch.setattr(excel_to_images, "DPI", 100)
+    input_path = tmp_path / "数据.xlsx"
+    write_input(input_path)
+    return util.Workspace(
+        report_id="", input_path=str(input_path), temp_dir=str(tmp_path / "tmp"),
+        pdfs_dir=str(tmp_path / "pdfs"), images_dir=str(tmp_path / "images"),
+        output_path=str(tmp_path / "out.docx"),
+    )
+
+
+def read_images(mapping):
+    return {name: open(path, encoding="utf-8").read() for name, path in mapping.items()}
+
+
+def test_incremental_exports_only_changed_sheets_and_merges_cached(workspace, tmp_path, monkeypatch):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    renderer = FakeRenderer(monkeypatch)
+    first = excel_to_images.excel_to_jpgs(workspace, cache=cache)
+    assert renderer.exported == SHEETS and list(first) == SHEETS
+
+    # 只修改表2：副本中只保留表2，其余 sheet 从缓存恢复，结果仍按 sheet 顺序排列
+    write_input(workspace.input_path, changed="表2")
+    renderer.rendered.clear()
+    second = excel_to_images.excel_to_jpgs(workspace, cache=cache)
+    assert renderer.exported == ["表2"]
+    assert renderer.rendered == [(["表2"], [1])]
+    assert list(second) == SHEETS
+    assert read_images(second) == {"表1": "表1", "表2": "表2", "表3": "表3"}
+
+
+def test_incremental_falls_back_to_full_render_when_trim_fails(workspace, tmp_path, monkeypatch):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    renderer = FakeRenderer(monkeypatch)
+
+    def broken_trim(wb, keep):
+        raise RuntimeError("裁剪失败")
+
+    monkeypatch.setattr(excel_to_images, "trim_workbook", broken_trim)
+    mapping = excel_to_images.excel_to_jpgs(workspace, cache=cache)
+    # 回退到全量预处理：PDF 含全部 sheet，逐页对应 sheet 名
+    assert renderer.exported == SHEETS
+    assert renderer.rendered == [(SHEETS, [1, 2, 3])]
+    assert read_images(mapping) == {name: name for name in SHEETS}
+
+
+def test_incremental_page_count_mismatch_does_not_cache_wrong_images(workspace, tmp_path, monkeypatch):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    renderer = FakeRenderer(monkeypatch)
+    excel_to_images.excel_to_jpgs(workspace, cache=cache)
+
+    # 增量 PDF 多出一页：不按页序映射，改为全量渲染
+    write_input(workspace.input_path, changed="表3")
+    renderer.page_delta = 1
+    renderer.rendered.clear()
+    mapping = excel_to_images.excel_to_jpgs(workspace, cache=cache)
+    assert renderer.rendered == [(SHEETS, [3])]
+    assert read_images(mapping) == {name: name for name in SHEETS}
+
+    # 缓存中的表3图片来自全量渲染的第 3 页
+    renderer.page_delta = 0
+    renderer.rendered.clear()
+    mapping = excel_to_images.excel_to_jpgs(workspace, cache=cache)
+    assert renderer.rendered == []
+    assert read_images(mapping) == {name: name for name in SHEETS}
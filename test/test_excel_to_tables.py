@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Excel → Word 原生表格单元测试（test_excel_to_tables.py）
+------------------------------------------------------------
+以临时生成的小工作簿覆盖合并单元格（含左上角被隐藏）、隐藏行列、数字格式、单元格样式，
+以及用原生表格替换报告中的占位符段落。
+"""
+import os
+import sys
+import datetime
+
+from docx import Document
+from openpyxl import Workbook
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+# 修正项目模块搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from modules.excel_to_tables import build_table, format_cell_value, replace_placeholders_with_tables  # noqa: E402
+
+
+def table_text(table):
+    """表格文本（按 w:tc 读取，合并区域只出现一次）。"""
+    return [[cell.text for cell in row.cells] for row in table.rows]
+
+
+def make_sheet():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "表1"
+    ws.append(["设备巡检", None, None])
+    ws.append(["检查项", "结果", "备注"])
+    ws.append(["温度", "正常", "隐藏列"])
+    ws.append(["隐藏行", "不正常", ""])
+    ws.append(["风扇", "正常", ""])
+    ws.merge_cells("A1:B1")
+    ws.row_dimensions[4].hidden = True
+    ws.column_dimensions["C"].hidden = True
+    return wb, ws
+
+
+def test_build_table_skips_hidden_rows_and_columns_and_merges_cells():
+    wb, ws = make_sheet()
+    doc = Document()
+    table = build_table(doc, ws)
+    assert (len(table.rows), len(table.columns)) == (4, 2)
+    texts = table_text(table)
+    # 合并区域 A1:B1：两列都指向同一个单元格
+    assert texts[0] == ["设备巡检", "设备巡检"]
+    assert table.cell(0, 0)._tc is table.cell(0, 1)._tc
+    assert texts[1:] == [["检查项", "结果"], ["温度", "正常"], ["风扇", "正常"]]
+
+
+def test_merged_text_comes_from_hidden_top_left_cell():
+    wb = Workbook()
+    ws = wb.active
+    ws["A1"] = "跨行标题"
+    ws["B1"] = "说明"
+    ws["B2"] = "第二行"
+    ws.merge_cells("A1:A2")
+    ws.row_dimensions[1].hidden = True
+    table = build_table(Document(), ws)
+    # 左上角所在行被隐藏：文本写入区域内第一个可见单元格
+    assert table_text(table) == [["跨行标题", "第二行"]]
+
+
+def test_cell_styles_are_converted():
+    wb = Workbook()
+    ws = wb.active
+    ws["A1"] = "异常"
+    ws["A1"].font = Font(name="宋体", sz=12, b=True, color="FFFF0000")
+    ws["A1"].fill = PatternFill(fill_type="solid", fgColor="FFFFFF00")
+    ws["A1"].border = Border(top=Side(style="thin"), bottom=Side(style="medium", color="FF0000FF"))
+    ws["A1"].alignment = Alignment(horizontal="center", vertical="center")
+    table = build_table(Document(), ws, font_size=9)
+    cell = table.cell(0, 0)
+    run = cell.paragraphs[0].runs[0]
+    assert run.font.name == "宋体" and run.font.bold and run.font.size.pt == 9
+    assert str(run.font.color.rgb) == "FF0000"
+    xml = cell._tc.xml
+    assert 'w:fill="FFFF00"' in xml
+    assert 'w:val="single" w:sz="4"' in xml and 'w:sz="12" w:space="0" w:color="0000FF"' in xml
+
+
+def test_format_cell_value_number_formats():
+    wb = Workbook()
+    ws = wb.active
+    cases = [
+        (3.0, "General", "3"),
+        (0.1 + 0.2, "General", "0.3"),
+        (0.256, "0.0%", "25.6%"),
+        (1234567.891, "#,##0.00", "1,234,567.89"),
+        (2.4, "0", "2"),
+        (True, "General", "TRUE"),
+        (datetime.datetime(2025, 3, 31), "yyyy-mm-dd", "2025-03-31"),
+        (datetime.datetime(2025, 3, 31, 8, 30), "yyyy-mm-dd hh:mm", "2025-03-31 08:30"),
+    ]
+    for row, (value, fmt, _) in enumerate(cases, start=1):
+        ws.cell(row=row, column=1, value=value).number_format = fmt
+    assert [format_cell_value(ws.cell(row=row, column=1)) for row in range(1, len(cases) + 1)] == \
+        [expected for _, _, expected in cases]
+
+
+def test_replace_placeholders_with_tables(tmp_path):
+    wb, _ = make_sheet()
+    excel_path = tmp_path / "数据.xlsx"
+    wb.save(excel_path)
+    doc = Document()
+    doc.add_paragraph("一、巡检结果")
+    doc.add_paragraph("{{ 表1 }}")
+    doc.add_paragraph("{{ 表9 }}")
+    doc.add_paragraph("正文中的 {{表1}} 不替换")
+    replaced = replace_placeholders_with_tables(doc, str(excel_path))
+    assert replaced == {"表1": 4}
+    # 占位符段落被表格取代，表格位于原段落位置
+    body = [child.tag.split("}")[1] for child in doc.element.body.iterchildren()]
+    assert body[:4] == ["p", "tbl", "p", "p"]
+    assert [p.text for p in doc.paragraphs] == ["一、巡检结果", "{{ 表9 }}", "正文中的 {{表1}} 不替换"]
+    assert table_text(doc.tables[0])[2] == ["温度", "正常"]
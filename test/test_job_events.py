@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务事件流单元测试（test_job_events.py）
+------------------------------------------------------------
+以替身 generate_report 代替报告生成（无需 LibreOffice），覆盖 /api/report/{id}/events 的事件顺序
+（状态、阶段、生成过程进度事件）、无新事件时的心跳、以任务结束事件收尾，以及按 Last-Event-ID 断线续传。
+"""
+import os
+import sys
+import json
+import time
+import configparser
+
+import pytest
+
+# 修正项目模块搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+# 服务模块与 uvicorn 启动时相同，按模块名 server_detection 导入
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "modules"))
+
+from modules import progress  # noqa: E402
+from modules.job_queue import JobQueue, STAGE_END, STAGE_START  # noqa: E402
+
+
+def parse_sse(text: str) -> list:
+    """SSE 文本 → [(事件类型, 数据), ...]；心跳注释行记为 ("heartbeat", 注释文本)。"""
+    frames = []
+    for block in text.split("\n\n"):
+        if not block:
+            continue
+        if block.startswith(":"):
+            frames.append(("heartbeat", block[1:].strip()))
+            continue
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        frames.append((fields["event"], {"id": int(fields["id"]), **json.loads(fields["data"])}))
+    return frames
+
+
+def make_generate_report(fail: bool = False):
+    """替身报告生成：依次发出阶段与进度事件，中间停顿若干心跳周期。"""
+    def generate_report(config, on_stage=None, ws=None, info=None, trace=None) -> str:
+        on_stage("add_statistic_result", STAGE_START)
+        progress.emit("sheet_analyzed", sheet="表1", done=1, total=1)
+        time.sleep(0.3)
+        if fail:
+            raise RuntimeError("统计失败")
+        on_stage("add_statistic_result", STAGE_END)
+        return ws.output_path
+    return generate_report
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    import server_detection as server
+
+    config = configparser.ConfigParser()
+    config.read_dict({
+        "Path": {
+            "input_path": str(tmp_path / "数据.xlsx"),
+            "template_path": str(tmp_path / "模板.docx"),
+            "output_dir": str(tmp_path / "out"),
+            "temp_file_dir": str(tmp_path / "tmp"),
+        },
+        "ServerConf": {"dedupe": "false", "events_heartbeat": "0.05"},
+    })
+    queue = JobQueue(server.run_report_job, max_workers=1)
+    monkeypatch.setattr(server, "CONFIG", config)
+    monkeypatch.setattr(server, "JOB_QUEUE", queue)
+    yield server
+    queue.shutdown(wait=True)
+
+
+def submit(client) -> str:
+    info = {"project_name": "项目", "room_name": "机房", "year": 2025, "quarter": "Q1",
+            "report_date": "2025-03-31", "report_person": "张三"}
+    return client.post("/api/report/basic-info", json=info).json()["data"]["report_id"]
+
+
+def test_events_stream_in_order_with_heartbeat_and_terminal_state(server, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(server, "generate_report", make_generate_report())
+    client = TestClient(server.app)
+    report_id = submit(client)
+    response = client.get(f"/api/report/{report_id}/events")
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = parse_sse(response.text)
+
+    events = [(kind, data.get("state") or data.get("stage") or data.get("sheet"))
+              for kind, data in frames if kind != "heartbeat"]
+    assert events == [
+        ("state", "queued"), ("state", "running"),
+        ("stage", "add_statistic_result"), ("sheet_analyzed", "表1"), ("stage", "add_statistic_result"),
+        ("state", "succeeded"),
+    ]
+    # 事件序号递增；停顿期间发送心跳（含当前状态与阶段），以任务结束事件收尾
+    ids = [data["id"] for kind, data in frames if kind != "heartbeat"]
+    assert ids == sorted(ids)
+    kinds = [kind for kind, _ in frames]
+    first_heartbeat = kinds.index("heartbeat")
+    assert kinds.index("sheet_analyzed") < first_heartbeat < len(kinds) - 1
+    assert frames[first_heartbeat][1] == "heartbeat running add_statistic_result"
+    assert frames[-1][0] == "state" and frames[-1][1]["state"] == "succeeded"
+
+
+def test_events_resume_after_last_event_id_and_end_on_failure(server, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(server, "generate_report", make_generate_report(fail=True))
+    client = TestClient(server.app)
+    report_id = submit(client)
+    frames = [(kind, data) for kind, data in parse_sse(client.get(f"/api/report/{report_id}/events").text)
+              if kind != "heartbeat"]
+    assert frames[-1][1]["state"] == "failed" and frames[-1][1]["error"] == "统计失败"
+
+    # 断线重连：只推送 Last-Event-ID 之后的事件
+    last_seen = frames[2][1]["id"]
+    resumed = parse_sse(client.get(f"/api/report/{report_id}/events",
+                                   headers={"Last-Event-ID": str(last_seen)}).text)
+    assert [data["id"] for _, data in resumed] == [data["id"] for _, data in frames[3:]]
+    # 已越过结束事件：立即关闭，不再发送心跳
+    assert client.get(f"/api/report/{report_id}/events", params={"after": frames[-1][1]["id"]}).text == ""
+    assert client.get("/api/report/REP-MISSING/events").json()["code"] == 404
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任务队列单元测试（test_job_queue.py）
+------------------------------------------------------------
+以替身 runner 代替报告生成（无需 LibreOffice），覆盖任务执行与状态、阶段计时、队列关闭，
+调度通道与准入控制（含服务接口的 429 + Retry-After 响应），相同请求去重（有效期与通道提升）。
+"""
+import os
+import sys
+import time
+import threading
+import configparser
+
+import pytest
+
+# 修正项目模块搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+# 服务模块与 uvicorn 启动时相同，按模块名 server_detection 导入
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "modules"))
+
+from modules.job_queue import (  # noqa: E402
+    JobQueue, QueueFullError, LANE_BATCH, LANE_INTERACTIVE, STATE_FAILED, STATE_QUEUED, STATE_RUNNING,
+    STATE_SUCCEEDED, STAGE_END, STAGE_FAILED, STAGE_START,
+)
+
+
+def wait_until(predicate, timeout: float = 5.0) -> bool:
+    """轮询等待 predicate() 为真，超时返回 False。"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class GatedRunner:
+    """替身 runner：记录执行顺序；gate 打开前阻塞，用于让任务停留在运行中。"""
+
+    def __init__(self, blocked: bool = False):
+        self.order = []
+        self.gate = threading.Event()
+        if not blocked:
+            self.gate.set()
+
+    def __call__(self, job):
+        self.order.append(job.report_id)
+        self.gate.wait(5)
+        if job.info.get("fail"):
+            raise RuntimeError("生成失败")
+        return f"/tmp/{job.report_id}.docx"
+
+
+def test_submit_runs_job_and_records_result():
+    queue = JobQueue(GatedRunner(), max_workers=1)
+    ok = queue.submit("r1", {})
+    bad = queue.submit("r2", {"fail": True})
+    assert wait_until(lambda: ok.finished and bad.finished)
+    assert ok.state == STATE_SUCCEEDED and ok.output_path == "/tmp/r1.docx"
+    assert bad.state == STATE_FAILED and bad.error == "生成失败"
+    assert queue.get("r1") is ok and queue.get("missing") is None
+    # 状态接口字段与事件顺序
+    status = ok.to_dict()
+    assert status["state"] == STATE_SUCCEEDED and status["timings"]["elapsed_seconds"] >= 0
+    assert [e["data"]["state"] for e in ok.events if e["event"] == "state"] == \
+        [STATE_QUEUED, STATE_RUNNING, STATE_SUCCEEDED]
+    queue.shutdown(wait=True)
+
+
+def test_concurrent_stages_are_timed_separately():
+    queue = JobQueue(GatedRunner(), max_workers=1)
+    job = queue.submit("r1", {})
+    assert wait_until(lambda: job.finished)
+    # 两个阶段交叠执行：各自计时，互不覆盖
+    queue.mark_stage(job, "stat", STAGE_START)
+    queue.mark_stage(job, "render", STAGE_START)
+    time.sleep(0.05)
+    queue.mark_stage(job, "stat", STAGE_END)
+    assert job.stage == "render" and job.to_dict()["running_stages"] == ["render"]
+    time.sleep(0.05)
+    queue.mark_stage(job, "render", STAGE_FAILED)
+    assert job.stage == "render"
+    assert job.stage_timings["stat"] >= 0.05 and job.stage_timings["render"] >= 0.1
+    stage_events = [e["data"] for e in job.events if e["event"] == "stage"]
+    assert [(d["stage"], d["event"]) for d in stage_events] == [
+        ("stat", STAGE_START), ("render", STAGE_START), ("stat", STAGE_END), ("render", STAGE_FAILED)]
+    queue.shutdown(wait=True)
+
+
+def test_shutdown_fails_pending_jobs_and_rejects_submit():
+    runner = GatedRunner(blocked=True)
+    queue = JobQueue(runner, max_workers=1)
+    running = queue.submit("r1", {})
+    pending = queue.submit("r2", {})
+    assert wait_until(lambda: running.state == STATE_RUNNING)
+    queue.shutdown()
+    assert pending.state == STATE_FAILED and pending.error
+    runner.gate.set()
+    assert wait_until(lambda: running.finished)
+    assert running.state == STATE_SUCCEEDED
+    with pytest.raises(RuntimeError):
+        queue.submit("r3", {})
+
+
+def test_interactive_lane_runs_before_batch():
+    runner = GatedRunner(blocked=True)
+    queue = JobQueue(runner, max_workers=1)
+    first = queue.submit("b0", {}, lane=LANE_BATCH)
+    assert wait_until(lambda: first.state == STATE_RUNNING)
+    queue.submit_many([("b1", {}, ""), ("b2", {}, "")], lane=LANE_BATCH)
+    queue.submit("i1", {}, lane=LANE_INTERACTIVE)
+    assert queue.queue_depth() == {LANE_INTERACTIVE: 1, LANE_BATCH: 2}
+    runner.gate.set()
+    assert wait_until(lambda: len(runner.order) == 4)
+    assert runner.order == ["b0", "i1", "b1", "b2"]
+    queue.shutdown(wait=True)
+
+
+def test_per_client_running_limit_lets_other_clients_go_first():
+    runner = GatedRunner(blocked=True)
+    queue = JobQueue(runner, max_workers=2, per_client_running=1)
+    queue.submit("a1", {}, client="a")
+    queue.submit("a2", {}, client="a")
+    queue.submit("b1", {}, client="b")
+    # 客户端 a 只能同时执行一个任务，第二个工作线程执行客户端 b 的任务
+    assert wait_until(lambda: sorted(runner.order) == ["a1", "b1"])
+    assert queue.get("a2").state == STATE_QUEUED and queue.running_count() == 2
+    runner.gate.set()
+    assert wait_until(lambda: queue.get("a2").finished)
+    queue.shutdown(wait=True)
+
+
+def test_admission_rejects_full_lane_with_retry_after():
+    runner = GatedRunner(blocked=True)
+    queue = JobQueue(runner, max_workers=1, max_queued={LANE_INTERACTIVE: 1, LANE_BATCH: 2}, retry_after=12)
+    running = queue.submit("r1", {})
+    assert wait_until(lambda: running.state == STATE_RUNNING)
+    queue.submit("r2", {})
+    with pytest.raises(QueueFullError) as info:
+        queue.submit("r3", {})
+    assert info.value.retry_after == 12
+    # 批量通道还需等待交互通道的排队任务
+    queue.submit_many([("b1", {}, ""), ("b2", {}, "")], lane=LANE_BATCH)
+    with pytest.raises(QueueFullError) as info:
+        queue.submit("b3", {}, lane=LANE_BATCH)
+    assert info.value.retry_after == 24
+    # 整体准入：超过上限的批量提交全部不入队
+    with pytest.raises(ValueError):
+        queue.submit_many([(f"x{i}", {}, "") for i in range(3)], lane=LANE_BATCH)
+    assert queue.get("r3") is None and queue.get("x0") is None
+    runner.gate.set()
+    queue.shutdown(wait=True)
+
+
+def test_per_client_queued_limit_only_counts_that_client():
+    runner = GatedRunner(blocked=True)
+    queue = JobQueue(runner, max_workers=1, per_client_queued=2)
+    queue.submit("a1", {}, client="a")
+    queue.submit("a2", {}, client="a")
+    with pytest.raises(QueueFullError):
+        queue.submit("a3", {}, client="a")
+    queue.submit("b1", {}, client="b")
+    # 批量通道不受单客户端交互任务上限限制
+    queue.submit("a4", {}, lane=LANE_BATCH, client="a")
+    runner.gate.set()
+    queue.shutdown(wait=True)
+
+
+def test_basic_info_endpoint_returns_429_with_retry_after(monkeypatch):
+    from fastapi.testclient import TestClient
+    import server_detection as server
+
+    config = configparser.ConfigParser()
+    config.read_dict({"ServerConf": {"dedupe": "false"}})
+    runner = GatedRunner(blocked=True)
+    # 服务模块与本测试导入同一个 modules.job_queue，抛出的 QueueFullError 即接口捕获的类
+    assert server.QueueFullError is QueueFullError
+    queue = JobQueue(runner, max_workers=1, max_queued={LANE_INTERACTIVE: 1}, retry_after=7)
+    monkeypatch.setattr(server, "CONFIG", config)
+    monkeypatch.setattr(server, "JOB_QUEUE", queue)
+    client = TestClient(server.app)
+    info = {"project_name": "项目", "room_name": "机房", "year": 2025, "quarter": "Q1",
+            "report_date": "2025-03-31", "report_person": "张三"}
+    first = client.post("/api/report/basic-info", json=info).json()
+    assert first["code"] == 200
+    assert wait_until(lambda: queue.get(first["data"]["report_id"]).state == STATE_RUNNING)
+    assert client.post("/api/report/basic-info", json=info).json()["code"] == 200
+    rejected = client.post("/api/report/basic-info", json=info)
+    assert rejected.status_code == 429
+    assert rejected.headers["Retry-After"] == "7"
+    assert rejected.json()["data"] == {"retry_after": 7}
+    runner.gate.set()
+    queue.shutdown(wait=True)
+
+
+def test_dedupe_reuses_queued_and_recent_jobs(tmp_path):
+    def runner(job):
+        if job.info.get("fail"):
+            raise RuntimeError("生成失败")
+        path = tmp_path / f"{job.report_id}.docx"
+        path.write_text("report")
+        return str(path)
+
+    queue = JobQueue(runner, max_workers=1)
+    # 同一次提交中的相同请求只生成一次
+    a, b, c = queue.submit_many([("r1", {}, "fp"), ("r2", {}, "fp"), ("r3", {}, "other")], dedupe_ttl=60)
+    assert a is b and a is not c and queue.get("r2") is None
+    assert wait_until(lambda: a.finished and c.finished)
+    # 有效期内成功且报告文件仍存在：复用
+    assert queue.submit("r4", {}, fingerprint="fp", dedupe_ttl=60) is a
+    # 超过有效期：重新生成
+    assert queue.submit("r5", {}, fingerprint="fp", dedupe_ttl=0).report_id == "r5"
+    assert wait_until(lambda: queue.get("r5").finished)
+    # 报告文件已删除：重新生成
+    os.remove(queue.get("r5").output_path)
+    assert queue.submit("r6", {}, fingerprint="fp", dedupe_ttl=60).report_id == "r6"
+    # 失败的任务不复用
+    failed = queue.submit("r7", {"fail": True}, fingerprint="bad", dedupe_ttl=60)
+    assert wait_until(lambda: failed.finished)
+    assert queue.submit("r8", {}, fingerprint="bad", dedupe_ttl=60).report_id == "r8"
+    # 未提供指纹时不去重
+    assert queue.submit("r9", {}).report_id == "r9"
+    queue.shutdown(wait=True)
+
+
+def test_dedupe_promotes_queued_batch_job_to_interactive_lane():
+    runner = GatedRunner(blocked=True)
+    queue = JobQueue(runner, max_workers=1, max_queued={LANE_INTERACTIVE: 1})
+    blocker = queue.submit("b0", {}, lane=LANE_BATCH)
+    assert wait_until(lambda: blocker.state == STATE_RUNNING)
+    queue.submit_many([("b1", {}, ""), ("b2", {}, "fp")], lane=LANE_BATCH)
+    queue.submit("i1", {})
+    # 命中排队中的批量任务：不占用交互通道名额，任务提升到交互通道
+    job = queue.submit("i2", {}, fingerprint="fp")
+    assert job.report_id == "b2" and job.lane == LANE_INTERACTIVE
+    assert queue.queue_depth() == {LANE_INTERACTIVE: 2, LANE_BATCH: 1}
+    runner.gate.set()
+    assert wait_until(lambda: len(runner.order) == 4)
+    assert runner.order == ["b0", "i1", "b2", "b1"]
+    queue.shutdown(wait=True)
+
+
+def test_basic_info_endpoint_deduplicates_identical_requests(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    import server_detection as server
+
+    input_path = tmp_path / "input.xlsx"
+    input_path.write_bytes(b"excel")
+    config = configparser.ConfigParser()
+    config.read_dict({
+        "ServerConf": {"dedupe": "true", "dedupe_ttl": "600"},
+        "Path": {"input_path": str(input_path), "template_path": str(tmp_path / "template.docx")},
+        "PageConf": {"dpi": "200"},
+    })
+    runner = GatedRunner(blocked=True)
+    queue = JobQueue(runner, max_workers=1)
+    monkeypatch.setattr(server, "CONFIG", config)
+    monkeypatch.setattr(server, "JOB_QUEUE", queue)
+    client = TestClient(server.app)
+    info = {"project_name": "项目", "room_name": "机房", "year": 2025, "quarter": "Q1",
+            "report_date": "2025-03-31", "report_person": "张三"}
+    first = client.post("/api/report/basic-info", json=info).json()["data"]
+    second = client.post("/api/report/basic-info", json=info).json()["data"]
+    assert second["report_id"] == first["report_id"]
+    assert second["deduplicated"] is True and first["deduplicated"] is False
+    # 输入文件内容变化：请求指纹不同，生成新任务
+    input_path.write_bytes(b"excel v2")
+    third = client.post("/api/report/basic-info", json=info).json()["data"]
+    assert third["report_id"] != first["report_id"] and third["deduplicated"] is False
+    runner.gate.set()
+    queue.shutdown(wait=True)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务监控指标单元测试（test_metrics.py）
+------------------------------------------------------------
+覆盖计数器、直方图与取值函数指标的 Prometheus 文本格式输出、标签校验与重复登记，以及服务的 /metrics 接口。
+"""
+import os
+import sys
+
+import pytest
+
+# 修正项目模块搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+# 服务模块与 uvicorn 启动时相同，按模块名 server_detection 导入
+sys.path.insert(0, os.path.join(PROJECT_ROOT, "modules"))
+
+from modules.metrics import CONTENT_TYPE, CallbackMetric, Counter, Histogram, Registry  # noqa: E402
+
+
+def test_counter_text_format():
+    registry = Registry()
+    jobs = registry.register(Counter("report_jobs_total", "提交的任务数", ["lane"]))
+    jobs.inc(lane="interactive")
+    jobs.inc(2, lane="batch")
+    jobs.inc(lane="interactive")
+    assert registry.render() == (
+        "# HELP report_jobs_total 提交的任务数\n"
+        "# TYPE report_jobs_total counter\n"
+        'report_jobs_total{lane="batch"} 2\n'
+        'report_jobs_total{lane="interactive"} 2\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    duration = registry.register(Histogram("report_seconds", "耗时", ["stage"], buckets=(1, 5)))
+    for value in (0.5, 3, 3, 10):
+        duration.observe(value, stage="stat")
+    lines = registry.render().splitlines()
+    assert lines[1] == "# TYPE report_seconds histogram"
+    assert lines[2:] == [
+        'report_seconds_bucket{stage="stat",le="1"} 1',
+        'report_seconds_bucket{stage="stat",le="5"} 3',
+        'report_seconds_bucket{stage="stat",le="+Inf"} 4',
+        'report_seconds_sum{stage="stat"} 16.5',
+        'report_seconds_count{stage="stat"} 4',
+    ]
+
+
+def test_callback_metric_and_label_escaping():
+    registry = Registry()
+    registry.register(CallbackMetric("queue_depth", "排队任务数", lambda: [({"lane": 'a"b\\c'}, 3)]))
+    registry.register(CallbackMetric("broken", "读取失败", lambda: 1 / 0))
+    text = registry.render()
+    assert 'queue_depth{lane="a\\"b\\\\c"} 3\n' in text
+    # 取值函数出错时只输出说明行，不输出样本
+    assert text.endswith("# HELP broken 读取失败\n# TYPE broken gauge\n")
+
+
+def test_labels_must_match_and_duplicate_registration_is_shared():
+    registry = Registry()
+    jobs = registry.register(Counter("jobs_total", "任务数", ["lane"]))
+    with pytest.raises(ValueError):
+        jobs.inc(state="ok")
+    # 模块重复导入时同名指标返回已登记的实例，保留已累计的数据
+    jobs.inc(lane="batch")
+    assert registry.register(Counter("jobs_total", "任务数", ["lane"])) is jobs
+    with pytest.raises(ValueError):
+        registry.register(Histogram("jobs_total", "任务数", ["lane"]))
+
+
+def test_metrics_endpoint(monkeypatch):
+    from fastapi.testclient import TestClient
+    import server_detection as server
+    from modules.job_queue import JobQueue
+
+    queue = JobQueue(lambda job: "", max_workers=1)
+    monkeypatch.setattr(server, "JOB_QUEUE", queue)
+    response = TestClient(server.app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == CONTENT_TYPE
+    assert "# TYPE report_job_duration_seconds histogram" in response.text
+    assert 'report_queue_depth{lane="interactive"} 0' in response.text
+    assert "report_jobs_running 0" in response.text
+    queue.shutdown(wait=True)
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告生成流水线单元测试（test_pipeline.py）
+------------------------------------------------------------
+以替身阶段函数覆盖依赖调度与并发、阶段回调、阶段结果缓存的命中与失效、容量淘汰。
+"""
+import os
+import sys
+import time
+import threading
+
+import pytest
+
+# 修正项目模块搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from modules.pipeline import (  # noqa: E402
+    Pipeline, Stage, StageCache, STAGE_END, STAGE_FAILED, STAGE_START, STATUS_CACHED, STATUS_RUN,
+)
+
+
+def test_stages_run_in_dependency_order_and_in_parallel():
+    lock = threading.Lock()
+    state = {"running": 0, "max_running": 0}
+
+    def work(value):
+        def func(results):
+            with lock:
+                state["running"] += 1
+                state["max_running"] = max(state["max_running"], state["running"])
+            time.sleep(0.05)
+            with lock:
+                state["running"] -= 1
+            return value + sum(results.values())
+        return func
+
+    events = []
+    pipeline = Pipeline([
+        Stage("a", work(1)),
+        Stage("b", work(2)),
+        Stage("c", work(10), deps=("a", "b")),
+    ], workers=2, on_stage=lambda name, event: events.append((name, event)))
+    assert pipeline.run() == {"a": 1, "b": 2, "c": 13}
+    # a、b 互不依赖，并发执行
+    assert state["max_running"] == 2
+    assert events.index(("c", STAGE_START)) > max(events.index(("a", STAGE_END)), events.index(("b", STAGE_END)))
+    assert all(item["status"] == STATUS_RUN for item in pipeline.report.values())
+
+
+def test_invalid_graph_is_rejected():
+    with pytest.raises(ValueError):
+        Pipeline([Stage("a", lambda r: None, deps=("b",)), Stage("b", lambda r: None, deps=("a",))])
+    with pytest.raises(ValueError):
+        Pipeline([Stage("a", lambda r: None, deps=("missing",))])
+
+
+def test_failed_stage_stops_dependents():
+    def boom(results):
+        raise RuntimeError("阶段失败")
+
+    ran = []
+    events = []
+    pipeline = Pipeline([
+        Stage("a", boom),
+        Stage("b", lambda r: ran.append("b"), deps=("a",)),
+    ], on_stage=lambda name, event: events.append((name, event)))
+    with pytest.raises(RuntimeError):
+        pipeline.run()
+    assert ran == [] and events == [("a", STAGE_START), ("a", STAGE_FAILED)]
+
+
+def build_stages(tmp_path, calls, title="封面"):
+    """统计 → 渲染两阶段：统计读取输入文件写出 stat.txt，渲染依赖统计并写出 out/ 目录。"""
+    input_path = tmp_path / "input.txt"
+    stat_path = tmp_path / "stat.txt"
+    out_dir = tmp_path / "out"
+
+    def stat(results):
+        calls.append("stat")
+        stat_path.write_text(input_path.read_text().upper())
+        return {"rows": len(input_path.read_text())}
+
+    def render(results):
+        calls.append("render")
+        out_dir.mkdir(exist_ok=True)
+        (out_dir / "report.txt").write_text(f"{title}:{stat_path.read_text()}")
+        return results["stat"]["rows"]
+
+    return [
+        Stage("stat", stat, inputs=(str(input_path),), outputs=(str(stat_path),)),
+        Stage("render", render, deps=("stat",), params={"title": title}, outputs=(str(out_dir),)),
+    ]
+
+
+def test_stage_cache_skips_unchanged_stages_and_restores_outputs(tmp_path):
+    (tmp_path / "input.txt").write_text("abc")
+    cache = StageCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    calls = []
+    assert Pipeline(build_stages(tmp_path, calls), cache=cache).run() == {"stat": {"rows": 3}, "render": 3}
+    assert calls == ["stat", "render"]
+
+    # 输出被删除后再次运行：全部命中缓存，输出恢复到原路径
+    os.remove(tmp_path / "stat.txt")
+    os.remove(tmp_path / "out" / "report.txt")
+    calls.clear()
+    pipeline = Pipeline(build_stages(tmp_path, calls), cache=cache)
+    assert pipeline.run() == {"stat": {"rows": 3}, "render": 3}
+    assert calls == []
+    assert {item["status"] for item in pipeline.report.values()} == {STATUS_CACHED}
+    assert (tmp_path / "stat.txt").read_text() == "ABC"
+    assert (tmp_path / "out" / "report.txt").read_text() == "封面:ABC"
+    assert cache.hits == 2 and cache.misses == 2
+
+
+def test_stage_cache_invalidates_changed_stage_and_dependents(tmp_path):
+    (tmp_path / "input.txt").write_text("abc")
+    cache = StageCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    calls = []
+    Pipeline(build_stages(tmp_path, calls), cache=cache).run()
+
+    # 只修改渲染参数：统计从缓存恢复，渲染重新执行
+    calls.clear()
+    pipeline = Pipeline(build_stages(tmp_path, calls, title="新封面"), cache=cache)
+    pipeline.run()
+    assert calls == ["render"]
+    assert pipeline.report["stat"]["status"] == STATUS_CACHED
+
+    # 修改输入文件：统计与依赖它的渲染都重新执行
+    (tmp_path / "input.txt").write_text("abcd")
+    calls.clear()
+    assert Pipeline(build_stages(tmp_path, calls, title="新封面"), cache=cache).run()["render"] == 4
+    assert calls == ["stat", "render"]
+    assert (tmp_path / "out" / "report.txt").read_text() == "新封面:ABCD"
+
+
+def test_stage_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"), max_bytes=2500)
+    stages = []
+    for i in range(3):
+        path = tmp_path / f"out{i}.bin"
+        path.write_bytes(os.urandom(1000))
+        stages.append(Stage(f"s{i}", None, outputs=(str(path),)))
+    cache.put(stages[0], "fp", 0)
+    cache.put(stages[1], "fp", 1)
+    # 命中刷新最近使用时间，s1 成为最久未使用的条目
+    time.sleep(0.05)
+    assert cache.restore(stages[0], "fp") == (True, 0)
+    cache.put(stages[2], "fp", 2)
+    assert cache.restore(stages[1], "fp") == (False, None)
+    assert cache.restore(stages[0], "fp") == (True, 0)
+    assert cache.restore(stages[2], "fp") == (True, 2)
+
+
+def test_stage_cache_concurrent_puts_keep_entries_complete(tmp_path):
+    cache = StageCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    stages = []
+    for i in range(8):
+        path = tmp_path / f"out{i}.bin"
+        path.write_bytes(os.urandom(20000))
+        stages.append(Stage(f"s{i % 2}", None, outputs=(str(path),)))
+    threads = [threading.Thread(target=cache.put, args=(stage, f"fp{i}", i)) for i, stage in enumerate(stages)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for i, stage in enumerate(stages):
+        expected = (tmp_path / f"out{i}.bin").read_bytes()
+        os.remove(tmp_path / f"out{i}.bin")
+        assert cache.restore(stage, f"fp{i}") == (True, i)
+        assert (tmp_path / f"out{i}.bin").read_bytes() == expected
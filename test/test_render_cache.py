@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+sheet 图片渲染缓存单元测试（test_render_cache.py）
+------------------------------------------------------------
+覆盖缓存命中/未命中与 LRU 淘汰、指纹清单，以及 sheet 内容指纹的失效条件（含工作簿主题与默认样式）与不可缓存的 sheet。
+"""
+import os
+import sys
+import time
+
+from openpyxl import Workbook
+from openpyxl.chart import BarChart, Reference
+from openpyxl.styles import Font
+
+# 修正项目模块搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from modules.render_cache import RenderCache, sheet_fingerprint  # noqa: E402
+
+
+def fingerprint(sheet, dpi: int = 200) -> str:
+    return sheet_fingerprint(sheet, 9, "portrait", dpi)
+
+
+def make_sheet():
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["检查项", "结果"])
+    ws.append(["温度", "正常"])
+    return ws
+
+
+def test_get_put_hit_and_miss(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    src = tmp_path / "sheet.jpg"
+    src.write_bytes(b"jpg")
+    dest = tmp_path / "images" / "sheet.jpg"
+    dest.parent.mkdir()
+    assert cache.get("key", str(dest)) is False
+    cache.put("key", str(src))
+    assert cache.get("key", str(dest)) is True
+    assert dest.read_bytes() == b"jpg"
+    # 矢量模式需要 .svg 与 .png 都存在才算命中
+    assert cache.get("key", str(tmp_path / "a.svg"), str(tmp_path / "a.png")) is False
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert abs(cache.hit_rate() - 1 / 3) < 1e-9
+
+
+def test_put_evicts_least_recently_used(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=2500)
+    for key in ("a", "b"):
+        src = tmp_path / f"{key}.jpg"
+        src.write_bytes(os.urandom(1000))
+        cache.put(key, str(src))
+    # 命中刷新最近使用时间，b 成为最久未使用的图片
+    time.sleep(0.05)
+    assert cache.get("a", str(tmp_path / "out.jpg"))
+    src = tmp_path / "c.jpg"
+    src.write_bytes(os.urandom(1000))
+    cache.put("c", str(src))
+    assert not os.path.exists(cache.path_for("b"))
+    assert os.path.exists(cache.path_for("a")) and os.path.exists(cache.path_for("c"))
+
+
+def test_manifest_round_trip(tmp_path):
+    cache = RenderCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    assert cache.load_manifest("input.xlsx") == {}
+    cache.save_manifest("input.xlsx", {"表1": "fp1"})
+    assert cache.load_manifest("input.xlsx") == {"表1": "fp1"}
+    assert cache.load_manifest("other.xlsx") == {}
+
+
+def test_fingerprint_changes_with_content_and_page_settings():
+    ws = make_sheet()
+    base = fingerprint(ws)
+    assert base == fingerprint(make_sheet())
+    assert fingerprint(ws, dpi=300) != base
+
+    ws["B2"] = "不正常"
+    assert fingerprint(ws) != base
+    ws["B2"] = "正常"
+    assert fingerprint(ws) == base
+
+    ws["B2"].font = Font(bold=True)
+    assert fingerprint(ws) != base
+
+    ws = make_sheet()
+    ws.column_dimensions["A"].width = 30
+    assert fingerprint(ws) != base
+
+    ws = make_sheet()
+    ws.oddFooter.center.text = "第 &P 页"
+    assert fingerprint(ws) != base
+
+    ws = make_sheet()
+    ws.print_title_rows = "1:1"
+    assert fingerprint(ws) != base
+
+
+def test_fingerprint_changes_with_workbook_theme_and_default_style():
+    ws = make_sheet()
+    base = fingerprint(ws)
+
+    # 主题颜色与主题字体来自 theme1.xml
+    ws.parent.loaded_theme = b"<a:theme name='Custom'/>"
+    assert fingerprint(ws) != base
+
+    # 默认字体（未设置样式的单元格使用）
+    ws = make_sheet()
+    ws.parent._fonts[0] = Font(name="宋体", sz=10)
+    assert fingerprint(ws) != base
+
+    # 命名样式
+    ws = make_sheet()
+    ws.parent._named_styles["Normal"].font = Font(name="宋体", sz=10)
+    assert fingerprint(ws) != base
+
+
+def test_fingerprint_is_none_for_sheets_depending_on_other_content():
+    # 公式：工作簿中只有公式文本，计算结果可能来自其他 sheet
+    ws = make_sheet()
+    ws["C2"] = "=Sheet2!A1"
+    assert fingerprint(ws) is None
+
+    # 图表
+    ws = make_sheet()
+    chart = BarChart()
+    chart.add_data(Reference(ws, min_col=2, min_row=1, max_row=2))
+    ws.add_chart(chart, "D2")
+    assert fingerprint(ws) is None
+
+    # 页眉中的日期字段每次渲染都不同
+    ws = make_sheet()
+    ws.oddHeader.right.text = "打印日期 &D"
+    assert fingerprint(ws) is None
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+矢量插图单元测试（test_report_embedder.py）
+------------------------------------------------------------
+覆盖矢量模式的 SVG 插图在保存后的报告中保留 svgBlip 扩展（SVG 部件与 PNG 后备图），
+以及调色板 PNG 后备图与同一表格的 JPG 图片的体积对比。
+目录刷新（soffice 以 UNO 打开并 doc.store() 保存）后 svgBlip 是否保留需要 LibreOffice，不在此覆盖。
+"""
+import io
+import os
+import re
+import sys
+import zipfile
+from xml.etree import ElementTree
+
+from docx import Document
+from docxtpl import DocxTemplate
+from PIL import Image, ImageDraw
+
+# 修正项目模块搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from modules import excel_to_images, report_embedder  # noqa: E402
+
+SVG_EXT_URI = "{96DAC541-7B7A-43D3-8B79-37D633B846F1}"
+
+
+def draw_table(dpi: int) -> Image.Image:
+    """按 dpi 绘制一张 A4 横向大小的表格图片（网格线、文字与一行底色），近似表格截图。"""
+    scale = dpi / 72
+    img = Image.new("RGB", (int(800 * scale), int(540 * scale)), "white")
+    draw = ImageDraw.Draw(img)
+    row_h, col_w = 13 * scale, 100 * scale
+    draw.rectangle([0, 3 * row_h, 8 * col_w, 4 * row_h], fill=(255, 230, 153))
+    for r in range(41):
+        draw.line([0, r * row_h, 8 * col_w, r * row_h], fill="black", width=max(1, int(scale / 2)))
+    for c in range(9):
+        draw.line([c * col_w, 0, c * col_w, 40 * row_h], fill="black", width=max(1, int(scale / 2)))
+    for r in range(40):
+        for c in range(8):
+            draw.text((c * col_w + 3, r * row_h + 2), f"SN{r:04d}-{c} OK", fill="black")
+    return img
+
+
+def encoded_size(img: Image.Image, *args, **kwargs) -> int:
+    buffer = io.BytesIO()
+    img.save(buffer, *args, **kwargs)
+    return buffer.tell()
+
+
+def test_fallback_png_is_smaller_than_jpg():
+    jpg = encoded_size(draw_table(200), "JPEG")
+    fallback = draw_table(excel_to_images.FALLBACK_DPI)
+    rgb_png = encoded_size(fallback, "PNG", optimize=True)
+    palette_png = encoded_size(fallback.quantize(excel_to_images.FALLBACK_COLORS), "PNG", optimize=True)
+    assert palette_png < rgb_png / 2
+    assert palette_png < jpg / 2
+
+
+def test_svg_inline_image_keeps_svg_blip_after_save(tmp_path):
+    template = tmp_path / "模板.docx"
+    document = Document()
+    document.add_paragraph("{{ 表1 }}")
+    document.save(template)
+    svg_path = tmp_path / "表1.svg"
+    svg_path.write_text('<svg xmlns="http://www.w3.org/2000/svg" width="80pt" height="20pt"/>', encoding="utf-8")
+    draw_table(30).save(tmp_path / "表1.png", "PNG")
+
+    doc = DocxTemplate(str(template))
+    doc.render(report_embedder.build_image_context(doc, {"表1": str(svg_path)}))
+    output = tmp_path / "报告.docx"
+    report_embedder.save_doc(doc, str(output))
+
+    with zipfile.ZipFile(output) as docx:
+        body = docx.read("word/document.xml").decode("utf-8")
+        rels = docx.read("word/_rels/document.xml.rels")
+        content_types = docx.read("[Content_Types].xml").decode("utf-8")
+        # a:blip 引用 PNG 后备图，扩展中的 svgBlip 引用 SVG 部件
+        assert SVG_EXT_URI in body
+        png_id = re.search(r'<a:blip r:embed="([^"]+)"', body).group(1)
+        svg_id = re.search(r'<asvg:svgBlip[^>]*r:embed="([^"]+)"', body).group(1)
+        targets = {rel.get("Id"): rel.get("Target") for rel in ElementTree.fromstring(rels)}
+        assert targets[png_id].endswith(".png") and targets[svg_id].endswith(".svg")
+        assert docx.read("word/" + targets[svg_id]) == svg_path.read_bytes()
+        assert "image/svg+xml" in content_types
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+检查结果判定规则单元测试（test_result_rules.py）
+------------------------------------------------------------
+覆盖整列判定、表头识别，以及规则文件的热加载（修改后重新编译、新规则有误时沿用旧规则）。
+"""
+import os
+import sys
+import json
+
+import pandas as pd
+import pytest
+
+# 修正项目模块搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from modules import result_rules  # noqa: E402
+
+
+@pytest.fixture
+def rules_file(tmp_path, monkeypatch):
+    """临时规则文件；测试结束后恢复进程级的当前规则。"""
+    monkeypatch.setattr(result_rules, "RULES_PATH", "")
+    monkeypatch.setattr(result_rules, "_ACTIVE_RULES", result_rules.DEFAULT_RULES)
+    monkeypatch.setattr(result_rules, "_ACTIVE_MTIME", None)
+    path = tmp_path / "result_rules.json"
+    result_rules.configure(str(path))
+    return path
+
+
+def write_rules(path, keywords, mtime_ns: int) -> None:
+    """写入只含异常关键词的规则文件，并设置修改时间（避免同一时间戳内的修改被忽略）。"""
+    path.write_text(json.dumps({"results": {"abnormal_keywords": keywords}}, ensure_ascii=False), encoding="utf-8")
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_default_rules_classify_results():
+    abnormal, normal = result_rules.DEFAULT_RULES.classify(
+        pd.Series(["正常", "不正常", "无告警", "有告警", " 正 常 ", None]))
+    assert abnormal.tolist() == [False, True, False, True, False, False]
+    assert normal.tolist() == [True, False, False, False, True, False]
+
+
+def test_match_columns_uses_first_matching_column():
+    col_map = result_rules.DEFAULT_RULES.match_columns(["序号", "检查项", "检查内容", "结果"], "inspection")
+    assert col_map == {"技术指标": "检查项", "说明": "检查内容", "检查结果": "结果"}
+
+
+def test_current_rules_reloads_modified_file(rules_file):
+    write_rules(rules_file, ["异常"], 1_000_000_000)
+    rules = result_rules.current_rules()
+    assert rules.abnormal_keywords == ("异常",) and rules.source == str(rules_file)
+    # 未修改时复用已编译的规则
+    assert result_rules.current_rules() is rules
+
+    write_rules(rules_file, ["异常", "离线"], 2_000_000_000)
+    rules = result_rules.current_rules()
+    assert rules.abnormal_keywords == ("异常", "离线")
+    assert rules.classify(pd.Series(["设备离线"]))[0].tolist() == [True]
+
+
+def test_invalid_rules_keep_previous_rules(rules_file):
+    write_rules(rules_file, ["异常"], 1_000_000_000)
+    rules = result_rules.current_rules()
+    rules_file.write_text("{ 不是 JSON", encoding="utf-8")
+    os.utime(rules_file, ns=(2_000_000_000, 2_000_000_000))
+    assert result_rules.current_rules() is rules
+    # 立即重新加载时抛出异常，原规则保持不变
+    with pytest.raises(ValueError):
+        result_rules.reload_rules()
+    assert result_rules.current_rules() is rules
+    # 修正后再次修改文件即可生效
+    write_rules(rules_file, ["故障"], 3_000_000_000)
+    assert result_rules.current_rules().abnormal_keywords == ("故障",)
@@ -7,4 +7,40 @@ curl -X POST "http://127.0.0.1:8100/api/report/basic-info" \
         "quarter": "4季度",
         "report_date": "2025-10-20",
         "report_person": "张三"
-      }'
\ No newline at end of file
+      }'
+
+# 重复提交相同内容（[ServerConf] dedupe = true）时返回同一 report_id，data.deduplicated 为 true
+
+# 查询报告生成任务状态（将 REP-XXXXXXXX 替换为提交接口返回的 report_id）
+curl "http://127.0.0.1:8100/api/report/REP-XXXXXXXX"
+
+# 订阅任务事件流（SSE）：实时输出状态变化、阶段切换与逐 sheet 进度，任务结束后连接关闭
+#   断线重连时带上最后收到的事件序号：-H "Last-Event-ID: 12"
+curl -N "http://127.0.0.1:8100/api/report/REP-XXXXXXXX/events"
+
+# 下载已生成的报告
+curl -o report.docx "http://127.0.0.1:8100/api/report/REP-XXXXXXXX/download"
+
+# 修改 config/result_rules.json 后立即重新加载巡检统计判定规则
+curl -X POST "http://127.0.0.1:8100/api/rules/reload"
+
+# 批量提交：每个机房一份报告（input_path 为空时使用 config.ini 中的 input_path），返回 batch_id
+curl -X POST "http://127.0.0.1:8100/api/report/batch" \
+  -H "Content-Type: application/json" \
+  -d '{
+        "reports": [
+          {"project_name": "智慧数据中心巡检项目", "room_name": "A区主机房", "year": 2025, "quarter": "4季度",
+           "report_date": "2025-10-20", "report_person": "张三", "input_path": "data/巡检报告数据集(1.0).xlsx"},
+          {"project_name": "智慧数据中心巡检项目", "room_name": "B区主机房", "year": 2025, "quarter": "4季度",
+           "report_date": "2025-10-20", "report_person": "李四", "input_path": "data/巡检报告数据集(1.0).xlsx"}
+        ]
+      }'
+
+# 查询批次结果清单（将 BAT-XXXXXXXX 替换为批量提交接口返回的 batch_id）
+curl "http://127.0.0.1:8100/api/report/batch/BAT-XXXXXXXX"
+
+# 命令行批量生成（清单格式同 reports 列表，结果清单写入 manifest.result.json）
+# ./run.sh --batch manifest.json
+
+# 监控指标（Prometheus 文本格式）：任务数、各阶段耗时直方图、队列深度、soffice 实例数、渲染缓存命中率、报告文件大小
+curl "http://127.0.0.1:8100/metrics"
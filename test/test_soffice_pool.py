@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+soffice 实例池单元测试（test_soffice_pool.py）
+------------------------------------------------------------
+以替身实例代替 soffice 进程（无需 LibreOffice），覆盖借出与归还、健康检查重连、按文档数回收、等待超时与未启用配置。
+"""
+import os
+import sys
+import configparser
+
+import pytest
+
+# 修正项目模块搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from modules import soffice_pool  # noqa: E402
+from modules.soffice_pool import SofficeInstance, SofficePool  # noqa: E402
+
+
+class FakeProc:
+    """替身 soffice 进程：alive 为 False 时视为已退出。"""
+
+    def __init__(self):
+        self.alive = True
+
+    def poll(self):
+        return None if self.alive else 1
+
+
+@pytest.fixture
+def fake_instances(monkeypatch):
+    """替换实例的启动、停止与连接：启动即就绪，记录每个实例的启动次数。"""
+    starts = {}
+
+    def start(self):
+        self.proc = FakeProc()
+        self.desktop = object()
+        self.documents = 0
+        starts[self.index] = starts.get(self.index, 0) + 1
+
+    def stop(self):
+        self.proc = None
+        self.desktop = None
+
+    monkeypatch.setattr(SofficeInstance, "start", start)
+    monkeypatch.setattr(SofficeInstance, "stop", stop)
+    monkeypatch.setattr(SofficeInstance, "is_healthy", lambda self: self.proc is not None and self.proc.alive)
+    monkeypatch.setattr(SofficeInstance, "reconnect", SofficeInstance.restart)
+    return starts
+
+
+def make_pool(tmp_path, size: int = 1, **kwargs) -> SofficePool:
+    pool = SofficePool(size=size, base_port=2100, profile_root=str(tmp_path), **kwargs)
+    pool.start()
+    return pool
+
+
+def test_acquire_returns_instance_to_pool(tmp_path, fake_instances):
+    pool = make_pool(tmp_path, size=2)
+    assert pool.active_count() == 2
+    with pool.acquire() as first:
+        with pool.acquire() as second:
+            assert {first.index, second.index} == {0, 1}
+    with pool.acquire() as inst:
+        assert inst.index in (0, 1)
+    pool.shutdown()
+    assert pool.active_count() == 0
+
+
+def test_unhealthy_instance_is_restarted_before_use(tmp_path, fake_instances):
+    pool = make_pool(tmp_path)
+    pool.instances[0].proc.alive = False
+    with pool.acquire() as inst:
+        assert inst.is_healthy()
+    assert fake_instances[0] == 2
+
+
+def test_instance_is_recycled_after_max_documents(tmp_path, fake_instances):
+    pool = make_pool(tmp_path, max_documents=2)
+    for _ in range(2):
+        with pool.acquire() as inst:
+            inst.documents += 1
+    # 第二个文档处理完后达到上限，归还时重启
+    assert fake_instances[0] == 2 and pool.instances[0].documents == 0
+
+
+def test_acquire_times_out_when_all_instances_busy(tmp_path, fake_instances):
+    pool = make_pool(tmp_path, acquire_timeout=0.05)
+    with pool.acquire():
+        with pytest.raises(TimeoutError):
+            with pool.acquire():
+                pass
+
+
+def test_get_pool_returns_none_when_disabled():
+    config = configparser.ConfigParser()
+    config.read_dict({"SofficePool": {"pool_size": "0"}})
+    assert soffice_pool.get_pool(config) is None
+    assert soffice_pool.get_pool(configparser.ConfigParser()) is None
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+巡检统计分析单元测试（test_statistic.py）
+------------------------------------------------------------
+以原逐行实现为对照，核对向量化的检查结果判定、检查项与异常详细拼接结果一致（含空单元格）。
+"""
+import os
+import re
+import sys
+
+import pandas as pd
+import pytest
+
+# 修正项目模块搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from modules import result_rules, statistic  # noqa: E402
+
+COL_MAP = {"技术指标": "技术指标", "说明": "说明", "检查结果": "检查结果"}
+
+
+@pytest.fixture(autouse=True)
+def default_rules(monkeypatch):
+    """使用内置默认规则，不读取规则文件。"""
+    monkeypatch.setattr(result_rules, "RULES_PATH", "")
+    monkeypatch.setattr(result_rules, "_ACTIVE_RULES", result_rules.DEFAULT_RULES)
+
+
+def analyze_rowwise(df: pd.DataFrame, c_item: str, c_result: str):
+    """原 analyze_12345 的逐行实现（对照）：空单元格按 str() 显示为 "nan"，与 pandas 2 的 astype(str) 相同。"""
+    s = df[c_result].map(lambda x: "" if x is None else str(x)).str.replace(r"\s+", "", regex=True)
+    abnormal_mask = s.apply(
+        lambda x: (
+            (not re.search(r"(?<!不)正常", x)) and
+            any(k in x for k in ["不正常", "异常", "错误", "失败", "需检查", "告警"]) and
+            not any(p in x for p in ["无告警"])
+        )
+    )
+    normal_mask = s.apply(lambda x: re.search(r"(?<!不)正常", x) is not None) & ~abnormal_mask
+    check_items = "、".join(str(v) for v in df[c_item].tolist())
+    records = []
+    for idx, (_, row) in enumerate(df[abnormal_mask].iterrows(), start=1):
+        records.append(f"{idx}. {str(row.get(c_item, '')).strip()}（{str(row.get(c_result, '')).strip()}）")
+    return abnormal_mask, normal_mask, check_items, "；".join(records)
+
+
+def make_table() -> pd.DataFrame:
+    return pd.DataFrame({
+        "技术指标": ["电源模块", None, " 风扇 ", "温度", float("nan"), "告警灯", "端口"],
+        "说明": ["检查电源", "检查指示灯", None, "检查温度", "检查日志", "检查告警", "检查端口"],
+        "检查结果": ["正常", "不正常", "有告警\n需处理", None, "失败", "无告警", float("nan")],
+    })
+
+
+def test_classify_matches_rowwise_reference_with_empty_cells():
+    df = make_table()
+    expected_abnormal, expected_normal, _, expected_detail = analyze_rowwise(df, "技术指标", "检查结果")
+    abnormal, normal = result_rules.DEFAULT_RULES.classify(df["检查结果"])
+    assert abnormal.tolist() == expected_abnormal.tolist()
+    assert normal.tolist() == expected_normal.tolist()
+    detail = result_rules.join_abnormal_detail(df[abnormal], "技术指标", "检查结果")
+    assert detail == expected_detail
+    assert detail == "1. nan（不正常）；2. 风扇（有告警\n需处理）；3. nan（失败）"
+
+
+def test_analyze_12345_matches_rowwise_reference():
+    df = make_table()
+    stats = statistic.analyze_12345(df, COL_MAP, 1, "表1")
+    _, expected_normal, expected_items, expected_detail = analyze_rowwise(df, "技术指标", "检查结果")
+    assert stats.check_items == expected_items
+    assert stats.abnormal_detail == expected_detail
+    assert (stats.total, stats.normal_count, stats.abnormal_count) == (7, int(expected_normal.sum()), 3)
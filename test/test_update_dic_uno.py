@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+目录刷新模块单元测试（test_update_dic_uno.py）
+------------------------------------------------------------
+覆盖本进程无法导入 uno 时回退到子进程刷新，以及可导入时在本进程内刷新。
+"""
+import os
+import sys
+import configparser
+
+# 修正项目模块搜索路径
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from modules import update_dic_uno  # noqa: E402
+
+
+class FakeWorkspace:
+    output_path = "/tmp/report.docx"
+
+
+def test_run_falls_back_to_subprocess_without_uno(monkeypatch):
+    calls = []
+    monkeypatch.setattr(update_dic_uno, "uno", None)
+    monkeypatch.setattr(update_dic_uno.subprocess, "run", lambda cmd, check: calls.append((cmd, check)))
+    monkeypatch.setattr(update_dic_uno, "update_docx_fields", lambda path: calls.append(("in-process", path)))
+    update_dic_uno.run(configparser.ConfigParser(), FakeWorkspace())
+    assert calls == [([update_dic_uno.UNO_PYTHON, os.path.abspath(update_dic_uno.__file__), "/tmp/report.docx"], True)]
+
+
+def test_run_refreshes_in_process_with_uno(monkeypatch):
+    calls = []
+    monkeypatch.setattr(update_dic_uno, "uno", object())
+    monkeypatch.setattr(update_dic_uno.subprocess, "run", lambda cmd, check: calls.append(cmd))
+    monkeypatch.setattr(update_dic_uno, "update_docx_fields", lambda path: calls.append(("in-process", path)))
+    update_dic_uno.run(configparser.ConfigParser(), FakeWorkspace())
+    assert calls == [("in-process", "/tmp/report.docx")]